@@ -0,0 +1,171 @@
+"""
+This program benchmarks the cold start of the command line entry points, i.e. how long importing
+each entry point module takes, using the import timings printed by python -X importtime.
+The time spent importing the frameworks every entry point needs (PyTorch, torchvision, NumPy, PIL,
+ONNX Runtime) is reported separately from the time spent on everything else, which is checked against
+a budget, as it is what the project itself controls. Optional dependencies which should only be
+imported when their feature runs (e.g. matplotlib for plotting, imgaug for augmentation) must not be
+imported at all. The script exits with status 1 if an entry point breaks either rule.
+Version: 19/10/2026
+"""
+import os
+import subprocess
+import sys
+
+SOURCE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRANSFER_LEARNING_PATH = os.path.join(SOURCE_PATH, "transfer_learning")
+
+ENTRY_POINTS = [
+    "model_evaluation",
+    "batch_prediction",
+    "inference_server",
+    "onnx_inference",
+    "prediction_store",
+    "tiled_inference",
+]
+FRAMEWORK_MODULES = ["torch", "torchvision", "numpy", "PIL", "onnxruntime"]
+DEFERRED_MODULES = ["matplotlib", "pandas", "imgaug", "seaborn"]
+
+
+def parse_import_times(stderr: str) -> list:
+    """
+    :param stderr: Output of python -X importtime
+    :return: List of (depth, self time (us), cumulative time (us), module name), in the printed order,
+    i.e. every module is listed after the modules it imported
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_time, cumulative_time, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((depth, int(self_time), int(cumulative_time), name.strip()))
+
+    return entries
+
+
+def measure_imports(module_name: str) -> dict:
+    """
+    This function imports a module in a fresh Python process and breaks down its import time.
+    :param module_name: Name of the entry point module
+    :return: Dictionary with the total, framework and remaining import time (ms), the deferred modules
+    which were imported, and the project or library modules which took longest to import themselves
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + module_name],
+        cwd=TRANSFER_LEARNING_PATH,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    entries = parse_import_times(process.stderr)
+
+    # Walks the import tree from the top (the reverse of the printed order), so that a framework
+    # is only counted once, and the modules it imports are counted as part of it
+    total_us = 0
+    framework_us = 0
+    non_framework_self_us = {}
+    stack = []
+    for depth, self_time, cumulative_time, name in reversed(entries):
+        while stack and stack[-1][0] >= depth:
+            stack.pop()
+        inside_framework = any(is_framework for _, is_framework in stack)
+        is_framework = name.split(".")[0] in FRAMEWORK_MODULES
+        if depth == 0:
+            total_us += cumulative_time
+        if is_framework and not inside_framework:
+            framework_us += cumulative_time
+        if not (is_framework or inside_framework):
+            package = name.split(".")[0]
+            non_framework_self_us[package] = (
+                non_framework_self_us.get(package, 0) + self_time
+            )
+        stack.append((depth, is_framework or inside_framework))
+
+    imported_packages = {name.split(".")[0] for _, _, _, name in entries}
+    slowest = sorted(non_framework_self_us.items(), key=lambda item: -item[1])[:5]
+
+    return {
+        "total_ms": total_us / 1000,
+        "framework_ms": framework_us / 1000,
+        "other_ms": (total_us - framework_us) / 1000,
+        "deferred_imported": sorted(imported_packages & set(DEFERRED_MODULES)),
+        "slowest": [(package, self_us / 1000) for package, self_us in slowest],
+    }
+
+
+def benchmark_entry_point(module_name: str, repeats: int) -> dict:
+    """
+    This function measures the imports of an entry point several times, after one untimed run which
+    warms the file system cache.
+    :param module_name: Name of the entry point module
+    :param repeats: Number of timed runs
+    :return: Results of the run with the median remaining import time
+    """
+    measure_imports(module_name)
+    runs = sorted(
+        (measure_imports(module_name) for i in range(repeats)),
+        key=lambda results: results["other_ms"],
+    )
+
+    return runs[len(runs) // 2]
+
+
+def main():
+    """
+    Usage: python import_benchmark.py [budget_ms] [entry_point ...]
+    Checks every entry point in ENTRY_POINTS if none are given. The budget (300 ms by default) applies to
+    the import time outside of FRAMEWORK_MODULES.
+    """
+    budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 300.0
+    module_names = sys.argv[2:] or ENTRY_POINTS
+
+    failures = []
+    print(
+        "{:<20} {:>10} {:>14} {:>10}  {}".format(
+            "Entry point",
+            "Total (ms)",
+            "Framework (ms)",
+            "Other (ms)",
+            "Slowest other imports (ms)",
+        )
+    )
+    for module_name in module_names:
+        results = benchmark_entry_point(module_name, repeats=5)
+        print(
+            "{:<20} {:>10.0f} {:>14.0f} {:>10.0f}  {}".format(
+                module_name,
+                results["total_ms"],
+                results["framework_ms"],
+                results["other_ms"],
+                ", ".join(
+                    "{} {:.0f}".format(package, self_ms)
+                    for package, self_ms in results["slowest"]
+                ),
+            )
+        )
+        if results["deferred_imported"]:
+            failures.append(
+                "{} imports {}".format(
+                    module_name, ", ".join(results["deferred_imported"])
+                )
+            )
+        if results["other_ms"] > budget_ms:
+            failures.append(
+                "{} takes {:.0f} ms outside of the frameworks (budget {:.0f} ms)".format(
+                    module_name, results["other_ms"], budget_ms
+                )
+            )
+
+    if failures:
+        print("\n".join(["Cold start regressions:"] + failures))
+        sys.exit(1)
+
+    print("Every entry point is within the budget of {:.0f} ms".format(budget_ms))
+
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,504 @@
+"""
+This program benchmarks every stage of the pipeline on synthetic images, so that no network access
+or real dataset is needed, and performance regressions can be found by comparing two runs.
+The stages benchmarked are: cleaning the CAN .csv data, JPEG decoding, resizing, day/night scoring,
+colour space conversion, augmentation, DataLoader iteration, a training step (forward and backward pass)
+of every architecture, and evaluation with make_predictions().
+Every stage is run in its own process, so the peak memory (RSS) reported belongs to that stage only.
+For every stage the images/sec, the latency percentiles of a call (one image, or one batch for
+batched stages) and the peak RSS are reported, and the results are saved as .json.
+Version: 19/10/2026
+"""
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+SOURCE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for package in ["data_acquisition", "preprocessing_pipeline", "transfer_learning"]:
+    sys.path.insert(0, os.path.join(SOURCE_PATH, package))
+
+from metrics_emitter import get_peak_rss_mb
+
+CITIES = ["LONDON", "MADRID", "PARIS", "TOKYO"]
+IMAGE_SIZE = (640, 480)  # Size of the small/ variant of the ISS images
+BATCH_SIZE = 16
+TRAINING_STEPS = 5
+EVALUATION_MODEL = "ResNet-18"
+
+
+def make_synthetic_image(rng: np.random.Generator) -> Image.Image:
+    """
+    This function draws a synthetic image of a city at night: a dark, noisy background with
+    clusters of bright lights.
+    :param rng: NumPy random generator
+    :return: Synthetic image
+    """
+    width, height = IMAGE_SIZE
+    image = rng.normal(8, 4, (height, width, 3))
+    y, x = np.mgrid[0:height, 0:width]
+    for i in range(rng.integers(5, 15)):
+        centre_y, centre_x = rng.integers(0, height), rng.integers(0, width)
+        radius = rng.uniform(5, 40)
+        light = np.exp(-((y - centre_y) ** 2 + (x - centre_x) ** 2) / (2 * radius**2))
+        image += light[:, :, None] * rng.uniform(100, 255, 3)
+
+    return Image.fromarray(np.clip(image, 0, 255).astype(np.uint8))
+
+
+def create_fixture(fixture_directory: str, num_images: int) -> None:
+    """
+    This function writes the synthetic images used by the benchmark:
+        iss_image_data/raw/train/<city>/ - images in the layout expected by the pre-processing scripts
+        dataset/<train|validation|test>/<city>/ - dataset in the layout expected by the training scripts
+    :param fixture_directory: Directory in which the fixture is created
+    :param num_images: Number of images in every directory tree
+    :return:
+    """
+    rng = np.random.default_rng(0)
+    images = [make_synthetic_image(rng) for i in range(num_images)]
+
+    for tree in [
+        "iss_image_data/raw/train",
+        "dataset/train",
+        "dataset/validation",
+        "dataset/test",
+    ]:
+        for i, image in enumerate(images):
+            city_directory = os.path.join(
+                fixture_directory, tree, CITIES[i % len(CITIES)]
+            )
+            os.makedirs(city_directory, exist_ok=True)
+            image.save(
+                os.path.join(
+                    city_directory, "ISS{:03d}-E-{:06d}.jpg".format(i % 70, i)
+                ),
+                quality=90,
+            )
+    os.makedirs(os.path.join(fixture_directory, "work"), exist_ok=True)
+
+    return
+
+
+def list_fixture_images(fixture_directory: str):
+    """
+    :param fixture_directory: Directory of the fixture
+    :return: Paths of the pre-processing images, relative to the work/ directory of the fixture
+    (the pre-processing scripts find the city of an image from its path)
+    """
+    all_images = []
+    for city in CITIES:
+        city_directory = os.path.join("../iss_image_data/raw/train", city)
+        for file in sorted(
+            os.listdir(os.path.join(fixture_directory, "work", city_directory))
+        ):
+            all_images.append(city_directory + "/" + file)
+
+    return all_images
+
+
+def time_calls(function, arguments):
+    """
+    This function times a call of the function for every argument.
+    :param function: Function to time
+    :param arguments: Arguments of the calls
+    :return: List of (images processed, seconds) samples, one per call
+    """
+    samples = []
+    for argument in arguments:
+        start_time = time.perf_counter()
+        function(argument)
+        samples.append((1, time.perf_counter() - start_time))
+
+    return samples
+
+
+def benchmark_clean_data(fixture_directory, num_images):
+    import pandas as pd
+
+    from can_data_preprocessing import clean_data
+
+    rng = np.random.default_rng(0)
+    num_rows = 10000
+    cities = [" new york ", "London", "Madrid ", "tokyo", None]
+    raw_data = pd.DataFrame(
+        {
+            "IMAGE": [
+                "ISS030-E-{:06d}".format(i) for i in rng.integers(0, 8000, num_rows)
+            ],
+            "CITY": [cities[i] for i in rng.integers(0, len(cities), num_rows)],
+        }
+    )
+
+    samples = []
+    for i in range(10):
+        data = raw_data.copy()
+        start_time = time.perf_counter()
+        clean_data(data)
+        samples.append((num_rows, time.perf_counter() - start_time))
+
+    return samples
+
+
+def benchmark_jpeg_decode(fixture_directory, num_images):
+    return time_calls(
+        lambda path: Image.open(path).convert("RGB").load(),
+        list_fixture_images(fixture_directory),
+    )
+
+
+def benchmark_resize_image(fixture_directory, num_images):
+    from resize_images import resize_image
+
+    return time_calls(resize_image, list_fixture_images(fixture_directory))
+
+
+def benchmark_day_night(fixture_directory, num_images):
+    from day_night_classifier import classify_image
+
+    # The synthetic images are night time images, so classify_image() does not delete them
+    return time_calls(classify_image, list_fixture_images(fixture_directory))
+
+
+def benchmark_colour_space_conversion(fixture_directory, num_images):
+    from colourspace_conversion import colour_space_conversion
+
+    images = [
+        np.asarray(Image.open(path).convert("RGB"))
+        for path in list_fixture_images(fixture_directory)
+    ]
+
+    return time_calls(lambda image: colour_space_conversion(image, mode="hsv"), images)
+
+
+def benchmark_augmentation(fixture_directory, num_images):
+    from image_augmentation import Augmentation
+
+    augmentation = Augmentation()
+    images = [
+        Image.open(path).convert("RGB")
+        for path in list_fixture_images(fixture_directory)
+    ]
+
+    return time_calls(augmentation, images)
+
+
+def benchmark_data_loader(fixture_directory, num_images):
+    from model_training import load_dataset_and_transforms
+
+    data_loaders, classes = load_dataset_and_transforms(
+        os.path.join(fixture_directory, "dataset"),
+        uses_inception=False,
+        batch_size=BATCH_SIZE,
+        augment=False,
+    )
+
+    samples = []
+    start_time = time.perf_counter()
+    for inputs, labels in data_loaders["train"]:
+        samples.append((len(inputs), time.perf_counter() - start_time))
+        start_time = time.perf_counter()
+
+    return samples
+
+
+def benchmark_training_step(model_name):
+    def benchmark(fixture_directory, num_images):
+        import torch
+
+        from model_training import initialise_model
+
+        model, input_size = initialise_model(
+            model_name, len(CITIES), freeze_all=False, pretrained=False
+        )
+        model.train()
+        criterion = torch.nn.CrossEntropyLoss()
+        inputs = torch.randn(BATCH_SIZE, 3, input_size, input_size)
+        labels = torch.randint(0, len(CITIES), (BATCH_SIZE,))
+
+        samples = []
+        for step in range(TRAINING_STEPS + 1):
+            start_time = time.perf_counter()
+            outputs = model(inputs)
+            if isinstance(outputs, tuple):
+                outputs = outputs[0]  # InceptionV3 also returns the auxiliary outputs
+            criterion(outputs, labels).backward()
+            model.zero_grad()
+            if step > 0:  # The first step is a warm up step and is not timed
+                samples.append((BATCH_SIZE, time.perf_counter() - start_time))
+
+        return samples
+
+    return benchmark
+
+
+def benchmark_make_predictions(fixture_directory, num_images):
+    import torch
+
+    from model_evaluation import load_testing_set_and_transform, make_predictions
+    from model_training import initialise_model
+
+    model, input_size = initialise_model(
+        EVALUATION_MODEL, len(CITIES), freeze_all=False, pretrained=False
+    )
+    weights_path = os.path.join(fixture_directory, "work", "model.pth")
+    torch.save(model.state_dict(), weights_path)
+
+    testing_loader, classes = load_testing_set_and_transform(
+        os.path.join(fixture_directory, "dataset"),
+        uses_inception=False,
+        batch_size=BATCH_SIZE,
+    )
+
+    start_time = time.perf_counter()
+    metrics = make_predictions(testing_loader, classes, EVALUATION_MODEL, weights_path)
+
+    return [(metrics.num_samples, time.perf_counter() - start_time)]
+
+
+STAGES = {
+    "clean_data": benchmark_clean_data,
+    "jpeg_decode": benchmark_jpeg_decode,
+    "resize_image": benchmark_resize_image,
+    "day_night_scoring": benchmark_day_night,
+    "colour_space_conversion": benchmark_colour_space_conversion,
+    "augmentation": benchmark_augmentation,
+    "data_loader": benchmark_data_loader,
+    "make_predictions": benchmark_make_predictions,
+}
+
+
+def get_stage(stage_name: str):
+    """
+    :param stage_name: Name of a stage in STAGES, or training_step/<model_name>
+    :return: Function benchmarking the stage
+    """
+    if stage_name.startswith("training_step/"):
+        return benchmark_training_step(stage_name.split("/", 1)[1])
+
+    return STAGES[stage_name]
+
+
+def summarise_samples(samples) -> dict:
+    """
+    :param samples: List of (images processed, seconds) samples, one per call
+    :return: Throughput and call latency percentiles of the stage
+    """
+    num_images = sum(images for images, seconds in samples)
+    latencies = np.array([seconds for images, seconds in samples]) * 1000
+
+    return {
+        "num_images": int(num_images),
+        "images_per_second": num_images / latencies.sum() * 1000,
+        "latency_ms": {
+            "p50": float(np.percentile(latencies, 50)),
+            "p90": float(np.percentile(latencies, 90)),
+            "p99": float(np.percentile(latencies, 99)),
+            "max": float(latencies.max()),
+        },
+        "images_per_call": num_images / len(samples),
+    }
+
+
+def run_stage(stage_name: str, fixture_directory: str, num_images: int) -> dict:
+    """
+    This function benchmarks one stage in the current process. The output printed by the stage is discarded.
+    :param stage_name: Name of the stage
+    :param fixture_directory: Directory of the fixture
+    :param num_images: Number of images in the fixture
+    :return: Results of the stage
+    """
+    os.chdir(os.path.join(fixture_directory, "work"))
+    with contextlib.redirect_stdout(io.StringIO()):
+        samples = get_stage(stage_name)(fixture_directory, num_images)
+
+    results = summarise_samples(samples)
+    results["peak_rss_mb"] = get_peak_rss_mb()
+
+    return results
+
+
+def run_benchmark(stage_names, num_images: int) -> dict:
+    """
+    This function creates the fixture and benchmarks every stage in a separate process.
+    A stage which fails is reported with its error, and the other stages are still benchmarked.
+    :param stage_names: Names of the stages to benchmark
+    :param num_images: Number of synthetic images
+    :return: Results of every stage and a description of the machine
+    """
+    fixture_directory = tempfile.mkdtemp(prefix="stage_benchmark_")
+    try:
+        create_fixture(fixture_directory, num_images)
+
+        all_results = {}
+        for stage_name in stage_names:
+            print("Benchmarking: " + stage_name, flush=True)
+            results_path = os.path.join(fixture_directory, "results.json")
+            process = subprocess.run(
+                [
+                    sys.executable,
+                    os.path.abspath(__file__),
+                    "stage",
+                    stage_name,
+                    fixture_directory,
+                    str(num_images),
+                    results_path,
+                ],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+            )
+            if process.returncode == 0:
+                with open(results_path) as results_file:
+                    all_results[stage_name] = json.load(results_file)
+            else:
+                error = process.stderr.strip().splitlines()
+                all_results[stage_name] = {"error": error[-1] if error else "failed"}
+                print("  Failed: " + all_results[stage_name]["error"], flush=True)
+    finally:
+        shutil.rmtree(fixture_directory)
+
+    return {
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "num_images": num_images,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "stages": all_results,
+    }
+
+
+def print_results(results: dict) -> None:
+    print(
+        "{:<32} {:>12} {:>10} {:>10} {:>10} {:>10}".format(
+            "Stage", "Images/sec", "p50 (ms)", "p90 (ms)", "p99 (ms)", "RSS (MB)"
+        )
+    )
+    for stage_name, stage in results["stages"].items():
+        if "error" in stage:
+            print("{:<32} {}".format(stage_name, "failed: " + stage["error"]))
+            continue
+        print(
+            "{:<32} {:>12.1f} {:>10.2f} {:>10.2f} {:>10.2f} {:>10.1f}".format(
+                stage_name,
+                stage["images_per_second"],
+                stage["latency_ms"]["p50"],
+                stage["latency_ms"]["p90"],
+                stage["latency_ms"]["p99"],
+                stage["peak_rss_mb"],
+            )
+        )
+
+    return
+
+
+def compare_results(baseline: dict, current: dict, threshold: float) -> list:
+    """
+    This function compares two benchmark runs. A stage regresses if its throughput dropped, or its
+    p99 latency or peak RSS grew, by more than the threshold.
+    :param baseline: Results of the baseline run
+    :param current: Results of the current run
+    :param threshold: Relative change (%) above which a change is a regression
+    :return: Names of the stages which regressed
+    """
+    regressions = []
+    print(
+        "{:<32} {:>14} {:>14} {:>14}  {}".format(
+            "Stage", "Images/sec", "p99 latency", "Peak RSS", ""
+        )
+    )
+    for stage_name, stage in current["stages"].items():
+        base = baseline["stages"].get(stage_name)
+        if base is None or "error" in base or "error" in stage:
+            print("{:<32} {:>14}".format(stage_name, "not comparable"))
+            continue
+
+        changes = {
+            "throughput": (stage["images_per_second"] / base["images_per_second"] - 1)
+            * 100,
+            "latency": (stage["latency_ms"]["p99"] / base["latency_ms"]["p99"] - 1)
+            * 100,
+            "memory": (stage["peak_rss_mb"] / base["peak_rss_mb"] - 1) * 100,
+        }
+        regressed = (
+            changes["throughput"] < -threshold
+            or changes["latency"] > threshold
+            or changes["memory"] > threshold
+        )
+        if regressed:
+            regressions.append(stage_name)
+        print(
+            "{:<32} {:>+13.1f}% {:>+13.1f}% {:>+13.1f}%  {}".format(
+                stage_name,
+                changes["throughput"],
+                changes["latency"],
+                changes["memory"],
+                "REGRESSION" if regressed else "",
+            )
+        )
+
+    return regressions
+
+
+def main():
+    """
+    Usage:
+    python stage_benchmark.py run <results.json> [num_images] [model_name ...]
+    python stage_benchmark.py compare <baseline.json> <current.json> [threshold_percent]
+    A training step is benchmarked for every registered architecture if no model names are given.
+    compare exits with status 1 if any stage regressed by more than the threshold (10% by default).
+    """
+    mode = sys.argv[1]
+
+    if mode == "run":
+        import model_registry
+
+        num_images = int(sys.argv[3]) if len(sys.argv) > 3 else 64
+        model_names = sys.argv[4:] or model_registry.get_model_names()
+        stage_names = list(STAGES.keys()) + [
+            "training_step/" + model_name for model_name in model_names
+        ]
+
+        results = run_benchmark(stage_names, num_images)
+        print_results(results)
+        with open(sys.argv[2], "w") as results_file:
+            json.dump(results, results_file, indent=2)
+        print("Saved results to: " + sys.argv[2])
+
+    elif mode == "compare":
+        with open(sys.argv[2]) as baseline_file:
+            baseline = json.load(baseline_file)
+        with open(sys.argv[3]) as current_file:
+            current = json.load(current_file)
+        threshold = float(sys.argv[4]) if len(sys.argv) > 4 else 10.0
+
+        regressions = compare_results(baseline, current, threshold)
+        if regressions:
+            print("Regressed stages: " + ", ".join(regressions))
+            sys.exit(1)
+
+    elif mode == "stage":
+        # Runs a single stage, in the process started by run_benchmark()
+        results = run_stage(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+        with open(sys.argv[5], "w") as results_file:
+            json.dump(results, results_file)
+
+    else:
+        raise ValueError("mode must be one of: run, compare")
+
+    return
+
+
+if __name__ == "__main__":
+    main()
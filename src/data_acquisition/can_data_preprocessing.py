@@ -9,6 +9,9 @@ Version: 30/06/2020
 """
 import sys
 
+import matplotlib
+
+matplotlib.use("Agg")  # Plots are only saved to files, so no display is needed
 import matplotlib.pyplot as plt
 import pandas as pd
 import seaborn as sns
@@ -70,16 +73,16 @@ def data_stats_and_plots(data: pd.DataFrame, plot_name: str) -> None:
     labels = [i.replace("_", " ") for i in labels]
     num_classifications = data["CITY"].value_counts()[:15].values.tolist()
 
-    fig, ax = plt.subplots()
-    plt.figure(figsize=(12, 14))
-    plt.bar(labels, num_classifications, width=0.8, color="orange")
-    plt.xticks(rotation="vertical", size=10)
-    plt.xlabel("Cities")
-    plt.ylabel("Number of Classifications")
-    plt.title("CAN Dataset: 15 Most Classified Cities")
-    plt.savefig(
+    figure, axes = plt.subplots(figsize=(12, 14))
+    axes.bar(labels, num_classifications, width=0.8, color="orange")
+    axes.tick_params(axis="x", labelrotation=90, labelsize=10)
+    axes.set_xlabel("Cities")
+    axes.set_ylabel("Number of Classifications")
+    axes.set_title("CAN Dataset: 15 Most Classified Cities")
+    figure.savefig(
         "../visualisations/" + plot_name.split(".csv")[0] + "_most_classified.png"
     )
+    plt.close(figure)
 
     return
 
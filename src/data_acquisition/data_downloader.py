@@ -13,17 +13,22 @@ import sys
 import pandas as pd
 
 
-def download_images(csv: str) -> None:
+def download_images(csv: str, variant: str = "small") -> None:
 
     """
     This function takes a path to .csv file of labelled images and
     returns a list of images to download
     :param csv: .csv file of labelled images
+    :param variant: Image size to download - "small", or "large" for full resolution frames
+    (e.g. for tiled inference)
     """
 
     raw_csv = pd.read_csv(csv, delimiter=",")
 
-    repo = "https://eol.jsc.nasa.gov/DatabaseImages/ESC/small/"
+    if variant not in ("small", "large"):
+        raise ValueError("variant parameter must be either small or large")
+
+    repo = "https://eol.jsc.nasa.gov/DatabaseImages/ESC/" + variant + "/"
 
     for i in range(len(raw_csv)):
         mission_id = raw_csv["IMAGE"][i].split("-")[0]
@@ -54,7 +59,10 @@ def download_images(csv: str) -> None:
 
 def main():
 
-    download_images(sys.argv[1])  # Path to .csv file
+    if len(sys.argv) > 2:
+        download_images(sys.argv[1], variant=sys.argv[2])  # Path to .csv file, variant
+    else:
+        download_images(sys.argv[1])  # Path to .csv file
 
     return
 
@@ -0,0 +1,185 @@
+"""
+This program enables activation (gradient) checkpointing for the backbone stages of a model, so that
+large architectures such as ResNet-152 and VGG-19_BN can be fine-tuned with larger batches in the same memory.
+A checkpointed segment does not keep the activations of its layers for the backward pass; only its input
+is kept, and its forward pass is run again during the backward pass. More segments per stage keep more
+segment inputs but recompute less at once - the trade-off is set by checkpoint_segments in training_config.toml.
+Note that the BatchNorm layers of a recomputed segment update their running statistics a second time
+in the recomputation, which slightly changes how fast the running statistics follow the training data.
+It can also be run as a script, which reports the peak memory and step time of a training step
+with and without checkpointing.
+Version: 19/10/2026
+"""
+import functools
+import json
+import subprocess
+import sys
+import time
+
+import toml
+import torch
+import torch.nn as nn
+from torch.utils.checkpoint import checkpoint
+
+import model_registry
+from metrics_emitter import get_peak_rss_mb
+from model_training import initialise_model
+
+
+def checkpointed_forward(stage: nn.Module, forward, segments: int, inputs):
+    """
+    This function runs the forward pass of a stage with checkpointing. A Sequential stage is split into
+    segments which are checkpointed one by one, except the last one, whose activations are needed first
+    by the backward pass. Any other stage is checkpointed as a whole.
+    :param stage: Stage of the backbone
+    :param forward: Original forward function of the stage
+    :param segments: Number of segments a Sequential stage is split into
+    :param inputs: Input of the stage
+    :return: Output of the stage
+    """
+    if not (stage.training and torch.is_grad_enabled()):
+        return forward(inputs)
+
+    if not isinstance(stage, nn.Sequential):
+        # The non-reentrant variant also gives gradients when the input does not require them,
+        # e.g. when the layers before the stage are frozen
+        return checkpoint(forward, inputs, use_reentrant=False)
+
+    layers = list(stage.children())
+    segment_size = -(-len(layers) // min(segments, len(layers)))
+    for start in range(0, len(layers), segment_size):
+        segment = nn.Sequential(*layers[start : start + segment_size])
+        if start + segment_size < len(layers):
+            inputs = checkpoint(segment, inputs, use_reentrant=False)
+        else:
+            inputs = segment(inputs)
+
+    return inputs
+
+
+def enable_activation_checkpointing(
+    model: nn.Module, model_name: str, segments: int
+) -> None:
+    """
+    This function enables checkpointing for every backbone stage of the model, as listed in
+    model_registry.STAGE_PATHS. The forward function of each stage is replaced, so the weights
+    (state_dict) of the model are unchanged and can be loaded without checkpointing.
+    Checkpointing is only used when training; evaluation runs the stages as usual.
+    :param model: Model built by initialise_model()
+    :param model_name: Name of the architecture
+    :param segments: Number of checkpointed segments each Sequential stage is split into
+    :return:
+    """
+    for stage in model_registry.get_stages(model, model_name):
+        stage.forward = functools.partial(
+            checkpointed_forward, stage, stage.forward, segments
+        )
+
+    return
+
+
+def measure_training_step(
+    model_name: str, batch_size: int, segments: int, steps: int
+) -> dict:
+    """
+    This function measures the step time and peak memory of training steps on random images.
+    It should be run in a fresh process, as the peak memory of the process is reported.
+    :param model_name: Name of the architecture
+    :param batch_size: Number of images per training step
+    :param segments: Number of checkpointed segments per stage, 0 disables checkpointing
+    :param steps: Number of timed training steps, after one untimed warm up step
+    :return: Dictionary with the mean step time (s) and the peak memory (MB)
+    """
+    model, input_size = initialise_model(
+        model_name, num_classes=10, freeze_all=False, pretrained=False
+    )
+    if segments > 0:
+        enable_activation_checkpointing(model, model_name, segments)
+    device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
+    model = model.to(device).train()
+    optimizer = torch.optim.Adam(model.parameters())
+    criterion = nn.CrossEntropyLoss()
+    inputs = torch.randn(batch_size, 3, input_size, input_size, device=device)
+    labels = torch.randint(0, 10, (batch_size,), device=device)
+
+    step_times = []
+    for step in range(steps + 1):
+        start_time = time.perf_counter()
+        optimizer.zero_grad()
+        outputs = model(inputs)
+        if isinstance(outputs, tuple):
+            outputs = outputs[0]  # InceptionV3 also returns the auxiliary outputs
+        criterion(outputs, labels).backward()
+        optimizer.step()
+        if device.type == "cuda":
+            torch.cuda.synchronize()
+        if step > 0:  # The first step is a warm up step and is not timed
+            step_times.append(time.perf_counter() - start_time)
+
+    results = {
+        "step_time_s": sum(step_times) / len(step_times),
+        "peak_rss_mb": get_peak_rss_mb(),
+    }
+    if device.type == "cuda":
+        results["peak_gpu_memory_mb"] = torch.cuda.max_memory_allocated() / 1024**2
+
+    return results
+
+
+def main():
+    """
+    Usage: python activation_checkpointing.py <model_name> [batch_size]
+    Measures training steps without checkpointing, and with checkpoint_segments from training_config.toml.
+    """
+    if sys.argv[1] == "measure":
+        # Runs a single measurement, in the process started below
+        results = measure_training_step(
+            sys.argv[2], int(sys.argv[3]), int(sys.argv[4]), int(sys.argv[5])
+        )
+        print(json.dumps(results))
+        return
+
+    model_name = sys.argv[1]
+    config = toml.load("training_config.toml")
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else config["batch_size"]
+
+    all_results = {}
+    for segments in [0, config["checkpoint_segments"]]:
+        # Each measurement runs in its own process, so its peak memory is its own
+        process = subprocess.run(
+            [
+                sys.executable,
+                __file__,
+                "measure",
+                model_name,
+                str(batch_size),
+                str(segments),
+                "3",
+            ],
+            stdout=subprocess.PIPE,
+            text=True,
+            check=True,
+        )
+        all_results[segments] = json.loads(process.stdout.strip().splitlines()[-1])
+
+    print(
+        "{} with batch size {}:\n{:<28} {:>14} {:>16}".format(
+            model_name, batch_size, "", "Step time (s)", "Peak memory (MB)"
+        )
+    )
+    for segments, results in all_results.items():
+        print(
+            "{:<28} {:>14.2f} {:>16.0f}".format(
+                "Without checkpointing"
+                if segments == 0
+                else "Checkpointing ({} segments)".format(segments),
+                results["step_time_s"],
+                results.get("peak_gpu_memory_mb", results["peak_rss_mb"]),
+            )
+        )
+
+    return
+
+
+if __name__ == "__main__":
+    main()
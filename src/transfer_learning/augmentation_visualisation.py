@@ -4,10 +4,11 @@ images from the dataset which will then be fed into the CNN via dataloader
 Version: 08/08/2020
 """
 
-import matplotlib.pyplot as plt
 import numpy as np
 import torchvision
 
+from plot_rendering import PlotRenderer, render_image
+
 
 def undo_normalisation(image):
     """
@@ -24,21 +25,27 @@ def undo_normalisation(image):
     return image
 
 
-def visualise_augmented_images(image_dataset, class_names):
+def visualise_augmented_images(image_dataset, class_names, renderer=None):
     """
     This function plots the examples of augmented images.
     :param image_dataset: Dataset of images from which a data loader is built.
     :param class_names: Names of the classes in the dataset.
+    :param renderer: PlotRenderer which renders the plot. If not supplied, it is rendered straight away.
     :return:
     """
+    if renderer is None:
+        renderer = PlotRenderer()
+
     images, indices = next(iter(image_dataset["train"]))
 
     input_images = torchvision.utils.make_grid(images)
 
-    plt.figure(figsize=(10, 8))
-    plt.imshow(undo_normalisation(input_images))
-    plt.title("Batch Visualisation with Augmentation")
-    plt.axis("off")
-    plt.savefig("../visualisations/batch_visualisation/batch_transformation.png")
+    renderer.submit(
+        "../visualisations/batch_visualisation/batch_transformation.png",
+        render_image,
+        undo_normalisation(input_images),
+        "Batch Visualisation with Augmentation",
+        figure_kwargs={"figsize": (10, 8)},
+    )
 
     return
@@ -0,0 +1,318 @@
+"""
+This program classifies unlabelled ISS images in bulk, e.g. a whole archive directory tree.
+Images are decoded by a pool of DataLoader workers and classified in batches, and the
+top-k cities and probabilities of every image are streamed to a .csv or .jsonl file as they are computed.
+A checkpoint is written periodically, so an interrupted run resumes from the last checkpoint
+when the same command is run again. The checkpoint records the images, model and top-k of the run,
+so a different run to the same output is refused, and it is removed once the run finishes.
+Version: 19/10/2026
+"""
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from typing import List
+
+import toml
+import torch
+from PIL import Image
+from torch.utils.data import DataLoader, Dataset
+
+import model_registry
+from model_evaluation import get_classes, get_frame_transform, load_trained_model
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tif", ".tiff")
+
+
+class ImagePathDataset(Dataset):
+    def __init__(self, image_paths: List[str], transform, start_index: int = 0):
+        self.image_paths = image_paths
+        self.transform = transform
+        # Images before the start index were classified by a previous (interrupted) run
+        self.start_index = start_index
+
+    def __len__(self):
+        return len(self.image_paths) - self.start_index
+
+    def __getitem__(self, index):
+        index += self.start_index
+        try:
+            image = Image.open(self.image_paths[index]).convert("RGB")
+        except Exception:
+            return None, index  # Unreadable images are reported and skipped
+
+        return self.transform(image), index
+
+
+def collate_images(batch):
+    """
+    This function stacks the decoded images of a batch, leaving out the images which failed to decode.
+    :param batch: List of (image tensor or None, index) pairs
+    :return: Stacked images, indices of the decoded images, indices of the failed images
+    """
+    decoded = [(image, index) for image, index in batch if image is not None]
+    failed = [index for image, index in batch if image is None]
+    if len(decoded) == 0:
+        return None, [], failed
+
+    images = torch.stack([image for image, index in decoded])
+
+    return images, [index for image, index in decoded], failed
+
+
+def list_images(input_path: str) -> List[str]:
+    """
+    This function lists the images to classify in a fixed (sorted) order, which is required to resume runs.
+    :param input_path: Directory which is searched recursively, or a text file with one image path per line
+    :return: Sorted list of image paths
+    """
+    if os.path.isfile(input_path):
+        with open(input_path) as file_list:
+            all_images = [line.strip() for line in file_list if line.strip()]
+    else:
+        all_images = []
+        for root, directories, files in os.walk(input_path):
+            for file in files:
+                if file.lower().endswith(IMAGE_EXTENSIONS):
+                    all_images.append(os.path.join(root, file))
+
+    return sorted(all_images)
+
+
+def get_run_settings(
+    input_path: str,
+    image_paths: List[str],
+    model_name: str,
+    trained_weights: str,
+    top_k: int,
+) -> dict:
+    """
+    :param input_path: Directory or file list the images were listed from
+    :param image_paths: Sorted list of the images to classify
+    :param model_name: Name of the architecture
+    :param trained_weights: Trained model weights
+    :param top_k: Number of most probable cities written per image
+    :return: Settings which must be the same for a run to resume another run's checkpoint
+    """
+    return {
+        "input_path": os.path.abspath(input_path),
+        "num_images": len(image_paths),
+        # Adding or removing images shifts the sorted list, so the list itself must be unchanged
+        "image_list_sha256": hashlib.sha256(
+            "\n".join(image_paths).encode("utf-8")
+        ).hexdigest(),
+        "model_name": model_name,
+        "trained_weights": os.path.abspath(trained_weights),
+        "trained_weights_modified": os.path.getmtime(trained_weights),
+        "top_k": top_k,
+    }
+
+
+def write_checkpoint(
+    checkpoint_path: str, num_processed: int, output_file, run_settings: dict
+) -> None:
+    """
+    This function makes the output written so far durable and records how far the run got.
+    The checkpoint is replaced atomically so an interruption never leaves it half written.
+    :param checkpoint_path: Path to the checkpoint .json file
+    :param num_processed: Number of images (in list order) whose predictions are in the output
+    :param output_file: Open output file
+    :param run_settings: Settings of the run, returned by get_run_settings()
+    :return:
+    """
+    output_file.flush()
+    os.fsync(output_file.fileno())
+
+    temporary_path = checkpoint_path + ".tmp"
+    with open(temporary_path, "w") as checkpoint_file:
+        json.dump(
+            {
+                "num_processed": num_processed,
+                "output_size": output_file.tell(),
+                "run": run_settings,
+            },
+            checkpoint_file,
+        )
+    os.replace(temporary_path, checkpoint_path)
+
+    return
+
+
+def predict_images(
+    model,
+    classes,
+    image_paths,
+    transform,
+    output_path,
+    device,
+    batch_size,
+    num_workers,
+    top_k,
+    checkpoint_interval,
+    run_settings=None,
+) -> None:
+    """
+    This function classifies the images and streams the predictions to the output file.
+    :param model: Trained model in evaluation mode
+    :param classes: List of possible classes
+    :param image_paths: Sorted list of the images to classify
+    :param transform: Preprocessing applied to every image
+    :param output_path: Path to the .csv or .jsonl output file
+    :param device: Device on which the model runs
+    :param batch_size: Number of images per forward pass
+    :param num_workers: Number of DataLoader worker processes decoding the images
+    :param top_k: Number of most probable cities written per image
+    :param checkpoint_interval: Number of batches between checkpoints
+    :param run_settings: Settings of the run, returned by get_run_settings(). A checkpoint is only resumed
+    if it was written by a run with the same settings
+    :return:
+    """
+    checkpoint_path = output_path + ".checkpoint.json"
+    num_processed = 0
+    resuming = os.path.exists(checkpoint_path) and os.path.exists(output_path)
+    if resuming:
+        with open(checkpoint_path) as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+        if checkpoint.get("run") != run_settings:
+            raise ValueError(
+                "The checkpoint "
+                + checkpoint_path
+                + " was written by a run with different images, model or top_k. "
+                "Delete it, or write the predictions to another output file"
+            )
+        num_processed = checkpoint["num_processed"]
+        # Rows written after the last checkpoint are discarded, as those images are classified again
+        with open(output_path, "r+") as output_file:
+            output_file.truncate(checkpoint["output_size"])
+        print("Resuming after " + str(num_processed) + " images")
+
+    top_k = min(top_k, len(classes))
+    writes_csv = output_path.endswith(".csv")
+    # Without a checkpoint, any existing output is from another run, so it is overwritten
+    output_file = open(output_path, "a" if resuming else "w", newline="")
+    csv_writer = csv.writer(output_file)
+    if writes_csv and not resuming:
+        header = ["path"]
+        for rank in range(1, top_k + 1):
+            header += ["class_" + str(rank), "probability_" + str(rank)]
+        csv_writer.writerow(header)
+
+    data_loader = DataLoader(
+        ImagePathDataset(image_paths, transform, start_index=num_processed),
+        batch_size=batch_size,
+        shuffle=False,
+        num_workers=num_workers,
+        collate_fn=collate_images,
+    )
+
+    start_time = time.time()
+    num_classified = 0
+    num_failed = 0
+
+    with torch.no_grad():
+        for batch_number, (inputs, indices, failed) in enumerate(data_loader, 1):
+            for index in failed:
+                print(
+                    "\nCould not decode image: " + image_paths[index], file=sys.stderr
+                )
+            num_failed += len(failed)
+
+            if inputs is not None:
+                probabilities = torch.softmax(model(inputs.to(device)), dim=1)
+                top_probabilities, top_indices = probabilities.topk(top_k, dim=1)
+                for index, image_probabilities, image_classes in zip(
+                    indices,
+                    top_probabilities.cpu().tolist(),
+                    top_indices.cpu().tolist(),
+                ):
+                    if writes_csv:
+                        row = [image_paths[index]]
+                        for class_index, probability in zip(
+                            image_classes, image_probabilities
+                        ):
+                            row += [classes[class_index], "{:.6f}".format(probability)]
+                        csv_writer.writerow(row)
+                    else:
+                        output_file.write(
+                            json.dumps(
+                                {
+                                    "path": image_paths[index],
+                                    "classes": [classes[i] for i in image_classes],
+                                    "probabilities": image_probabilities,
+                                }
+                            )
+                            + "\n"
+                        )
+                num_classified += len(indices)
+
+            num_processed += len(indices) + len(failed)
+            if batch_number % checkpoint_interval == 0:
+                write_checkpoint(
+                    checkpoint_path, num_processed, output_file, run_settings
+                )
+
+            images_per_second = num_classified / (time.time() - start_time)
+            print(
+                "\rProcessed {}/{} images, {:.1f} images/sec".format(
+                    num_processed, len(image_paths), images_per_second
+                ),
+                end="",
+                flush=True,
+            )
+
+    output_file.close()
+    # The run is complete, so running the command again classifies the images again
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    time_elapsed = time.time() - start_time
+    print(
+        "\nClassified {} images in {:.0f}m {:.0f}s ({} could not be decoded)".format(
+            num_classified, time_elapsed // 60, time_elapsed % 60, num_failed
+        )
+    )
+
+    return
+
+
+def main():
+    """
+    Usage: python batch_prediction.py <model_name> <trained_weights.pth> <dataset_directory>
+    <image_directory_or_file_list> <output.csv|output.jsonl>
+    The dataset directory (e.g. the training set) is only used to recover the class names.
+    """
+    model_name = sys.argv[1]
+    config = toml.load("evaluation_config.toml")
+
+    input_size = model_registry.get_input_size(model_name)
+
+    device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
+    classes = get_classes(sys.argv[3])
+    model = load_trained_model(model_name, len(classes), sys.argv[2], device)
+    image_paths = list_images(sys.argv[4])
+    print("Found " + str(len(image_paths)) + " images to classify")
+    run_settings = get_run_settings(
+        sys.argv[4], image_paths, model_name, sys.argv[2], config["top_k"]
+    )
+
+    predict_images(
+        model,
+        classes,
+        image_paths,
+        get_frame_transform(input_size),  # Archive images are full size frames
+        sys.argv[5],
+        device,
+        batch_size=config["batch_size"],
+        num_workers=config["num_workers"],
+        top_k=config["top_k"],
+        checkpoint_interval=config["checkpoint_interval"],
+        run_settings=run_settings,
+    )
+
+    return
+
+
+if __name__ == "__main__":
+    main()
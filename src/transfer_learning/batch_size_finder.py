@@ -0,0 +1,210 @@
+"""
+This program finds the largest micro-batch which can be trained within a memory budget for a given
+architecture, so that the same training configuration runs on machines with different amounts of memory.
+The configured batch size is then reached by gradient accumulation over several micro-batches.
+Every probe runs a training step in a separate process, so an out of memory failure only ends the probe.
+Version: 19/10/2026
+"""
+import json
+import os
+import subprocess
+import sys
+
+import torch
+
+PROBE_SCRIPT = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "activation_checkpointing.py"
+)
+
+
+def get_memory_budget_mb(memory_fraction: float) -> float:
+    """
+    :param memory_fraction: Fraction of the memory which training may use
+    :return: Memory budget (MB) - a fraction of the GPU memory, or of the RAM when training on the CPU
+    """
+    if torch.cuda.is_available():
+        total_memory = torch.cuda.get_device_properties(0).total_memory
+    else:
+        total_memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+
+    return total_memory * memory_fraction / 1024**2
+
+
+def probe_peak_memory(model_name: str, batch_size: int, segments: int) -> float:
+    """
+    This function measures the peak memory of a training step in a separate process.
+    :param model_name: Name of the architecture
+    :param batch_size: Micro-batch size to probe
+    :param segments: Number of activation checkpointing segments per stage, 0 disables checkpointing
+    :return: Peak memory (MB), or infinity if the training step failed, e.g. ran out of memory
+    """
+    process = subprocess.run(
+        [
+            sys.executable,
+            PROBE_SCRIPT,
+            "measure",
+            model_name,
+            str(batch_size),
+            str(segments),
+            "1",
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    if process.returncode != 0:
+        return float("inf")
+
+    results = json.loads(process.stdout.strip().splitlines()[-1])
+
+    return results.get("peak_gpu_memory_mb", results["peak_rss_mb"])
+
+
+def find_micro_batch_size(
+    model_name: str, memory_budget_mb: float, max_batch_size: int, segments: int = 0
+) -> int:
+    """
+    This function finds the largest micro-batch whose training step fits in the memory budget.
+    The peak memory grows about linearly with the batch size, so the largest micro-batch is first
+    predicted from probes with 1 and 2 images, and then found by a binary search below the prediction.
+    :param model_name: Name of the architecture
+    :param memory_budget_mb: Memory budget (MB)
+    :param max_batch_size: Largest micro-batch needed, i.e. the effective batch size
+    :param segments: Number of activation checkpointing segments per stage, 0 disables checkpointing
+    :return: Largest micro-batch size which fits in the budget
+    """
+
+    def fits(batch_size):
+        peak_memory = probe_peak_memory(model_name, batch_size, segments)
+        print(
+            "Micro-batch of {}: peak memory {:.0f} MB (budget {:.0f} MB)".format(
+                batch_size, peak_memory, memory_budget_mb
+            )
+        )
+        return peak_memory <= memory_budget_mb, peak_memory
+
+    fits_one, memory_one = fits(1)
+    if not fits_one:
+        raise RuntimeError(
+            "A micro-batch of a single image does not fit in the memory budget"
+        )
+    if max_batch_size == 1:
+        return 1
+    fits_two, memory_two = fits(2)
+    if not fits_two:
+        return 1
+
+    memory_per_image = max(memory_two - memory_one, 1.0)
+    predicted = int(2 + (memory_budget_mb - memory_two) / memory_per_image)
+    low, high = 2, min(max_batch_size, max(predicted, 2))
+    if high > low and fits(high)[0]:
+        return high
+    high -= 1
+
+    while low < high:
+        middle = (low + high + 1) // 2
+        if fits(middle)[0]:
+            low = middle
+        else:
+            high = middle - 1
+
+    return low
+
+
+def plan_batches(effective_batch_size: int, max_micro_batch_size: int):
+    """
+    This function splits the effective batch into equally sized micro-batches.
+    :param effective_batch_size: Batch size per optimiser step, e.g. batch_size in training_config.toml
+    :param max_micro_batch_size: Largest micro-batch which fits in memory
+    :return: micro_batch_size, accumulation_steps
+    """
+    max_micro_batch_size = min(max_micro_batch_size, effective_batch_size)
+    accumulation_steps = -(-effective_batch_size // max_micro_batch_size)
+    micro_batch_size = -(-effective_batch_size // accumulation_steps)
+
+    return micro_batch_size, accumulation_steps
+
+
+def get_max_micro_batch_size(config: dict, model_name: str, max_batch_size: int) -> int:
+    """
+    :param config: Loaded training_config.toml
+    :param model_name: Name of the architecture
+    :param max_batch_size: Largest micro-batch needed, i.e. the effective batch size
+    :return: micro_batch_size from the configuration or, if it is 0, the largest micro-batch which fits
+    in memory_budget_fraction of the memory
+    """
+    if config["micro_batch_size"] > 0:
+        return min(config["micro_batch_size"], max_batch_size)
+
+    segments = (
+        config["checkpoint_segments"] if config["activation_checkpointing"] else 0
+    )
+
+    return find_micro_batch_size(
+        model_name,
+        get_memory_budget_mb(config["memory_budget_fraction"]),
+        max_batch_size,
+        segments,
+    )
+
+
+def get_batch_plan(config: dict, model_name: str, effective_batch_size: int):
+    """
+    This function decides the micro-batch size and the number of accumulation steps for training.
+    :param config: Loaded training_config.toml
+    :param model_name: Name of the architecture
+    :param effective_batch_size: Batch size per optimiser step
+    :return: micro_batch_size, accumulation_steps
+    """
+    micro_batch_size, accumulation_steps = plan_batches(
+        effective_batch_size,
+        get_max_micro_batch_size(config, model_name, effective_batch_size),
+    )
+    print(
+        "Batch size {} = {} accumulation steps of {} images".format(
+            effective_batch_size, accumulation_steps, micro_batch_size
+        )
+    )
+
+    return micro_batch_size, accumulation_steps
+
+
+def main():
+    """
+    Usage: python batch_size_finder.py <model_name> [memory_budget_gb]
+    Without a memory budget, memory_budget_fraction of the memory from training_config.toml is used.
+    """
+    import toml
+
+    model_name = sys.argv[1]
+    config = toml.load("training_config.toml")
+    if len(sys.argv) > 2:
+        memory_budget_mb = float(sys.argv[2]) * 1024
+    else:
+        memory_budget_mb = get_memory_budget_mb(config["memory_budget_fraction"])
+    segments = (
+        config["checkpoint_segments"] if config["activation_checkpointing"] else 0
+    )
+
+    micro_batch_size = find_micro_batch_size(
+        model_name, memory_budget_mb, config["batch_size"], segments
+    )
+    print(
+        "Largest micro-batch for {} within {:.0f} MB: {}".format(
+            model_name, memory_budget_mb, micro_batch_size
+        )
+    )
+    micro_batch_size, accumulation_steps = plan_batches(
+        config["batch_size"], micro_batch_size
+    )
+    print(
+        "Batch size {} = {} accumulation steps of {} images".format(
+            config["batch_size"], accumulation_steps, micro_batch_size
+        )
+    )
+
+    return
+
+
+if __name__ == "__main__":
+    main()
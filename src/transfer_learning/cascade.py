@@ -0,0 +1,241 @@
+"""
+This program performs cascade inference: every image is classified by a fast model first, and only
+the images on which the fast model is not confident enough are escalated to a heavier, more accurate
+model (e.g. ResNet-152). The confidence threshold is calibrated on the validation set as the lowest
+threshold (fewest escalations) which reaches a target accuracy. Escalated images are collected into
+full batches before the heavy model is run on them.
+The report shows the accuracy, the fraction of images escalated and the effective throughput.
+Version: 19/10/2026
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import toml
+import torch
+
+import model_registry
+from model_evaluation import (
+    create_confusion_matrix,
+    load_multi_crop_set,
+    load_trained_model,
+)
+from streaming_metrics import ClassificationMetrics
+
+
+def collect_validation_outputs(
+    fast_model, heavy_model, data_loader, input_sizes, device
+):
+    """
+    This function runs both models over the validation set.
+    :param fast_model: Fast model in evaluation mode
+    :param heavy_model: Heavy model in evaluation mode
+    :param data_loader: Multi crop data loader over the validation set
+    :param input_sizes: Input sizes of the fast and heavy model
+    :param device: Device on which the models run
+    :return: Confidence of the fast model, and whether each model classified each image correctly
+    """
+    fast_confidence, fast_correct, heavy_correct = [], [], []
+    with torch.no_grad():
+        for crops, labels in data_loader:
+            probabilities = torch.softmax(
+                fast_model(crops[input_sizes[0]].to(device)), dim=1
+            ).cpu()
+            confidence, predictions = probabilities.max(dim=1)
+            heavy_predictions = heavy_model(crops[input_sizes[1]].to(device)).argmax(1)
+
+            fast_confidence.append(confidence.numpy())
+            fast_correct.append((predictions == labels).numpy())
+            heavy_correct.append((heavy_predictions.cpu() == labels).numpy())
+
+    return (
+        np.concatenate(fast_confidence),
+        np.concatenate(fast_correct),
+        np.concatenate(heavy_correct),
+    )
+
+
+def calibrate_threshold(fast_confidence, fast_correct, heavy_correct, target_accuracy):
+    """
+    This function finds the lowest confidence threshold which reaches the target accuracy.
+    Escalating the k least confident images gives an accuracy of (correct fast predictions
+    on the remaining images + correct heavy predictions on the k escalated images) / n,
+    which is computed for every k at once with cumulative sums.
+    :param fast_confidence: Top-1 probability of the fast model for every validation image
+    :param fast_correct: True where the fast model is correct
+    :param heavy_correct: True where the heavy model is correct
+    :param target_accuracy: Target Top-1 accuracy (%)
+    :return: Confidence threshold (images below it are escalated) and the validation accuracy it gives
+    """
+    order = np.argsort(fast_confidence)  # Least confident images are escalated first
+    confidence = fast_confidence[order]
+    num_images = len(confidence)
+
+    heavy_escalated = np.concatenate([[0], np.cumsum(heavy_correct[order])])
+    fast_kept = fast_correct[order].sum() - np.concatenate(
+        [[0], np.cumsum(fast_correct[order])]
+    )
+    accuracy = (heavy_escalated + fast_kept) / num_images * 100  # For k = 0 ... n
+
+    reaches_target = np.flatnonzero(accuracy >= target_accuracy)
+    if len(reaches_target) > 0:
+        num_escalated = reaches_target[0]
+    else:
+        num_escalated = int(np.argmax(accuracy))
+        print(
+            "Target accuracy of {:.2f}% cannot be reached, using the most accurate threshold".format(
+                target_accuracy
+            )
+        )
+
+    if num_escalated == num_images:
+        threshold = np.inf
+    else:
+        threshold = float(confidence[num_escalated])
+
+    return threshold, accuracy[num_escalated]
+
+
+def cascade_predict(
+    fast_model, heavy_model, data_loader, classes, input_sizes, threshold, device
+):
+    """
+    This function classifies the testing set with the cascade.
+    Escalated images are buffered and passed to the heavy model in full batches.
+    :param fast_model: Fast model in evaluation mode
+    :param heavy_model: Heavy model in evaluation mode
+    :param data_loader: Multi crop data loader over the testing set
+    :param classes: List of possible classes
+    :param input_sizes: Input sizes of the fast and heavy model
+    :param threshold: Images whose fast model confidence is below the threshold are escalated
+    :param device: Device on which the models run
+    :return: metrics, number of escalated images, time spent in the heavy model (s)
+    """
+    metrics = ClassificationMetrics(classes)
+    top_k = min(5, len(classes))
+    escalated_images, escalated_labels = [], []
+    num_escalated = 0
+    heavy_time = 0.0
+
+    def update_metrics(outputs, labels):
+        top_5 = outputs.topk(top_k, dim=1)[1].cpu()
+        metrics.update(
+            labels.numpy(),
+            outputs.argmax(dim=1).cpu().numpy(),
+            (top_5 == labels.unsqueeze(1)).any(dim=1).numpy(),
+        )
+
+    def run_heavy_model():
+        start_time = time.perf_counter()
+        outputs = heavy_model(torch.cat(escalated_images).to(device))
+        update_metrics(outputs, torch.cat(escalated_labels))
+        escalated_images.clear()
+        escalated_labels.clear()
+
+        return time.perf_counter() - start_time
+
+    with torch.no_grad():
+        for crops, labels in data_loader:
+            outputs = fast_model(crops[input_sizes[0]].to(device))
+            confidence = torch.softmax(outputs, dim=1).max(dim=1)[0].cpu()
+            escalate = confidence < threshold
+
+            update_metrics(outputs[~escalate.to(device)], labels[~escalate])
+            if escalate.any():
+                escalated_images.append(crops[input_sizes[1]][escalate])
+                escalated_labels.append(labels[escalate])
+                num_escalated += int(escalate.sum())
+
+            if sum(len(batch) for batch in escalated_labels) >= data_loader.batch_size:
+                heavy_time += run_heavy_model()
+
+        if len(escalated_labels) > 0:
+            heavy_time += run_heavy_model()
+
+    return metrics, num_escalated, heavy_time
+
+
+def main():
+    """
+    Usage: python cascade.py <dataset_directory> <fast_model_name> <fast_weights.pth>
+    <heavy_model_name> <heavy_weights.pth> [target_accuracy]
+    The dataset directory must contain the validation/ and test/ sets.
+    """
+    dataset_path = sys.argv[1]
+    model_names = [sys.argv[2], sys.argv[4]]
+    config = toml.load("evaluation_config.toml")
+    if len(sys.argv) > 6:
+        target_accuracy = float(sys.argv[6])
+    else:
+        target_accuracy = config["cascade_target_accuracy"]
+
+    input_sizes = [model_registry.get_input_size(name) for name in model_names]
+    validation_loader, classes = load_multi_crop_set(
+        os.path.join(dataset_path, "validation"), input_sizes, config["batch_size"]
+    )
+    testing_loader, classes = load_multi_crop_set(
+        os.path.join(dataset_path, "test"), input_sizes, config["batch_size"]
+    )
+
+    device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
+    fast_model = load_trained_model(model_names[0], len(classes), sys.argv[3], device)
+    heavy_model = load_trained_model(model_names[1], len(classes), sys.argv[5], device)
+
+    print("Calibrating the confidence threshold on the validation set...")
+    fast_confidence, fast_correct, heavy_correct = collect_validation_outputs(
+        fast_model, heavy_model, validation_loader, input_sizes, device
+    )
+    threshold, validation_accuracy = calibrate_threshold(
+        fast_confidence, fast_correct, heavy_correct, target_accuracy
+    )
+    print(
+        "Threshold: {:.4f} (validation accuracy - fast: {:.2f}%, heavy: {:.2f}%, cascade: {:.2f}%)".format(
+            threshold,
+            fast_correct.mean() * 100,
+            heavy_correct.mean() * 100,
+            validation_accuracy,
+        )
+    )
+
+    start_time = time.perf_counter()
+    metrics, num_escalated, heavy_time = cascade_predict(
+        fast_model,
+        heavy_model,
+        testing_loader,
+        classes,
+        input_sizes,
+        threshold,
+        device,
+    )
+    time_elapsed = time.perf_counter() - start_time
+
+    print("Testing accuracy (Top-1): {:.2f}".format(metrics.top_1_accuracy))
+    print("Testing accuracy (Top-5): {:.2f}".format(metrics.top_5_accuracy))
+    print(
+        "Escalated {} of {} images ({:.1f}%) to {}".format(
+            num_escalated,
+            metrics.num_samples,
+            num_escalated / metrics.num_samples * 100,
+            model_names[1],
+        )
+    )
+    print(
+        "Effective throughput: {:.1f} images/sec ({} alone: {:.1f} images/sec)".format(
+            metrics.num_samples / time_elapsed,
+            model_names[1],
+            num_escalated / heavy_time if heavy_time > 0 else float("nan"),
+        )
+    )
+
+    create_confusion_matrix(
+        metrics,
+        generate_report=True,
+        title=model_names[0] + "_" + model_names[1] + "_cascade",
+    )
+
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,16 @@
 """
 This program undertakes the processing of classification reports
 which are generated by Scikit Learn during classification evaluation.
+Several reports can be supplied at once, in which case their plots are rendered in parallel.
 Version: 11/08/2020
 """
+import os
 import sys
 
-import matplotlib.pyplot as plt
-import numpy as np
 import pandas as pd
 
+from plot_rendering import PlotRenderer, render_bars
+
 
 def load_report(csv_path: str) -> pd.DataFrame:
     """
@@ -31,13 +33,17 @@ def load_report(csv_path: str) -> pd.DataFrame:
     return classification_report
 
 
-def plot_f1(classification_report: pd.DataFrame, csv_name: str) -> None:
+def plot_f1(classification_report: pd.DataFrame, csv_name: str, renderer=None) -> None:
     """
     This function plots a bar chart of the F1 score.
     :param classification_report: Classification report Pandas DataFrame.
     :param csv_name: Path to .csv taken from standard input is processed into a plot name.
+    :param renderer: PlotRenderer which renders the plot. If not supplied, it is rendered straight away.
     :return:
     """
+    if renderer is None:
+        renderer = PlotRenderer(style="ggplot")
+
     name = (
         csv_name.split("/")[2].split("_")[0]
         + " "
@@ -51,28 +57,39 @@ def plot_f1(classification_report: pd.DataFrame, csv_name: str) -> None:
             + csv_name.split("_")[2].upper()
             + " F1 Score"
         )
-    plt.figure(figsize=(10, 5))
-    plt.tight_layout()
-    bars = np.arange(len(classification_report))
-    plt.bar(bars, classification_report["F1_Score"], width=0.9, color="orange")
-    plt.title(name)
-    plt.xticks(bars, classification_report["Cities"], rotation=90, fontsize=5)
-    plt.ylabel("F1 Score")
-    plt.xlabel("Cities")
-    plt.xlim(-0.5, len(classification_report["Cities"]) - 0.5)
-    plt.savefig(
+    renderer.submit(
         "../visualisations/f1_scores/" + name.replace(" ", "_") + ".png",
-        bbox_inches="tight",
+        render_bars,
+        classification_report["Cities"].tolist(),
+        classification_report["F1_Score"].tolist(),
+        "Cities",
+        "F1 Score",
+        name,
+        fontsize=5,
+        figure_kwargs={"figsize": (10, 5)},
+        savefig_kwargs={"bbox_inches": "tight"},
     )
 
     return
 
 
 def main():
-    plt.style.use("ggplot")
-
-    classification_report = load_report(sys.argv[1])
-    plot_f1(classification_report=classification_report, csv_name=sys.argv[1])
+    """
+    Usage: python classification_reporting.py <report.csv> [<report.csv> ...]
+    """
+    csv_paths = sys.argv[1:]
+    renderer = PlotRenderer(
+        num_workers=min(len(csv_paths), os.cpu_count()) if len(csv_paths) > 1 else 0,
+        style="ggplot",
+    )
+    for csv_path in csv_paths:
+        classification_report = load_report(csv_path)
+        plot_f1(
+            classification_report=classification_report,
+            csv_name=csv_path,
+            renderer=renderer,
+        )
+    renderer.close()
 
     return
 
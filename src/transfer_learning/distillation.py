@@ -0,0 +1,214 @@
+"""
+This program trains a lightweight student network (ResNet-18, MobileNetV3 or EfficientNet-B0) by
+knowledge distillation from a trained teacher network (e.g. ResNet-152 or InceptionV3).
+The student learns from the teacher's soft targets, softened by a temperature, as well as from the true labels.
+The teacher's outputs over the training set are computed once and cached, so the teacher
+is never run during the training epochs.
+Version: 19/10/2026
+"""
+import os
+import sys
+
+import toml
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+import torch.optim as optim
+import torchvision as vision
+from torch.utils.data import DataLoader
+
+import model_registry
+from model_complexity import count_flops, count_parameters
+from model_evaluation import (
+    get_test_transform,
+    load_testing_set_and_transform,
+    load_trained_model,
+    make_predictions,
+)
+from model_training import (
+    load_dataset_and_transforms,
+    initialise_model,
+    get_parameters_to_learn,
+    train_model,
+)
+from lr_scheduling import create_scheduler
+from sample_selection import IndexedDataset
+
+
+class DistillationLoss(nn.Module):
+    def __init__(self, temperature: float, alpha: float):
+        """
+        :param temperature: Softens the teacher and student outputs, so the student also learns which
+        wrong cities the teacher considers similar to the true one
+        :param alpha: Weight of the distillation loss, the true label loss is weighted by 1 - alpha
+        """
+        super().__init__()
+        self.temperature = temperature
+        self.alpha = alpha
+
+    def forward(self, outputs, labels, teacher_logits=None):
+        hard_loss = F.cross_entropy(outputs, labels)
+        if teacher_logits is None:
+            return hard_loss  # Validation loss is measured against the true labels only
+
+        soft_loss = F.kl_div(
+            F.log_softmax(outputs / self.temperature, dim=1),
+            F.softmax(teacher_logits / self.temperature, dim=1),
+            reduction="batchmean",
+        )
+        # Scaling by T^2 keeps the gradient magnitude independent of the temperature
+        soft_loss = soft_loss * self.temperature**2
+
+        return self.alpha * soft_loss + (1 - self.alpha) * hard_loss
+
+
+def cache_teacher_logits(
+    teacher_name, teacher_weights, training_set_path, classes, batch_size, device
+) -> torch.Tensor:
+    """
+    This function runs the teacher once over the training set (without augmentation) and caches
+    its outputs to disk, in the order of the training ImageFolder.
+    :param teacher_name: Architecture of the teacher
+    :param teacher_weights: Path to the trained teacher weights
+    :param training_set_path: Path to the training set
+    :param classes: List of possible classes
+    :param batch_size: Batch size used when running the teacher
+    :param device: Device on which the teacher runs
+    :return: Teacher outputs, one row per training image
+    """
+    cache_path = teacher_weights.replace(".pth", "") + "_teacher_logits.pt"
+
+    input_size = model_registry.get_input_size(teacher_name)
+
+    training_set = vision.datasets.ImageFolder(
+        training_set_path, get_test_transform(input_size)
+    )
+
+    if os.path.exists(cache_path):
+        teacher_logits = torch.load(cache_path)
+        if teacher_logits.shape == (len(training_set), len(classes)):
+            print("Loaded cached teacher outputs from: " + cache_path)
+            return teacher_logits
+
+    teacher = load_trained_model(teacher_name, len(classes), teacher_weights, device)
+    data_loader = DataLoader(
+        training_set, batch_size=batch_size, shuffle=False, num_workers=4
+    )
+
+    teacher_logits = []
+    with torch.no_grad():
+        for inputs, labels in data_loader:
+            teacher_logits.append(teacher(inputs.to(device)).cpu())
+    teacher_logits = torch.cat(teacher_logits)
+
+    torch.save(teacher_logits, cache_path)
+    print("Cached teacher outputs to: " + cache_path)
+
+    return teacher_logits
+
+
+def main():
+    """
+    Usage: python distillation.py <student_name> <teacher_name> <teacher_weights.pth>
+    """
+    student_name = sys.argv[1]
+    teacher_name = sys.argv[2]
+    teacher_weights = sys.argv[3]
+    dataset_path = "../iss_image_data/experiment3/"
+
+    config = toml.load("training_config.toml")
+
+    data_loaders, classes = load_dataset_and_transforms(
+        dataset_path,
+        uses_inception=False,
+        augment=True,
+        batch_size=config["batch_size"],
+    )
+    data_loaders["train"] = DataLoader(
+        IndexedDataset(data_loaders["train"].dataset),
+        batch_size=config["batch_size"],
+        shuffle=True,
+        num_workers=4,
+    )
+
+    device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
+    print("Device being used for training: " + str(device))
+
+    teacher_logits = cache_teacher_logits(
+        teacher_name,
+        teacher_weights,
+        os.path.join(dataset_path, "train"),
+        classes,
+        config["batch_size"],
+        device,
+    )
+
+    model, input_size = initialise_model(
+        student_name,
+        len(classes),
+        freeze_all=config["training_mode"] == "feature_extraction",
+    )
+    parameters_to_learn = get_parameters_to_learn(
+        model, training_mode=config["training_mode"]
+    )
+    model = model.to(device)
+    optimizer = optim.Adam(
+        parameters_to_learn,
+        lr=config["learning_rate"],
+        weight_decay=config["weight_decay"],
+    )
+    criterion = DistillationLoss(
+        temperature=config["distillation_temperature"],
+        alpha=config["distillation_alpha"],
+    )
+
+    print("\nStarting distillation from " + teacher_name + " into " + student_name)
+    train_model(
+        model,
+        data_loaders,
+        device,
+        criterion,
+        optimizer,
+        student_name,
+        uses_inception=False,
+        epochs=config["epochs"],
+        teacher_logits=teacher_logits,
+        scheduler=create_scheduler(config, optimizer, len(data_loaders["train"])),
+    )
+
+    # Compares the student with the teacher on the testing set
+    results = {}
+    for name, weights in [
+        (teacher_name, teacher_weights),
+        (student_name, "models_trained/" + student_name + "_model.pth"),
+    ]:
+        print("\nEvaluating: " + name)
+        testing_loader, classes = load_testing_set_and_transform(
+            dataset_path, uses_inception=name == "InceptionV3"
+        )
+        network_input_size = model_registry.get_input_size(name)
+        metrics = make_predictions(testing_loader, classes, name, weights)
+        network = load_trained_model(name, len(classes), weights, torch.device("cpu"))
+        results[name] = (
+            metrics.top_5_accuracy,
+            count_flops(network, network_input_size),
+            count_parameters(network),
+        )
+
+    teacher_results, student_results = results[teacher_name], results[student_name]
+    print(
+        "\nStudent retains {:.1f}% of the teacher's Top-5 accuracy using {:.1f}% of its FLOPs "
+        "({:.2f} vs {:.2f} GFLOPs) and {:.1f}% of its parameters".format(
+            student_results[0] / max(teacher_results[0], 1e-9) * 100,
+            student_results[1] / teacher_results[1] * 100,
+            student_results[1] / 1e9,
+            teacher_results[1] / 1e9,
+            student_results[2] / teacher_results[2] * 100,
+        )
+    )
+
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,570 @@
+"""
+This program builds a vector index of ISS images, so that the archive frames most similar to a query image
+can be retrieved. The penultimate layer of a trained model is used as the embedding of every image.
+The index supports exact (brute force) search, and approximate search with an inverted file of
+product quantised codes (IVF-PQ), which only visits a few clusters of the catalogue and compares
+compact codes instead of the full embeddings. The index is stored on disk in the index directory:
+    embeddings.npy - L2 normalised embeddings of the catalogue (memory mapped for exact search)
+    paths.txt - path of the image of every embedding
+    ivfpq.npz - coarse centroids, product quantiser codebooks and the inverted lists of codes
+    index.json - model used to extract the embeddings
+Version: 19/10/2026
+"""
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import toml
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader
+
+import model_registry
+from batch_prediction import ImagePathDataset, collate_images, list_images
+from model_evaluation import get_classes, get_test_transform, load_trained_model
+
+# Number of catalogue embeddings processed at once, which bounds the memory used by searching and encoding
+CHUNK_SIZE = 65536
+
+
+def load_embedding_model(model_name, num_classes, trained_weights, device):
+    """
+    This function loads a trained model whose classification head is removed, so that it outputs
+    the penultimate layer features.
+    :param model_name: Name of the architecture
+    :param num_classes: Number of classes the model was trained on
+    :param trained_weights: Trained model weights (.pth)
+    :param device: Device on which the model runs
+    :return: Model in evaluation mode
+    """
+    if trained_weights.endswith(".pt"):
+        raise ValueError("Embeddings can only be extracted from .pth model weights")
+
+    model = load_trained_model(model_name, num_classes, trained_weights, device)
+    model_registry.set_head(model, model_name, nn.Identity())
+
+    return model
+
+
+def extract_embeddings(
+    model, image_paths, transform, embeddings_path, device, batch_size, num_workers
+):
+    """
+    This function extracts the L2 normalised embedding of every image and writes them to a .npy file,
+    one row per image, without holding all of them in memory.
+    :param model: Model returned by load_embedding_model()
+    :param image_paths: Sorted list of the catalogue images
+    :param transform: Preprocessing applied to every image
+    :param embeddings_path: Path to the output .npy file
+    :param device: Device on which the model runs
+    :param batch_size: Number of images per forward pass
+    :param num_workers: Number of DataLoader worker processes decoding the images
+    :return: Paths of the images which were decoded, in the order of the embeddings
+    """
+    data_loader = DataLoader(
+        ImagePathDataset(image_paths, transform),
+        batch_size=batch_size,
+        shuffle=False,
+        num_workers=num_workers,
+        collate_fn=collate_images,
+    )
+
+    embeddings = None
+    embedded_paths = []
+    with torch.no_grad():
+        for inputs, indices, failed in data_loader:
+            for index in failed:
+                print("Could not decode image: " + image_paths[index], file=sys.stderr)
+            if inputs is None:
+                continue
+
+            features = model(inputs.to(device)).flatten(1)
+            features = nn.functional.normalize(features, dim=1).cpu().numpy()
+            if embeddings is None:
+                embeddings = np.lib.format.open_memmap(
+                    embeddings_path,
+                    mode="w+",
+                    dtype=np.float32,
+                    shape=(len(image_paths), features.shape[1]),
+                )
+            embeddings[
+                len(embedded_paths) : len(embedded_paths) + len(indices)
+            ] = features
+            embedded_paths += [image_paths[index] for index in indices]
+
+            print(
+                "\rEmbedded {}/{} images".format(len(embedded_paths), len(image_paths)),
+                end="",
+                flush=True,
+            )
+    print()
+
+    if len(embedded_paths) == 0:
+        raise ValueError(
+            "None of the " + str(len(image_paths)) + " images could be decoded"
+        )
+
+    if len(embedded_paths) < len(image_paths):
+        # Leaves out the rows reserved for the images which could not be decoded
+        trimmed_path = embeddings_path + ".tmp.npy"
+        trimmed = np.lib.format.open_memmap(
+            trimmed_path,
+            mode="w+",
+            dtype=np.float32,
+            shape=(len(embedded_paths), embeddings.shape[1]),
+        )
+        for start in range(0, len(embedded_paths), CHUNK_SIZE):
+            trimmed[start : start + CHUNK_SIZE] = embeddings[
+                start : min(start + CHUNK_SIZE, len(embedded_paths))
+            ]
+        trimmed.flush()
+        del embeddings, trimmed
+        os.replace(trimmed_path, embeddings_path)
+    else:
+        embeddings.flush()
+
+    return embedded_paths
+
+
+def exact_search(embeddings, query, k):
+    """
+    This function finds the k nearest embeddings to the query by comparing it with every embedding.
+    As the embeddings are L2 normalised, the nearest embeddings are those with the highest cosine similarity.
+    :param embeddings: Catalogue embeddings, e.g. memory mapped from embeddings.npy
+    :param query: L2 normalised query embedding
+    :param k: Number of neighbours
+    :return: Indices of the k nearest embeddings and their squared L2 distances to the query
+    """
+    best_indices = np.empty(0, dtype=np.int64)
+    best_similarities = np.empty(0, dtype=np.float32)
+    for start in range(0, len(embeddings), CHUNK_SIZE):
+        similarities = np.asarray(embeddings[start : start + CHUNK_SIZE]) @ query
+        candidates = np.argpartition(-similarities, min(k, len(similarities)) - 1)[:k]
+        best_indices = np.concatenate([best_indices, candidates + start])
+        best_similarities = np.concatenate(
+            [best_similarities, similarities[candidates]]
+        )
+        keep = np.argsort(-best_similarities, kind="stable")[:k]
+        best_indices, best_similarities = best_indices[keep], best_similarities[keep]
+
+    return best_indices, 2 - 2 * best_similarities
+
+
+def kmeans(data, num_clusters, iterations, rng):
+    """
+    This function clusters the data with Lloyd's k-means algorithm.
+    :param data: Training vectors, one per row
+    :param num_clusters: Number of clusters
+    :param iterations: Number of k-means iterations
+    :param rng: NumPy random generator used to initialise the centroids
+    :return: Centroids, one per row
+    """
+    centroids = data[rng.choice(len(data), num_clusters, replace=False)].copy()
+    for i in range(iterations):
+        assignments = assign_to_centroids(data, centroids)
+        counts = np.bincount(assignments, minlength=num_clusters)
+        empty = counts == 0
+        # Sums the vectors of every cluster in one pass over the vectors sorted by cluster
+        order = np.argsort(assignments, kind="stable")
+        cluster_starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[~empty]
+        sums = np.add.reduceat(data[order], cluster_starts, axis=0)
+        centroids[~empty] = sums / counts[~empty, None]
+        # Empty clusters are restarted from random training vectors
+        centroids[empty] = data[rng.choice(len(data), int(empty.sum()))]
+
+    return centroids
+
+
+def assign_to_centroids(data, centroids):
+    """
+    :param data: Vectors, one per row
+    :param centroids: Centroids, one per row
+    :return: Index of the nearest centroid of every vector
+    """
+    # ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2, and ||x||^2 does not change the nearest centroid
+    centroid_norms = (centroids**2).sum(axis=1)
+    assignments = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), CHUNK_SIZE):
+        distances = centroid_norms - 2 * data[start : start + CHUNK_SIZE] @ centroids.T
+        assignments[start : start + CHUNK_SIZE] = distances.argmin(axis=1)
+
+    return assignments
+
+
+class IVFPQIndex:
+    def __init__(self, coarse_centroids, codebooks, codes, ids, list_offsets):
+        """
+        Approximate nearest neighbour index. Every embedding is assigned to its nearest coarse centroid,
+        and its residual from that centroid is split into subvectors, each encoded by the index
+        (one byte) of its nearest codeword in the codebook of the subspace.
+        :param coarse_centroids: Coarse centroids, of shape (lists, dimensions)
+        :param codebooks: Product quantiser codebooks, of shape (subquantisers, codewords, subvector dimensions),
+        with at most 256 codewords
+        :param codes: Codes of the embeddings, grouped by inverted list, of shape (embeddings, subquantisers)
+        :param ids: Index in the catalogue of every code
+        :param list_offsets: Codes of inverted list i are codes[list_offsets[i]:list_offsets[i + 1]]
+        """
+        self.coarse_centroids = coarse_centroids
+        self.codebooks = codebooks
+        self.codes = codes
+        self.ids = ids
+        self.list_offsets = list_offsets
+
+    @property
+    def padded_dimensions(self):
+        return self.codebooks.shape[0] * self.codebooks.shape[2]
+
+    def split(self, vectors):
+        """
+        :param vectors: Vectors, one per row (zero padded if the dimensions are not divisible
+        by the number of subquantisers)
+        :return: Subvectors, of shape (vectors, subquantisers, subvector dimensions)
+        """
+        padding = self.padded_dimensions - vectors.shape[1]
+        vectors = np.pad(vectors, ((0, 0), (0, padding)))
+
+        return vectors.reshape(len(vectors), self.codebooks.shape[0], -1)
+
+    def encode(self, residuals):
+        """
+        :param residuals: Residuals of the embeddings from their coarse centroids
+        :return: Codes of the residuals, of shape (residuals, subquantisers)
+        """
+        subvectors = self.split(residuals)
+        codes = np.empty(subvectors.shape[:2], dtype=np.uint8)
+        for j, codebook in enumerate(self.codebooks):
+            codes[:, j] = assign_to_centroids(subvectors[:, j], codebook)
+
+        return codes
+
+    @classmethod
+    def build(
+        cls,
+        embeddings,
+        num_lists,
+        num_subquantisers,
+        iterations,
+        training_size=65536,
+        seed=0,
+    ):
+        """
+        This function trains the coarse quantiser and the product quantiser on a random sample of the
+        embeddings, and then encodes every embedding into its inverted list.
+        :param embeddings: Catalogue embeddings, e.g. memory mapped from embeddings.npy
+        :param num_lists: Number of inverted lists (coarse clusters)
+        :param num_subquantisers: Number of subvectors every embedding is split into (bytes per code)
+        :param iterations: Number of k-means iterations
+        :param training_size: Number of embeddings the quantisers are trained on
+        :param seed: Seed of the training sample and of the k-means initialisation
+        :return: IVFPQIndex
+        """
+        rng = np.random.default_rng(seed)
+        sample = np.sort(
+            rng.choice(len(embeddings), min(training_size, len(embeddings)), False)
+        )
+        training_data = np.asarray(embeddings[sample], dtype=np.float32)
+
+        coarse_centroids = kmeans(
+            training_data, min(num_lists, len(training_data)), iterations, rng
+        )
+        residuals = (
+            training_data
+            - coarse_centroids[assign_to_centroids(training_data, coarse_centroids)]
+        )
+
+        # With fewer than 256 training vectors, the codebooks only have one codeword per vector, as any
+        # further codewords would never be trained
+        num_codewords = min(256, len(training_data))
+        index = cls(
+            coarse_centroids,
+            np.zeros(
+                (
+                    num_subquantisers,
+                    num_codewords,
+                    -(-embeddings.shape[1] // num_subquantisers),
+                ),
+                dtype=np.float32,
+            ),
+            None,
+            None,
+            None,
+        )
+        subvectors = index.split(residuals)
+        for j in range(num_subquantisers):
+            index.codebooks[j] = kmeans(
+                subvectors[:, j], num_codewords, iterations, rng
+            )
+
+        # Encodes the catalogue in chunks, so memory mapped embeddings are never loaded at once
+        all_lists, all_codes = [], []
+        for start in range(0, len(embeddings), CHUNK_SIZE):
+            chunk = np.asarray(embeddings[start : start + CHUNK_SIZE], dtype=np.float32)
+            lists = assign_to_centroids(chunk, coarse_centroids)
+            all_lists.append(lists)
+            all_codes.append(index.encode(chunk - coarse_centroids[lists]))
+        lists = np.concatenate(all_lists)
+
+        order = np.argsort(lists, kind="stable")
+        index.codes = np.concatenate(all_codes)[order]
+        index.ids = order
+        index.list_offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(lists, minlength=len(coarse_centroids)))]
+        )
+
+        return index
+
+    def search(self, query, k, num_probes, embeddings=None, num_reranked=0):
+        """
+        This function finds the approximate k nearest embeddings to the query. Only the inverted lists
+        of the num_probes coarse centroids nearest to the query are visited, and the distances to their
+        codes are computed from a table of the distances between the query and every codeword.
+        Optionally, the num_reranked nearest codes are re-ranked by their exact distances to the query.
+        :param query: L2 normalised query embedding
+        :param k: Number of neighbours
+        :param num_probes: Number of inverted lists visited
+        :param embeddings: Catalogue embeddings, only needed for re-ranking
+        :param num_reranked: Number of candidates re-ranked with the exact embeddings (0 disables re-ranking)
+        :return: Indices of the k nearest embeddings and their squared L2 distances to the query
+        (approximate unless re-ranked)
+        """
+        coarse_distances = ((self.coarse_centroids - query) ** 2).sum(axis=1)
+        probes = np.argsort(coarse_distances)[:num_probes]
+
+        all_ids, all_distances = [], []
+        for list_index in probes:
+            start, end = (
+                self.list_offsets[list_index],
+                self.list_offsets[list_index + 1],
+            )
+            if start == end:
+                continue
+            residual = self.split((query - self.coarse_centroids[list_index])[None])[0]
+            # Squared distance between every query subvector and every codeword of its subspace
+            distance_table = ((self.codebooks - residual[:, None, :]) ** 2).sum(axis=2)
+            codes = self.codes[start:end]
+            all_distances.append(
+                distance_table[np.arange(len(distance_table)), codes].sum(axis=1)
+            )
+            all_ids.append(self.ids[start:end])
+
+        if len(all_ids) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        all_ids, all_distances = np.concatenate(all_ids), np.concatenate(all_distances)
+        if embeddings is not None and num_reranked > k:
+            candidates = np.argsort(all_distances, kind="stable")[:num_reranked]
+            # Sorted ids read memory mapped embeddings in file order
+            all_ids = np.sort(all_ids[candidates])
+            all_distances = 2 - 2 * (np.asarray(embeddings[all_ids]) @ query)
+        nearest = np.argsort(all_distances, kind="stable")[:k]
+
+        return all_ids[nearest], all_distances[nearest]
+
+    def save(self, index_path):
+        np.savez(
+            index_path,
+            coarse_centroids=self.coarse_centroids,
+            codebooks=self.codebooks,
+            codes=self.codes,
+            ids=self.ids,
+            list_offsets=self.list_offsets,
+        )
+
+        return
+
+    @classmethod
+    def load(cls, index_path):
+        index_file = np.load(index_path)
+
+        return cls(
+            index_file["coarse_centroids"],
+            index_file["codebooks"],
+            index_file["codes"],
+            index_file["ids"],
+            index_file["list_offsets"],
+        )
+
+
+def evaluate_index(embeddings, index, k, num_probes, num_reranked, num_queries, seed=0):
+    """
+    This function measures the recall@k of approximate search against exact search, and the query latencies,
+    using random catalogue embeddings as queries.
+    :param embeddings: Catalogue embeddings
+    :param index: IVFPQIndex of the catalogue
+    :param k: Number of neighbours
+    :param num_probes: Number of inverted lists visited by approximate search
+    :param num_reranked: Number of candidates re-ranked with the exact embeddings by approximate search
+    :param num_queries: Number of query embeddings
+    :param seed: Seed of the query sample
+    :return: recall@k, mean exact query time (ms), mean approximate query time (ms)
+    """
+    rng = np.random.default_rng(seed)
+    queries = rng.choice(len(embeddings), min(num_queries, len(embeddings)), False)
+
+    recall, exact_time, approximate_time = 0.0, 0.0, 0.0
+    for query_index in queries:
+        query = np.asarray(embeddings[query_index])
+
+        start_time = time.perf_counter()
+        exact_ids = exact_search(embeddings, query, k)[0]
+        exact_time += time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        approximate_ids = index.search(query, k, num_probes, embeddings, num_reranked)[
+            0
+        ]
+        approximate_time += time.perf_counter() - start_time
+
+        recall += len(np.intersect1d(exact_ids, approximate_ids)) / len(exact_ids)
+
+    return (
+        recall / len(queries),
+        exact_time / len(queries) * 1000,
+        approximate_time / len(queries) * 1000,
+    )
+
+
+def main():
+    """
+    Usage:
+    python embedding_index.py build <model_name> <trained_weights.pth> <dataset_directory>
+    <image_directory_or_file_list> <index_directory>
+    python embedding_index.py query <index_directory> <image> [k]
+    python embedding_index.py evaluate <index_directory> [k]
+    The dataset directory (e.g. the training set) is only used to recover the number of classes.
+    """
+    mode = sys.argv[1]
+    config = toml.load("evaluation_config.toml")
+    device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
+
+    if mode == "build":
+        model_name, trained_weights, index_directory = (
+            sys.argv[2],
+            sys.argv[3],
+            sys.argv[6],
+        )
+        os.makedirs(index_directory, exist_ok=True)
+        num_classes = len(get_classes(sys.argv[4]))
+        model = load_embedding_model(model_name, num_classes, trained_weights, device)
+        image_paths = list_images(sys.argv[5])
+        print("Found " + str(len(image_paths)) + " images to embed")
+
+        start_time = time.perf_counter()
+        embedded_paths = extract_embeddings(
+            model,
+            image_paths,
+            get_test_transform(model_registry.get_input_size(model_name)),
+            os.path.join(index_directory, "embeddings.npy"),
+            device,
+            batch_size=config["batch_size"],
+            num_workers=config["num_workers"],
+        )
+        extraction_time = time.perf_counter() - start_time
+        with open(os.path.join(index_directory, "paths.txt"), "w") as paths_file:
+            paths_file.write("\n".join(embedded_paths) + "\n")
+        with open(os.path.join(index_directory, "index.json"), "w") as index_info:
+            json.dump(
+                {
+                    "model_name": model_name,
+                    "trained_weights": trained_weights,
+                    "num_classes": num_classes,
+                },
+                index_info,
+            )
+
+        embeddings = np.load(
+            os.path.join(index_directory, "embeddings.npy"), mmap_mode="r"
+        )
+        start_time = time.perf_counter()
+        index = IVFPQIndex.build(
+            embeddings,
+            num_lists=config["index_num_lists"],
+            num_subquantisers=config["index_num_subquantisers"],
+            iterations=config["index_kmeans_iterations"],
+        )
+        build_time = time.perf_counter() - start_time
+        index.save(os.path.join(index_directory, "ivfpq.npz"))
+
+        print(
+            "Embedded {} images ({} dimensions) in {:.1f}s, built the IVF-PQ index in {:.1f}s".format(
+                len(embeddings), embeddings.shape[1], extraction_time, build_time
+            )
+        )
+        print(
+            "Index size: {:.1f} MB of codes vs {:.1f} MB of embeddings".format(
+                index.codes.nbytes / 1e6, embeddings.nbytes / 1e6
+            )
+        )
+
+    elif mode == "query":
+        index_directory = sys.argv[2]
+        k = int(sys.argv[4]) if len(sys.argv) > 4 else config["top_k"]
+        with open(os.path.join(index_directory, "index.json")) as index_info:
+            index_info = json.load(index_info)
+        with open(os.path.join(index_directory, "paths.txt")) as paths_file:
+            image_paths = paths_file.read().splitlines()
+        index = IVFPQIndex.load(os.path.join(index_directory, "ivfpq.npz"))
+
+        model_name = index_info["model_name"]
+        model = load_embedding_model(
+            model_name,
+            index_info["num_classes"],
+            index_info["trained_weights"],
+            device,
+        )
+        transform = get_test_transform(model_registry.get_input_size(model_name))
+        image, index_in_list = ImagePathDataset([sys.argv[3]], transform)[0]
+        if image is None:
+            raise ValueError("Could not decode image: " + sys.argv[3])
+        with torch.no_grad():
+            query = model(image.unsqueeze(0).to(device)).flatten(1)
+            query = nn.functional.normalize(query, dim=1).cpu().numpy()[0]
+
+        start_time = time.perf_counter()
+        embeddings = np.load(
+            os.path.join(index_directory, "embeddings.npy"), mmap_mode="r"
+        )
+        ids, distances = index.search(
+            query,
+            k,
+            config["index_num_probes"],
+            embeddings,
+            config["index_num_reranked"],
+        )
+        query_time = (time.perf_counter() - start_time) * 1000
+
+        print("Most similar images (found in {:.2f} ms):".format(query_time))
+        for image_id, distance in zip(ids, distances):
+            print("{:.4f}  {}".format(distance, image_paths[image_id]))
+
+    elif mode == "evaluate":
+        index_directory = sys.argv[2]
+        k = int(sys.argv[3]) if len(sys.argv) > 3 else config["top_k"]
+        embeddings = np.load(
+            os.path.join(index_directory, "embeddings.npy"), mmap_mode="r"
+        )
+        index = IVFPQIndex.load(os.path.join(index_directory, "ivfpq.npz"))
+
+        recall, exact_time, approximate_time = evaluate_index(
+            embeddings,
+            index,
+            k,
+            config["index_num_probes"],
+            config["index_num_reranked"],
+            config["index_evaluation_queries"],
+        )
+        print(
+            "Recall@{}: {:.3f} (exact search: {:.2f} ms/query, IVF-PQ: {:.2f} ms/query)".format(
+                k, recall, exact_time, approximate_time
+            )
+        )
+
+    else:
+        raise ValueError("mode must be one of: build, query, evaluate")
+
+    return
+
+
+if __name__ == "__main__":
+    main()
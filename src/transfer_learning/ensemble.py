@@ -0,0 +1,181 @@
+"""
+This program evaluates an ensemble of trained models (e.g. InceptionV3, VGG-19_BN, ResNet-101 and ResNet-152).
+Every image is decoded once, and the 224 and 299 crops are derived from the same decoded image,
+so all member models are run on a shared batch. The ensemble combines the logits of the members by
+a weighted average, with the weights fit on the validation set by minimising the negative log likelihood.
+The report contains the results of every member as well as of the ensemble.
+Version: 19/10/2026
+"""
+import os
+import sys
+
+import pandas as pd
+import toml
+import torch
+import torch.nn.functional as F
+
+import model_registry
+from model_evaluation import (
+    create_confusion_matrix,
+    load_multi_crop_set,
+    load_trained_model,
+)
+from streaming_metrics import ClassificationMetrics
+
+
+def collect_outputs(models, data_loader, input_sizes, device):
+    """
+    This function runs every member model over a dataset split.
+    :param models: Member models in evaluation mode
+    :param data_loader: Multi crop data loader over the dataset split
+    :param input_sizes: Input size of every member model
+    :param device: Device on which the models run
+    :return: Logits of shape (members, images, classes) and the labels
+    """
+    all_logits, all_labels = [], []
+    with torch.no_grad():
+        for crops, labels in data_loader:
+            all_logits.append(
+                torch.stack(
+                    [
+                        model(crops[input_size].to(device)).cpu()
+                        for model, input_size in zip(models, input_sizes)
+                    ]
+                )
+            )
+            all_labels.append(labels)
+
+    return torch.cat(all_logits, dim=1), torch.cat(all_labels)
+
+
+def combine_logits(logits: torch.Tensor, weights: torch.Tensor) -> torch.Tensor:
+    """
+    :param logits: Logits of shape (members, images, classes)
+    :param weights: Weight of every member, summing to one
+    :return: Weighted average of the member logits, of shape (images, classes)
+    """
+    return (weights.view(-1, 1, 1) * logits).sum(dim=0)
+
+
+def fit_ensemble_weights(
+    logits: torch.Tensor, labels: torch.Tensor, steps: int = 200
+) -> torch.Tensor:
+    """
+    This function fits the member weights on the validation set. The weights are parametrised by
+    a softmax, so they stay positive and sum to one, and the negative log likelihood of the
+    combined logits is minimised. Only the cached logits are used, so no model is run again.
+    :param logits: Validation logits of shape (members, images, classes)
+    :param labels: Validation labels
+    :param steps: Number of optimisation steps
+    :return: Weight of every member
+    """
+    weight_parameters = torch.zeros(len(logits), requires_grad=True)
+    optimizer = torch.optim.LBFGS([weight_parameters], max_iter=steps)
+
+    def closure():
+        optimizer.zero_grad()
+        weights = torch.softmax(weight_parameters, dim=0)
+        loss = F.cross_entropy(combine_logits(logits, weights), labels)
+        loss.backward()
+        return loss
+
+    optimizer.step(closure)
+
+    return torch.softmax(weight_parameters, dim=0).detach()
+
+
+def compute_metrics(outputs: torch.Tensor, labels: torch.Tensor, classes):
+    """
+    :param outputs: Logits of shape (images, classes)
+    :param labels: True labels
+    :param classes: List of possible classes
+    :return: metrics - Confusion matrix and Top-5 counts of the outputs
+    """
+    metrics = ClassificationMetrics(classes)
+    top_5 = outputs.topk(min(5, len(classes)), dim=1)[1]
+    metrics.update(
+        labels.numpy(),
+        outputs.argmax(dim=1).numpy(),
+        (top_5 == labels.unsqueeze(1)).any(dim=1).numpy(),
+    )
+
+    return metrics
+
+
+def main():
+    """
+    Usage: python ensemble.py <dataset_directory> <model_name> <weights.pth> [<model_name> <weights.pth> ...]
+    The dataset directory must contain the validation/ and test/ sets.
+    """
+    dataset_path = sys.argv[1]
+    model_names = sys.argv[2::2]
+    model_weights = sys.argv[3::2]
+    if len(model_names) < 2 or len(model_names) != len(model_weights):
+        raise ValueError(
+            "An ensemble needs at least two model names, each with weights"
+        )
+    config = toml.load("evaluation_config.toml")
+
+    input_sizes = [model_registry.get_input_size(name) for name in model_names]
+    validation_loader, classes = load_multi_crop_set(
+        os.path.join(dataset_path, "validation"), input_sizes, config["batch_size"]
+    )
+    testing_loader, classes = load_multi_crop_set(
+        os.path.join(dataset_path, "test"), input_sizes, config["batch_size"]
+    )
+
+    device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
+    models = [
+        load_trained_model(name, len(classes), weights, device)
+        for name, weights in zip(model_names, model_weights)
+    ]
+
+    print("Fitting the ensemble weights on the validation set...")
+    validation_logits, validation_labels = collect_outputs(
+        models, validation_loader, input_sizes, device
+    )
+    weights = fit_ensemble_weights(validation_logits, validation_labels)
+
+    print("Evaluating on the testing set...")
+    testing_logits, testing_labels = collect_outputs(
+        models, testing_loader, input_sizes, device
+    )
+
+    results = []
+    for i, name in enumerate(model_names):
+        member_metrics = compute_metrics(testing_logits[i], testing_labels, classes)
+        results.append(
+            {
+                "Model": name,
+                "Weight": float(weights[i]),
+                "Top-1 (%)": member_metrics.top_1_accuracy,
+                "Top-5 (%)": member_metrics.top_5_accuracy,
+            }
+        )
+
+    metrics = compute_metrics(
+        combine_logits(testing_logits, weights), testing_labels, classes
+    )
+    results.append(
+        {
+            "Model": "Ensemble",
+            "Weight": float(weights.sum()),
+            "Top-1 (%)": metrics.top_1_accuracy,
+            "Top-5 (%)": metrics.top_5_accuracy,
+        }
+    )
+
+    title = "_".join(model_names) + "_ensemble"
+    results_table = pd.DataFrame(results)
+    print(results_table.to_string(index=False, float_format="{:.2f}".format))
+    results_table.to_csv(
+        "./classification_reports/" + title + "_members.csv", index=False
+    )
+
+    create_confusion_matrix(metrics, generate_report=True, title=title)
+
+    return
+
+
+if __name__ == "__main__":
+    main()
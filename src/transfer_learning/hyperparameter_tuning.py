@@ -7,12 +7,15 @@ Version: 10/08/2020
 import sys
 from typing import Dict
 
-import matplotlib.pyplot as plt
 import numpy as np
 import torch
 import torch.nn as nn
+import toml
 import torch.optim as optim
 
+from batch_size_finder import get_max_micro_batch_size, plan_batches
+from metrics_emitter import MetricsEmitter, create_emitter
+from plot_rendering import PlotRenderer, create_renderer, render_scatter_3d
 from model_training import (
     load_dataset_and_transforms,
     initialise_model,
@@ -21,13 +24,17 @@ from model_training import (
 )
 
 
-def generate_hyperparameters(num_loops: int) -> Dict:
+def generate_hyperparameters(num_loops: int, renderer=None) -> Dict:
     """
     This function generates the hyperparameter space, which is then used in evaluation to evaluate
     different hyperparameters and their effect on the defined performance metric (in this case, validation accuracy).
     :param num_loops: Number of hyperparameter loops to test
+    :param renderer: PlotRenderer which renders the plot. If not supplied, it is rendered straight away.
     :return:
     """
+    if renderer is None:
+        renderer = PlotRenderer(style="ggplot")
+
     learning_rates = [
         np.round(np.random.uniform(0.00005, 0.00015), 9)
         for learning_rate in range(num_loops)
@@ -50,44 +57,53 @@ def generate_hyperparameters(num_loops: int) -> Dict:
         "weight_decays": weight_decays,
     }
 
-    fig = plt.figure(figsize=(10, 7))
-    ax = fig.add_subplot(111, projection="3d")
-    hp_3d_plot = ax.scatter3D(
+    renderer.submit(
+        "../visualisations/hyperparameter_space/hyperparameter_space.png",
+        render_scatter_3d,
         learning_rates,
         batch_sizes,
         weight_decays,
-        c=weight_decays,
-        cmap="jet",
-        marker="o",
-        s=25,
+        "Learning Rates",
+        "Batch Sizes",
+        "Weight Decays",
+        "Randomly Generated Hyperparameter Space",
+        figure_kwargs={"figsize": (10, 7)},
     )
-    colourbar = plt.colorbar(hp_3d_plot)
-    ax.set_xlabel("Learning Rates")
-    ax.set_ylabel("Batch Sizes")
-    ax.set_zlabel("Weight Decays")
-    plt.title("Randomly Generated Hyperparameter Space")
-    plt.savefig("../visualisations/hyperparameter_space/hyperparameter_space.png")
 
     return hyperparameters
 
 
-def set_up_training_loops(model_name: str, hyperparameter_dict: Dict) -> None:
+def set_up_training_loops(
+    model_name: str,
+    hyperparameter_dict: Dict,
+    metrics_emitter=None,
+    max_micro_batch_size=None,
+) -> None:
     """
     This function performs the training with given generated hyperparameters for 10 epochs,
     and evaluates how well the hyperparameters performed.
     :param model_name: Name of the CNN architecture to evaluate hyperparameters on.
     :param hyperparameter_dict: Hyperparameter space dictionary generated by generate_hyperparameters() function.
+    :param metrics_emitter: MetricsEmitter to which the metrics of every training loop are emitted
+    :param max_micro_batch_size: Largest micro-batch which fits in memory. Larger sampled batch sizes are
+    reached by gradient accumulation. If not supplied, every batch is trained at once.
     :return:
     """
+    if metrics_emitter is None:
+        metrics_emitter = MetricsEmitter(None)
 
     print("Running Hyperparameter optimisation loop for: " + str(model_name))
     validation_metrics = []
     for i in range(len(hyperparameter_dict["learning_rates"])):
+        batch_size = int(hyperparameter_dict["batch_sizes"][i])
+        micro_batch_size, accumulation_steps = plan_batches(
+            batch_size, max_micro_batch_size or batch_size
+        )
         data_loaders, classes = load_dataset_and_transforms(
             "../iss_image_data/experiment3/",
             uses_inception=False,
             augment=True,
-            batch_size=hyperparameter_dict["batch_sizes"][i],
+            batch_size=micro_batch_size,
         )
 
         device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
@@ -114,8 +130,18 @@ def set_up_training_loops(model_name: str, hyperparameter_dict: Dict) -> None:
             model_name,
             uses_inception=False,
             epochs=15,
+            metrics_emitter=metrics_emitter,
+            accumulation_steps=accumulation_steps,
         )
         validation_metrics.append(np.max(history["val_acc"]))
+        metrics_emitter.emit(
+            "trial",
+            trial=i,
+            learning_rate=float(hyperparameter_dict["learning_rates"][i]),
+            batch_size=int(hyperparameter_dict["batch_sizes"][i]),
+            weight_decay=float(hyperparameter_dict["weight_decays"][i]),
+            best_validation_accuracy=float(validation_metrics[-1]),
+        )
 
     print(
         "Best validaiton accuracy was achieved at iteration: "
@@ -140,10 +166,23 @@ def set_up_training_loops(model_name: str, hyperparameter_dict: Dict) -> None:
 
 def main():
 
-    plt.style.use("ggplot")
-
-    hyperparameters = generate_hyperparameters(100)
-    set_up_training_loops(sys.argv[1], hyperparameter_dict=hyperparameters)
+    config = toml.load("training_config.toml")
+    # The hyperparameter space is rendered in a background process while the first trials train
+    renderer = create_renderer(config, style="ggplot")
+    hyperparameters = generate_hyperparameters(100, renderer)
+    metrics_emitter = create_emitter(config, sys.argv[1] + "_tuning")
+    # The memory is probed once, for the largest sampled batch size
+    max_micro_batch_size = get_max_micro_batch_size(
+        config, sys.argv[1], int(np.max(hyperparameters["batch_sizes"]))
+    )
+    set_up_training_loops(
+        sys.argv[1],
+        hyperparameter_dict=hyperparameters,
+        metrics_emitter=metrics_emitter,
+        max_micro_batch_size=max_micro_batch_size,
+    )
+    metrics_emitter.close()
+    renderer.close()
 
     return
 
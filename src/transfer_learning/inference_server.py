@@ -0,0 +1,243 @@
+"""
+This program serves a trained classifier over HTTP so that ISS frames can be classified as they arrive.
+The trained model is loaded once. JPEG images are uploaded with POST /predict and requests
+arriving at the same time are grouped into micro-batches, limited by a maximum batch size and
+a maximum waiting time, before being passed through the network in a single forward pass.
+The top-k cities and their probabilities are returned as JSON.
+GET /metrics returns latency percentiles and a histogram of the micro-batch sizes.
+Version: 19/10/2026
+"""
+import io
+import json
+import queue
+import sys
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import toml
+import torch
+from PIL import Image
+
+import model_registry
+from model_evaluation import get_classes, get_frame_transform, load_trained_model
+
+
+class MicroBatcher:
+    def __init__(self, model, classes, device, max_batch_size, max_wait_ms):
+        self.model = model
+        self.classes = classes
+        self.device = device
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.requests = queue.Queue()
+
+        # Serving statistics, read by the /metrics endpoint
+        self.statistics_lock = threading.Lock()
+        self.latencies = deque(maxlen=10000)  # Most recent request latencies (s)
+        self.batch_sizes = Counter()
+        self.num_requests = 0
+
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+
+    def submit(self, image: torch.Tensor, top_k: int) -> Future:
+        """
+        This function queues a preprocessed image for classification.
+        :param image: Normalised image tensor of shape (3, input_size, input_size)
+        :param top_k: Number of most probable cities to return
+        :return: Future which is resolved with the list of predictions
+        """
+        future = Future()
+        self.requests.put((image, top_k, future, time.perf_counter()))
+
+        return future
+
+    def collect_batch(self):
+        """
+        This function waits for the first request, then keeps collecting requests until either
+        the batch is full or the maximum waiting time since the first request has passed.
+        :return: List of queued requests forming the next micro-batch
+        """
+        batch = [self.requests.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def run(self):
+        while True:
+            batch = self.collect_batch()
+            try:
+                inputs = torch.stack([request[0] for request in batch]).to(self.device)
+                with torch.no_grad():
+                    probabilities = torch.softmax(self.model(inputs), dim=1)
+                max_k = min(max(request[1] for request in batch), len(self.classes))
+                top_probabilities, top_indices = probabilities.topk(max_k, dim=1)
+                top_probabilities = top_probabilities.cpu().tolist()
+                top_indices = top_indices.cpu().tolist()
+            except Exception as error:
+                for request in batch:
+                    request[2].set_exception(error)
+                continue
+
+            finished = time.perf_counter()
+            for i, (image, top_k, future, arrival_time) in enumerate(batch):
+                future.set_result(
+                    [
+                        {"city": self.classes[index], "probability": probability}
+                        for index, probability in zip(
+                            top_indices[i][:top_k], top_probabilities[i][:top_k]
+                        )
+                    ]
+                )
+
+            with self.statistics_lock:
+                self.batch_sizes[len(batch)] += 1
+                self.num_requests += len(batch)
+                self.latencies.extend(finished - request[3] for request in batch)
+
+    def get_statistics(self):
+        """
+        This function summarises the serving statistics.
+        :return: Dictionary of request count, latency percentiles (ms) and batch size histogram
+        """
+        with self.statistics_lock:
+            latencies = np.array(self.latencies) * 1000
+            batch_sizes = dict(sorted(self.batch_sizes.items()))
+            num_requests = self.num_requests
+
+        statistics = {
+            "requests": num_requests,
+            "batch_size_histogram": {str(k): v for k, v in batch_sizes.items()},
+        }
+        if len(latencies) > 0:
+            statistics["latency_ms"] = {
+                "p50": float(np.percentile(latencies, 50)),
+                "p90": float(np.percentile(latencies, 90)),
+                "p99": float(np.percentile(latencies, 99)),
+                "max": float(latencies.max()),
+            }
+
+        return statistics
+
+
+class InferenceServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = (
+        128  # Concurrent clients must not be refused while a batch runs
+    )
+
+
+def create_request_handler(batcher: MicroBatcher, transform, default_top_k: int):
+    """
+    This function creates the HTTP request handler class bound to the micro-batcher.
+    :param batcher: MicroBatcher which runs the model
+    :param transform: Preprocessing applied to every uploaded image
+    :param default_top_k: Number of cities returned when the request does not specify ?k=
+    :return: Request handler class for the HTTP server
+    """
+
+    class InferenceRequestHandler(BaseHTTPRequestHandler):
+        def send_json(self, status, body):
+            response = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(response)))
+            self.end_headers()
+            self.wfile.write(response)
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == "/metrics":
+                self.send_json(200, batcher.get_statistics())
+            elif path == "/health":
+                self.send_json(200, {"status": "ok"})
+            else:
+                self.send_json(404, {"error": "Unknown endpoint"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path != "/predict":
+                self.send_json(404, {"error": "Unknown endpoint"})
+                return
+
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            try:
+                top_k = int(parse_qs(url.query).get("k", [default_top_k])[0])
+            except ValueError:
+                top_k = 0
+            if top_k < 1:
+                self.send_json(400, {"error": "k must be an integer of at least 1"})
+                return
+
+            try:
+                image = transform(Image.open(io.BytesIO(body)).convert("RGB"))
+            except Exception:
+                self.send_json(400, {"error": "Request body is not a valid image"})
+                return
+
+            try:
+                predictions = batcher.submit(image, top_k).result()
+            except Exception as error:
+                # The batch of the request failed, e.g. the model ran out of memory
+                self.send_json(500, {"error": "Classification failed: " + str(error)})
+                return
+            self.send_json(200, {"predictions": predictions})
+
+        def log_message(self, format, *args):
+            return  # Per request logging would dominate the serving time
+
+    return InferenceRequestHandler
+
+
+def main():
+    """
+    Usage: python inference_server.py <model_name> <trained_weights.pth> <dataset_directory>
+    The dataset directory (e.g. the training set) is only used to recover the class names.
+    """
+    model_name = sys.argv[1]
+    config = toml.load("evaluation_config.toml")
+
+    input_size = model_registry.get_input_size(model_name)
+
+    device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
+    classes = get_classes(sys.argv[3])
+    model = load_trained_model(model_name, len(classes), sys.argv[2], device)
+    batcher = MicroBatcher(
+        model,
+        classes,
+        device,
+        max_batch_size=config["server_max_batch_size"],
+        max_wait_ms=config["server_max_wait_ms"],
+    )
+
+    # Uploaded images are full size frames, so they are resized as in training before the crop
+    handler = create_request_handler(
+        batcher, get_frame_transform(input_size), config["top_k"]
+    )
+    server = InferenceServer(("127.0.0.1", config["server_port"]), handler)
+    print(
+        "Serving " + model_name + " on http://127.0.0.1:" + str(config["server_port"])
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+    return
+
+
+if __name__ == "__main__":
+    main()
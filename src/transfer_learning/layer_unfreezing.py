@@ -0,0 +1,163 @@
+"""
+This program contains progressive unfreezing, which trains only the new classification head in the first
+epochs and then unfreezes the stages of the pre-trained backbone one at a time, from the output towards
+the input, as set by unfreeze_schedule in training_config.toml.
+The backward pass stops at the first layer which is trained, so while the early stages are frozen most of
+the backward pass is skipped. Every stage is a separate parameter group of the optimiser from the start,
+so that learning rate schedules cover every stage, and unfreezing a stage only changes its requires_grad.
+It can also be run as a script, which times a training step of a model with each number of stages unfrozen.
+Version: 19/10/2026
+"""
+import sys
+import time
+from typing import List
+
+import torch
+import torch.nn as nn
+
+import model_registry
+
+
+def get_parameter_groups(model: nn.Module, model_name: str) -> List[dict]:
+    """
+    This function splits the parameters of the model into the parameter groups of the optimiser, one per
+    stage, in the order in which they are unfrozen.
+    :param model: Model initialised by initialise_model()
+    :param model_name: Name of the architecture
+    :return: Parameter groups, each a dictionary with the name of the group and its parameters. The first is
+    the head, i.e. the new classification layer(s) and any layers after the last stage of the backbone,
+    followed by the stages from the output to the input and the stem, i.e. the layers before the first stage
+    """
+    stage_paths = model_registry.STAGE_PATHS[
+        model_registry.get_model_entry(model_name)["family"]
+    ]
+    new_layers = [model_registry.get_head(model, model_name)]
+    if model_registry.get_model_entry(model_name)["family"] == "inception":
+        new_layers.append(model.AuxLogits.fc)
+    new_parameters = {id(p) for layer in new_layers for p in layer.parameters()}
+
+    groups = {name: [] for name in ["head"] + stage_paths[::-1] + ["stem"]}
+    current_group = "stem"
+    for name, parameter in model.named_parameters():
+        stage_path = next(
+            (path for path in stage_paths if name.startswith(path + ".")), None
+        )
+        if id(parameter) in new_parameters:
+            groups["head"].append(parameter)
+        elif stage_path is not None:
+            current_group = stage_path
+            groups[stage_path].append(parameter)
+        elif current_group == stage_paths[-1]:
+            groups["head"].append(parameter)
+        else:
+            # Layers between two stages (e.g. the auxiliary classifier of InceptionV3) go with the stage before
+            groups[current_group].append(parameter)
+
+    return [
+        {"name": name, "params": parameters}
+        for name, parameters in groups.items()
+        if parameters
+    ]
+
+
+def get_scheduled_stages(unfreeze_schedule, epoch: int) -> int:
+    """
+    :param unfreeze_schedule: List of [first epoch, number of stages trained], e.g. [[1, 0], [3, 1], [6, 3]]
+    :param epoch: Current epoch, counted from 1
+    :return: Number of stages of the backbone trained in the epoch, besides the head, counted from the output,
+    or None before the first entry of the schedule, in which case every stage is trained
+    """
+    num_stages = None
+    for start_epoch, stages in sorted(unfreeze_schedule):
+        if epoch >= start_epoch:
+            num_stages = stages
+
+    return num_stages
+
+
+def set_trained_stages(parameter_groups: List[dict], num_stages: int) -> List[str]:
+    """
+    This function trains the head and the last num_stages stages, and freezes the other stages.
+    :param parameter_groups: Parameter groups built by get_parameter_groups(), e.g. optimizer.param_groups
+    :param num_stages: Number of stages of the backbone to train, counted from the output, or None to train
+    every stage
+    :return: Names of the trained parameter groups
+    """
+    trained = []
+    for i, group in enumerate(parameter_groups):
+        requires_grad = num_stages is None or i <= num_stages
+        for parameter in group["params"]:
+            parameter.requires_grad = requires_grad
+        if requires_grad:
+            trained.append(group["name"])
+
+    return trained
+
+
+def time_training_step(model, parameter_groups, num_stages, inputs, labels) -> float:
+    """
+    :param model: Model to time
+    :param parameter_groups: Parameter groups of the model, built by get_parameter_groups()
+    :param num_stages: Number of stages of the backbone to train
+    :param inputs: Batch of images
+    :param labels: Labels of the batch
+    :return: Median time (s) of the forward and backward pass over three steps, after one warm up step
+    """
+    set_trained_stages(parameter_groups, num_stages)
+    criterion = nn.CrossEntropyLoss()
+    times = []
+    for step in range(4):
+        model.zero_grad(set_to_none=True)
+        start_time = time.perf_counter()
+        outputs = model(inputs)
+        if isinstance(outputs, tuple):
+            outputs = outputs[0]
+        criterion(outputs, labels).backward()
+        times.append(time.perf_counter() - start_time)
+
+    return sorted(times[1:])[1]
+
+
+def main():
+    """
+    Usage: python layer_unfreezing.py <model_name> [batch_size]
+    """
+    # Imported here, as model_training imports the functions above
+    from model_training import initialise_model
+
+    model_name = sys.argv[1]
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
+
+    model, input_size = initialise_model(
+        model_name, num_classes=10, freeze_all=False, pretrained=False
+    )
+    model = model.to(device).train()
+    parameter_groups = get_parameter_groups(model, model_name)
+    inputs = torch.randn(batch_size, 3, input_size, input_size, device=device)
+    labels = torch.randint(0, 10, (batch_size,), device=device)
+
+    full_time = time_training_step(model, parameter_groups, None, inputs, labels)
+    print(
+        "{:>6} {:<16} {:>12} {:>12}".format(
+            "Stages", "Last unfrozen", "Step (ms)", "Of full step"
+        )
+    )
+    for num_stages in range(len(parameter_groups)):
+        step_time = time_training_step(
+            model, parameter_groups, num_stages, inputs, labels
+        )
+        print(
+            "{:>6} {:<16} {:>12.0f} {:>12.0%}".format(
+                num_stages,
+                parameter_groups[num_stages]["name"],
+                step_time * 1000,
+                step_time / full_time,
+            )
+        )
+
+    return
+
+
+if __name__ == "__main__":
+    main()
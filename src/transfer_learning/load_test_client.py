@@ -0,0 +1,117 @@
+"""
+This program load tests the local inference server (inference_server.py).
+It uploads JPEG images from a directory using a number of concurrent clients and reports
+the throughput and latency percentiles seen by the clients, together with the
+micro-batching statistics reported by the server.
+Version: 19/10/2026
+"""
+import json
+import os
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import numpy as np
+
+
+def load_images(image_path: str) -> List[bytes]:
+    """
+    This function reads the JPEG images to upload into memory, so disk reads are not measured.
+    :param image_path: Path to a .jpg image or to a directory which is searched recursively
+    :return: List of encoded JPEG images
+    """
+    if os.path.isfile(image_path):
+        all_images = [image_path]
+    else:
+        all_images = []
+        for root, directories, files in os.walk(image_path):
+            for file in files:
+                if file.endswith(".jpg"):
+                    all_images.append(os.path.join(root, file))
+
+    if len(all_images) == 0:
+        raise ValueError("No .jpg images found at: " + image_path)
+
+    images = []
+    for path in sorted(all_images)[:1000]:
+        with open(path, "rb") as image_file:
+            images.append(image_file.read())
+
+    return images
+
+
+def send_request(url: str, image: bytes) -> float:
+    """
+    This function uploads a single image to the server.
+    :param url: URL of the /predict endpoint
+    :param image: Encoded JPEG image
+    :return: Latency of the request in seconds
+    """
+    request = urllib.request.Request(
+        url, data=image, headers={"Content-Type": "image/jpeg"}
+    )
+    start_time = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        response.read()
+
+    return time.perf_counter() - start_time
+
+
+def run_load_test(
+    server_url: str, images: List[bytes], num_requests: int, concurrency: int
+) -> None:
+    """
+    This function sends requests from concurrent clients and prints the results.
+    :param server_url: Base URL of the server, e.g. http://127.0.0.1:8080
+    :param images: Encoded JPEG images, uploaded in turn
+    :param num_requests: Total number of requests to send
+    :param concurrency: Number of clients sending requests at the same time
+    :return:
+    """
+    predict_url = server_url + "/predict"
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(
+            executor.map(
+                lambda i: send_request(predict_url, images[i % len(images)]),
+                range(num_requests),
+            )
+        )
+    time_elapsed = time.perf_counter() - start_time
+
+    latencies = np.array(latencies) * 1000
+    print("Requests: " + str(num_requests) + ", Concurrency: " + str(concurrency))
+    print("Throughput: {:.1f} images/sec".format(num_requests / time_elapsed))
+    print(
+        "Client latency (ms) - p50: {:.1f}, p90: {:.1f}, p99: {:.1f}, max: {:.1f}".format(
+            np.percentile(latencies, 50),
+            np.percentile(latencies, 90),
+            np.percentile(latencies, 99),
+            latencies.max(),
+        )
+    )
+
+    with urllib.request.urlopen(server_url + "/metrics") as response:
+        print("Server metrics: " + json.dumps(json.loads(response.read()), indent=2))
+
+    return
+
+
+def main():
+    """
+    Usage: python load_test_client.py <image_or_directory> [num_requests] [concurrency] [server_url]
+    """
+    num_requests = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+    server_url = sys.argv[4] if len(sys.argv) > 4 else "http://127.0.0.1:8080"
+
+    images = load_images(sys.argv[1])
+    run_load_test(server_url, images, num_requests, concurrency)
+
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""
+This program contains the learning rate schedules which train_model() can follow instead of a constant
+learning rate, as set by lr_schedule in training_config.toml, and the learning rate range test, which
+suggests the learning rate to use with them.
+One-cycle warms the learning rate up to learning_rate and then anneals it far below its starting value,
+cosine warms up linearly and then follows a half cosine to zero. Both are stepped after every optimiser step,
+so a run reaches its best accuracy in fewer epochs than with a constant learning rate.
+The range test trains for a few hundred steps while the learning rate grows exponentially, and records
+the loss of every step. The suggested maximum learning rate is a tenth of the learning rate at the lowest
+loss, i.e. safely below the point where training diverges.
+It can also be run as a script, which runs the range test for a model, or compares the time a run with a
+constant learning rate and a run with a schedule took to reach the best validation accuracy.
+Version: 19/10/2026
+"""
+import copy
+import math
+import sys
+
+import numpy as np
+import torch
+import torch.optim as optim
+
+from metrics_emitter import load_events
+from progressive_resizing import time_to_accuracy
+
+
+def create_scheduler(config: dict, optimizer, steps_per_epoch: int):
+    """
+    :param config: Loaded training_config.toml
+    :param optimizer: Optimiser whose learning rate is scheduled, created with lr=learning_rate
+    :param steps_per_epoch: Number of optimiser steps per epoch
+    :return: Scheduler which must be stepped after every optimiser step, or None for a constant learning rate
+    """
+    schedule = config["lr_schedule"]
+    total_steps = config["epochs"] * steps_per_epoch
+    # One-cycle needs at least two warm up steps to interpolate between
+    warmup_steps = max(2, int(config["warmup_fraction"] * total_steps))
+
+    if schedule == "constant":
+        return None
+
+    elif schedule == "one_cycle":
+        return optim.lr_scheduler.OneCycleLR(
+            optimizer,
+            max_lr=config["learning_rate"],
+            total_steps=total_steps,
+            pct_start=warmup_steps / total_steps,
+        )
+
+    elif schedule == "cosine":
+
+        def cosine_with_warmup(step):
+            if step < warmup_steps:
+                return (step + 1) / warmup_steps
+            progress = min(
+                1.0, (step - warmup_steps) / max(1, total_steps - warmup_steps)
+            )
+            return 0.5 * (1 + math.cos(math.pi * progress))
+
+        return optim.lr_scheduler.LambdaLR(optimizer, cosine_with_warmup)
+
+    else:
+        raise ValueError("lr_schedule must be one of: constant, one_cycle, cosine")
+
+
+def lr_range_test(
+    model,
+    train_loader,
+    device,
+    criterion,
+    optimizer,
+    uses_inception: bool,
+    start_lr: float = 1e-7,
+    end_lr: float = 1.0,
+    num_steps: int = 300,
+    accumulation_steps: int = 1,
+    smoothing: float = 0.98,
+    divergence_threshold: float = 4.0,
+) -> dict:
+    """
+    This function trains the model while increasing the learning rate exponentially from start_lr to end_lr,
+    and stops early once the loss diverges. The weights of the model and the state of the optimiser are
+    restored afterwards, so the model can then be trained from where it started.
+    :param model: Model to test, already on the device
+    :param train_loader: Training data loader, which is cycled through if it has fewer than num_steps batches
+    :param device: Device used for training
+    :param criterion: Loss function
+    :param optimizer: Optimiser whose learning rate is swept
+    :param uses_inception: Whether the model is InceptionV3, which also returns auxiliary outputs in training
+    :param start_lr: Learning rate of the first step
+    :param end_lr: Learning rate of the last step
+    :param num_steps: Number of optimiser steps
+    :param accumulation_steps: Number of micro-batches per optimiser step, as in train_model()
+    :param smoothing: Weight of the previous smoothed loss in the exponential moving average of the loss
+    :param divergence_threshold: The test stops once the smoothed loss exceeds this multiple of the lowest loss
+    :return: Dictionary with the learning rate and smoothed loss of every step, and the suggested
+    minimum and maximum learning rates
+    """
+    model_state = copy.deepcopy(model.state_dict())
+    optimizer_state = copy.deepcopy(optimizer.state_dict())
+    growth = (end_lr / start_lr) ** (1 / max(1, num_steps - 1))
+
+    learning_rates = []
+    losses = []
+    smoothed_loss = 0.0
+    best_loss = np.inf
+    batches = iter(train_loader)
+    position = 0  # Number of micro-batches of the current epoch already used
+    model.train()
+
+    for step in range(num_steps):
+        learning_rate = start_lr * growth**step
+        for param_group in optimizer.param_groups:
+            param_group["lr"] = learning_rate
+
+        if position == len(train_loader):
+            batches = iter(train_loader)
+            position = 0
+        # As in train_model(), the last group of an epoch may have fewer micro-batches
+        group_size = min(accumulation_steps, len(train_loader) - position)
+
+        optimizer.zero_grad()
+        step_loss = 0.0
+        for micro_step in range(group_size):
+            batch = next(batches)
+            position += 1
+            inputs = batch[0].to(device)
+            labels = batch[1].to(device)
+
+            if uses_inception:
+                outputs, auxiliary_outputs = model(inputs)
+                loss = criterion(outputs, labels) + 0.4 * criterion(
+                    auxiliary_outputs, labels
+                )
+            else:
+                loss = criterion(model(inputs), labels)
+            (loss / group_size).backward()
+            step_loss += loss.item() / group_size
+        optimizer.step()
+
+        # The loss is smoothed, and the bias of the moving average towards 0 in the first steps corrected
+        smoothed_loss = smoothing * smoothed_loss + (1 - smoothing) * step_loss
+        smoothed_loss_corrected = smoothed_loss / (1 - smoothing ** (step + 1))
+        learning_rates.append(learning_rate)
+        losses.append(smoothed_loss_corrected)
+
+        if not np.isfinite(smoothed_loss_corrected) or (
+            smoothed_loss_corrected > divergence_threshold * best_loss
+        ):
+            print("Loss diverged at a learning rate of {:.2e}".format(learning_rate))
+            break
+        best_loss = min(best_loss, smoothed_loss_corrected)
+
+    model.load_state_dict(model_state)
+    optimizer.load_state_dict(optimizer_state)
+
+    learning_rates = np.array(learning_rates)
+    losses = np.array(losses)
+    finite = np.isfinite(losses)
+    min_loss_lr = learning_rates[finite][np.argmin(losses[finite])]
+    # The steepest fall of the loss, over the learning rates below the lowest loss
+    below_min = learning_rates <= min_loss_lr
+    if below_min.sum() > 1:
+        gradients = np.gradient(losses[below_min], np.log10(learning_rates[below_min]))
+        steepest_lr = learning_rates[below_min][np.argmin(gradients)]
+    else:
+        steepest_lr = min_loss_lr
+
+    suggested_max_lr = min_loss_lr / 10
+    return {
+        "learning_rates": learning_rates.tolist(),
+        "losses": losses.tolist(),
+        "min_loss_lr": float(min_loss_lr),
+        "steepest_lr": float(steepest_lr),
+        "suggested_min_lr": float(min(steepest_lr, suggested_max_lr) / 10),
+        "suggested_max_lr": float(suggested_max_lr),
+    }
+
+
+def main():
+    """
+    Usage:
+    python lr_scheduling.py find <model_name> [num_steps]
+    python lr_scheduling.py compare <constant_lr_run.jsonl> <scheduled_run.jsonl>
+    """
+    mode = sys.argv[1]
+
+    if mode == "find":
+        # Only the range test needs these, so train_model can import create_scheduler cheaply
+        import toml
+        import torch.nn as nn
+
+        from batch_size_finder import get_batch_plan
+        from model_training import (
+            get_parameters_to_learn,
+            initialise_model,
+            load_dataset_and_transforms,
+        )
+        from plot_rendering import PlotRenderer, render_lr_range
+
+        model_name = sys.argv[2]
+        num_steps = int(sys.argv[3]) if len(sys.argv) > 3 else 300
+        config = toml.load("training_config.toml")
+        uses_inception = model_name == "InceptionV3"
+
+        micro_batch_size, accumulation_steps = get_batch_plan(
+            config, model_name, config["batch_size"]
+        )
+        data_loaders, classes = load_dataset_and_transforms(
+            "../iss_image_data/experiment3/",
+            uses_inception,
+            augment=True,
+            batch_size=micro_batch_size,
+        )
+        device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
+        model, input_size = initialise_model(
+            model_name,
+            len(classes),
+            freeze_all=config["training_mode"] == "feature_extraction",
+        )
+        parameters_to_learn = get_parameters_to_learn(
+            model, training_mode=config["training_mode"]
+        )
+        model = model.to(device)
+        optimizer = optim.Adam(
+            parameters_to_learn,
+            lr=config["learning_rate"],
+            weight_decay=config["weight_decay"],
+        )
+
+        results = lr_range_test(
+            model,
+            data_loaders["train"],
+            device,
+            nn.CrossEntropyLoss(),
+            optimizer,
+            uses_inception,
+            num_steps=num_steps,
+            accumulation_steps=accumulation_steps,
+        )
+        print(
+            "Lowest loss at a learning rate of: {:.2e}".format(results["min_loss_lr"])
+        )
+        print("Steepest fall of the loss at: {:.2e}".format(results["steepest_lr"]))
+        print(
+            "Suggested learning_rate (maximum of one_cycle and cosine): {:.2e}".format(
+                results["suggested_max_lr"]
+            )
+        )
+        print(
+            "Suggested minimum learning rate: {:.2e}".format(
+                results["suggested_min_lr"]
+            )
+        )
+        PlotRenderer().submit(
+            "../visualisations/lr_range_test/" + model_name + "_lr_range_test.png",
+            render_lr_range,
+            results["learning_rates"],
+            results["losses"],
+            [results["suggested_min_lr"], results["suggested_max_lr"]],
+            model_name + " Learning Rate Range Test",
+        )
+
+    elif mode == "compare":
+        runs = {
+            "Constant": load_events(sys.argv[2]),
+            "Scheduled": load_events(sys.argv[3]),
+        }
+        best_accuracy = max(
+            event["accuracy"]
+            for event in runs["Constant"]
+            if event["event"] == "epoch" and event["phase"] == "validation"
+        )
+        print(
+            "Time to the best validation accuracy of the constant learning rate ({:.4f}):".format(
+                best_accuracy
+            )
+        )
+        for name, events in runs.items():
+            seconds, epoch = time_to_accuracy(events, best_accuracy)
+            if seconds is None:
+                print("{:<10} not reached".format(name))
+            else:
+                print("{:<10} {:8.0f} s (epoch {})".format(name, seconds, epoch))
+
+    else:
+        raise ValueError("mode must be one of: find, compare")
+
+    return
+
+
+if __name__ == "__main__":
+    main()
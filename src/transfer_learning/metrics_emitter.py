@@ -0,0 +1,255 @@
+"""
+This program contains the metrics emitter, which writes the progress of training, hyperparameter tuning and
+evaluation as machine readable JSON Lines (.jsonl) events, one event per line, so that runs can be graphed,
+alerted on and compared. Every event records its type, the time and the memory (RSS) of the process.
+Events are serialised and written by a background thread, so emitting an event from the training loop
+only puts it on a queue and costs no measurable time.
+It can also be run as a script, which summarises a run or compares two runs.
+Version: 19/10/2026
+"""
+import json
+import os
+import queue
+import resource
+import sys
+import threading
+import time
+
+import numpy as np
+
+_STOP = object()  # Tells the writer thread that no more events will be emitted
+
+
+def get_rss_mb() -> float:
+    """
+    :return: Current resident memory of the process (MB), or NaN if it cannot be read
+    """
+    try:
+        with open("/proc/self/statm") as statm_file:
+            resident_pages = int(statm_file.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / 1024**2
+    except (OSError, ValueError):
+        return float("nan")
+
+
+def get_peak_rss_mb() -> float:
+    """
+    :return: Peak resident memory of the current process (MB)
+    """
+    # ru_maxrss can include the memory of the parent process before the current process was started,
+    # whereas VmHWM only covers the memory of the current process itself
+    if os.path.exists("/proc/self/status"):
+        with open("/proc/self/status") as status_file:
+            for line in status_file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+
+    # ru_maxrss is measured in kilobytes on Linux and in bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return peak_rss / 1024**2
+
+    return peak_rss / 1024
+
+
+def to_json_value(value):
+    """
+    This function converts the values which json cannot serialise, e.g. NumPy numbers and tensors.
+    :param value: Value of an event field
+    :return: Python number or list
+    """
+    if hasattr(value, "tolist"):
+        return value.tolist()
+
+    return float(value)
+
+
+class MetricsEmitter:
+    def __init__(self, path: str = None, flush_interval: float = 1.0):
+        """
+        :param path: Path to the .jsonl file the events are appended to. If None, emitting does nothing
+        :param flush_interval: Longest time (s) an event stays in the buffer before it is written to the file
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.events = queue.SimpleQueue()
+        self.writer = None
+
+        if path is not None:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self.writer = threading.Thread(target=self.write_events, daemon=True)
+            self.writer.start()
+
+    @property
+    def enabled(self) -> bool:
+        return self.writer is not None
+
+    def emit(self, event: str, **fields) -> None:
+        """
+        This function queues an event to be written. The values should be Python numbers, e.g. from
+        loss.item(), as converting tensors on the GPU would wait for the GPU.
+        :param event: Type of the event, e.g. "step", "epoch" or "evaluation"
+        :param fields: Values recorded by the event
+        :return:
+        """
+        if self.writer is not None:
+            self.events.put((event, time.time(), fields))
+
+        return
+
+    def write_events(self) -> None:
+        """
+        This function runs in the writer thread. It serialises the queued events and writes them to
+        the file, flushing the file when no event arrived for flush_interval seconds.
+        :return:
+        """
+        with open(self.path, "a", buffering=1 << 16) as metrics_file:
+            last_flush_time = time.time()
+            while True:
+                try:
+                    item = self.events.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    item = None
+
+                if item is _STOP:
+                    break
+                if item is not None:
+                    event, event_time, fields = item
+                    record = {
+                        "event": event,
+                        "time": event_time,
+                        "rss_mb": get_rss_mb(),
+                    }
+                    record.update(fields)
+                    metrics_file.write(json.dumps(record, default=to_json_value) + "\n")
+
+                if item is None or time.time() - last_flush_time > self.flush_interval:
+                    metrics_file.flush()
+                    last_flush_time = time.time()
+
+        return
+
+    def close(self) -> None:
+        """
+        This function writes the remaining events and stops the writer thread.
+        :return:
+        """
+        if self.writer is not None:
+            self.events.put(_STOP)
+            self.writer.join()
+            self.writer = None
+
+        return
+
+
+def create_emitter(config: dict, run_name: str) -> MetricsEmitter:
+    """
+    This function creates the metrics emitter of a run from the configuration file.
+    :param config: Loaded training_config.toml or evaluation_config.toml
+    :param run_name: Name of the run, e.g. the model name
+    :return: Metrics emitter writing to <metrics_directory>/<run_name>_<timestamp>.jsonl, or a
+    disabled emitter if emit_metrics is false
+    """
+    if not config["emit_metrics"]:
+        return MetricsEmitter(None)
+
+    path = os.path.join(
+        config["metrics_directory"],
+        run_name + "_" + time.strftime("%Y%m%d_%H%M%S") + ".jsonl",
+    )
+    print("Writing metrics to: " + path)
+
+    return MetricsEmitter(path)
+
+
+def load_events(path: str) -> list:
+    """
+    :param path: Path to a .jsonl metrics file
+    :return: List of events
+    """
+    with open(path) as metrics_file:
+        return [json.loads(line) for line in metrics_file if line.strip()]
+
+
+def summarise_run(events: list) -> dict:
+    """
+    This function summarises a run from its events.
+    :param events: Events of the run
+    :return: Dictionary of summary values
+    """
+    summary = {
+        "duration_s": events[-1]["time"] - events[0]["time"] if events else 0.0,
+        "peak_rss_mb": max((event["rss_mb"] for event in events), default=float("nan")),
+    }
+
+    for phase in ["train", "validation"]:
+        epochs = [
+            event
+            for event in events
+            if event["event"] == "epoch" and event["phase"] == phase
+        ]
+        if len(epochs) == 0:
+            continue
+        summary[phase + "_epochs"] = len(epochs)
+        summary[phase + "_best_accuracy"] = max(event["accuracy"] for event in epochs)
+        summary[phase + "_final_loss"] = epochs[-1]["loss"]
+        summary[phase + "_images_per_sec"] = float(
+            np.mean([event["images_per_sec"] for event in epochs])
+        )
+        summary[phase + "_data_wait_ratio"] = float(
+            np.mean([event["data_wait_ratio"] for event in epochs])
+        )
+
+    evaluations = [event for event in events if event["event"] == "evaluation"]
+    if evaluations:
+        summary["top_1_accuracy"] = evaluations[-1]["top_1_accuracy"]
+        summary["top_5_accuracy"] = evaluations[-1]["top_5_accuracy"]
+        summary["evaluation_images_per_sec"] = evaluations[-1]["images_per_sec"]
+
+    trials = [event for event in events if event["event"] == "trial"]
+    if trials:
+        summary["trials"] = len(trials)
+        summary["best_trial_accuracy"] = max(
+            event["best_validation_accuracy"] for event in trials
+        )
+
+    return summary
+
+
+def main():
+    """
+    Usage:
+    python metrics_emitter.py summary <run.jsonl>
+    python metrics_emitter.py compare <baseline.jsonl> <run.jsonl>
+    """
+    mode = sys.argv[1]
+
+    if mode == "summary":
+        for key, value in summarise_run(load_events(sys.argv[2])).items():
+            print("{:<30} {:.4f}".format(key, value))
+
+    elif mode == "compare":
+        baseline = summarise_run(load_events(sys.argv[2]))
+        run = summarise_run(load_events(sys.argv[3]))
+        print("{:<30} {:>12} {:>12} {:>9}".format("", "Baseline", "Run", "Change"))
+        for key in baseline:
+            if key not in run:
+                continue
+            if baseline[key] != 0:
+                change = "{:+.1f}%".format((run[key] / baseline[key] - 1) * 100)
+            else:
+                change = "-"
+            print(
+                "{:<30} {:>12.4f} {:>12.4f} {:>9}".format(
+                    key, baseline[key], run[key], change
+                )
+            )
+
+    else:
+        raise ValueError("mode must be one of: summary, compare")
+
+    return
+
+
+if __name__ == "__main__":
+    main()
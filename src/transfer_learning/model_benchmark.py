@@ -0,0 +1,104 @@
+"""
+This program benchmarks the registered architectures in order to compare their cost and accuracy.
+For every model it reports the number of parameters, the FLOPs per image, the CPU throughput
+(images/sec) and, if trained weights exist in models_trained/, the Top-1 and Top-5 testing accuracy.
+Version: 19/10/2026
+"""
+import os
+import sys
+import time
+
+import pandas as pd
+import toml
+import torch
+
+import model_registry
+from model_complexity import count_flops, count_parameters
+from model_evaluation import load_testing_set_and_transform, make_predictions
+from model_training import initialise_model
+
+
+def measure_throughput(
+    model, input_size: int, batch_size: int, num_batches: int
+) -> float:
+    """
+    This function measures the inference throughput of the model on the CPU.
+    :param model: Model in evaluation mode
+    :param input_size: Input size of the network
+    :param batch_size: Number of images per forward pass
+    :param num_batches: Number of timed forward passes
+    :return: Images classified per second
+    """
+    inputs = torch.randn(batch_size, 3, input_size, input_size)
+    with torch.no_grad():
+        model(inputs)  # Warm up run is not timed
+        start_time = time.perf_counter()
+        for i in range(num_batches):
+            model(inputs)
+
+    return batch_size * num_batches / (time.perf_counter() - start_time)
+
+
+def benchmark_model(model_name: str, dataset_path: str, batch_size: int) -> dict:
+    """
+    This function benchmarks a single registered architecture.
+    :param model_name: Name of the architecture
+    :param dataset_path: Path to the dataset containing the test/ set
+    :param batch_size: Batch size used for measuring throughput and evaluating
+    :return: Dictionary with the benchmark results of the model
+    """
+    input_size = model_registry.get_input_size(model_name)
+    testing_loader, classes = load_testing_set_and_transform(
+        dataset_path, uses_inception=input_size == 299, batch_size=batch_size
+    )
+
+    model, input_size = initialise_model(
+        model_name, len(classes), freeze_all=False, pretrained=False
+    )
+    model.eval()
+
+    results = {
+        "Model": model_name,
+        "Parameters (M)": count_parameters(model) / 1e6,
+        "GFLOPs": count_flops(model, input_size) / 1e9,
+        "CPU images/sec": measure_throughput(
+            model, input_size, batch_size, num_batches=5
+        ),
+        "Top-1 (%)": None,
+        "Top-5 (%)": None,
+    }
+
+    trained_weights = "models_trained/" + model_name + "_model.pth"
+    if os.path.exists(trained_weights):
+        metrics = make_predictions(testing_loader, classes, model_name, trained_weights)
+        results["Top-1 (%)"] = metrics.top_1_accuracy
+        results["Top-5 (%)"] = metrics.top_5_accuracy
+
+    return results
+
+
+def main():
+    """
+    Usage: python model_benchmark.py <dataset_directory> [model_name ...]
+    All registered architectures are benchmarked if no model names are given.
+    """
+    dataset_path = sys.argv[1]
+    model_names = sys.argv[2:] or model_registry.get_model_names()
+    config = toml.load("evaluation_config.toml")
+
+    all_results = []
+    for model_name in model_names:
+        print("Benchmarking: " + model_name)
+        all_results.append(
+            benchmark_model(model_name, dataset_path, config["batch_size"])
+        )
+
+    benchmark_table = pd.DataFrame(all_results)
+    print(benchmark_table.to_string(index=False, float_format="{:.2f}".format))
+    benchmark_table.to_csv("./classification_reports/model_benchmark.csv", index=False)
+
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+This program contains helper functions which measure the size and the computational cost of a model,
+so that architectures can be compared on how much compute they need per image.
+Version: 19/10/2026
+"""
+import torch
+import torch.nn as nn
+
+
+def count_parameters(model: nn.Module) -> int:
+    """
+    This function counts the parameters of the model.
+    :param model: Model to measure
+    :return: Number of parameters
+    """
+    return sum(parameter.numel() for parameter in model.parameters())
+
+
+def count_flops(model: nn.Module, input_size: int) -> int:
+    """
+    This function estimates the floating point operations of a forward pass over a single image.
+    Convolutional and fully connected layers are counted, as they account for almost all of the
+    compute of the architectures used. One multiply-accumulate is counted as two operations.
+    :param model: Model to measure
+    :param input_size: Input size of the network
+    :return: Number of floating point operations per image
+    """
+    flops = []
+
+    def conv_hook(module, inputs, output):
+        kernel_operations = (
+            (module.in_channels // module.groups)
+            * module.kernel_size[0]
+            * module.kernel_size[1]
+        )
+        flops.append(2 * kernel_operations * output.numel())
+
+    def linear_hook(module, inputs, output):
+        flops.append(2 * module.in_features * output.numel())
+
+    hooks = []
+    for module in model.modules():
+        if isinstance(module, nn.Conv2d):
+            hooks.append(module.register_forward_hook(conv_hook))
+        elif isinstance(module, nn.Linear):
+            hooks.append(module.register_forward_hook(linear_hook))
+
+    was_training = model.training
+    model.eval()
+    with torch.no_grad():
+        model(torch.zeros(1, 3, input_size, input_size))
+    model.train(was_training)
+
+    for hook in hooks:
+        hook.remove()
+
+    return sum(flops)
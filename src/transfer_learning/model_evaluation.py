@@ -1,32 +1,152 @@
 """
 This script evaluates the model performance on unseen (testing) dataset.
 It calculates the Top-1 and Top-5 predictions and gets the percentage of
-correct predictions which were achieved.
+correct predictions which were achieved, optionally averaging over test time augmentation views.
 Version 07/08/2020
 """
 import os
 import sys
+import time
 from typing import Tuple, Dict, List
 
-import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
+import toml
 import torch
 import torchvision as vision
-from sklearn import metrics
-from torch.utils.data import DataLoader
+from torch.utils.data import DataLoader, Subset
 
+from metrics_emitter import create_emitter
+from prediction_store import PredictionWriter
 from model_training import initialise_model
+from streaming_metrics import ClassificationMetrics
+
+# Size every ISS image of the dataset was resized to by preprocessing_pipeline/resize_images.py
+RESIZED_IMAGE_SIZE = (224, 224)
+
+
+def get_test_transform(input_size: int) -> vision.transforms.Compose:
+    """
+    This function builds the preprocessing applied to every image at inference time.
+    :param input_size: Input size of the network, 299 for InceptionV3 and 224 otherwise
+    :return: Composed transformation producing a normalised image tensor
+    """
+    return vision.transforms.Compose(
+        [
+            vision.transforms.CenterCrop(input_size),
+            vision.transforms.ToTensor(),
+            vision.transforms.Normalize(
+                mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]
+            ),  # ImageNet normalisation
+        ]
+    )
+
+
+def get_frame_transform(input_size: int) -> vision.transforms.Compose:
+    """
+    This function builds the preprocessing applied to full size ISS frames, e.g. archive images which did not
+    go through the pre-processing pipeline. The whole frame is first squashed to the size the training images
+    were resized to, as resize_images.py does (box filtering is the PIL equivalent of cv2.INTER_AREA),
+    and then transformed like the testing set.
+    :param input_size: Input size of the network, 299 for InceptionV3 and 224 otherwise
+    :return: Composed transformation producing a normalised image tensor
+    """
+    return vision.transforms.Compose(
+        [
+            vision.transforms.Resize(
+                RESIZED_IMAGE_SIZE,
+                interpolation=vision.transforms.InterpolationMode.BOX,
+            ),
+            get_test_transform(input_size),
+        ]
+    )
+
+
+class MultiCrop:
+    def __init__(self, input_sizes: List[int]):
+        """
+        Transformation producing the centre crops for several network input sizes from a single
+        decoded image, so that models with different input sizes (e.g. 224 and 299) can share one decode.
+        :param input_sizes: Input sizes of the networks to prepare crops for
+        """
+        self.transforms = {size: get_test_transform(size) for size in set(input_sizes)}
+
+    def __call__(self, image):
+        return {size: transform(image) for size, transform in self.transforms.items()}
+
+
+def load_multi_crop_set(
+    dataset_path: str, input_sizes: List[int], batch_size: int
+) -> Tuple[DataLoader, List]:
+    """
+    This function creates a data loader which decodes every image once and returns a dictionary
+    of batches, one per input size, in a fixed order.
+    :param dataset_path: Path to a dataset split (e.g. the test/ or validation/ directory)
+    :param input_sizes: Input sizes of the networks which are evaluated on the batches
+    :param batch_size: Number of images per batch
+    :return: data_loader, classes
+    """
+    dataset = vision.datasets.ImageFolder(dataset_path, MultiCrop(input_sizes))
+    data_loader = DataLoader(
+        dataset, batch_size=batch_size, shuffle=False, num_workers=4
+    )
+
+    return data_loader, dataset.classes
+
+
+def get_classes(dataset_path: str) -> List[str]:
+    """
+    This function lists the classes (cities) of a dataset directory in the same order as ImageFolder,
+    which is the order of the outputs of a model trained on that dataset.
+    :param dataset_path: Path to a directory containing one subdirectory per city
+    :return: Sorted list of class names
+    """
+    return sorted(entry.name for entry in os.scandir(dataset_path) if entry.is_dir())
+
+
+def load_trained_model(model_name: str, num_classes: int, trained_weights: str, device):
+    """
+    This function initialises the chosen architecture and loads the trained weights into it.
+    :param model_name: Name of the architecture the weights were trained on
+    :param num_classes: Number of classes the model was trained to predict
+    :param trained_weights: Path to the trained model weights (.pth), or a TorchScript model (.pt)
+    such as the int8 models produced by quantisation.py
+    :param device: Device on which to place the model
+    :return: Trained model in evaluation mode
+    """
+    if trained_weights.endswith(".pt"):
+        model = torch.jit.load(trained_weights, map_location=device)
+        model.eval()
+        return model
+
+    model = initialise_model(
+        model_name=model_name,
+        num_classes=num_classes,
+        freeze_all=False,
+        pretrained=False,  # The ImageNet weights would be overwritten by the trained weights
+    )[0]
+    model.load_state_dict(torch.load(trained_weights, map_location=device))
+    model.to(device)
+    model.eval()
+
+    return model
 
 
 def load_testing_set_and_transform(
-    testing_set_path: str, uses_inception: bool
+    testing_set_path: str,
+    uses_inception: bool,
+    batch_size: int = 64,
+    shard_index: int = 0,
+    num_shards: int = 1,
 ) -> Tuple[Dict, List]:
     """
     This function creates a dataloader for the testing set and preprocesses the data
     in order to fit the pretrained network architecture.
+    The testing set is not shuffled, so batches are always evaluated in the same order.
     :param testing_set_path:
     :param uses_inception:
+    :param batch_size: Number of testing images passed through the network per forward pass
+    :param shard_index: Index of the shard of the testing set to evaluate (for evaluation across processes)
+    :param num_shards: Number of shards the testing set is split into, 1 evaluates the whole testing set
     :return: testing_loader - test set dataloader, classes - classes from which to predict.
     """
     if uses_inception:
@@ -34,17 +154,7 @@ def load_testing_set_and_transform(
     else:
         input_size = 224
 
-    transformations = {
-        "test": vision.transforms.Compose(
-            [
-                vision.transforms.CenterCrop(input_size),
-                vision.transforms.ToTensor(),
-                vision.transforms.Normalize(
-                    mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]
-                ),
-            ]
-        )
-    }
+    transformations = {"test": get_test_transform(input_size)}
 
     testing_set = {
         image: vision.datasets.ImageFolder(
@@ -52,95 +162,227 @@ def load_testing_set_and_transform(
         )
         for image in ["test"]
     }
+    classes = testing_set["test"].classes
+
+    if num_shards > 1:
+        testing_set["test"] = Subset(
+            testing_set["test"],
+            range(shard_index, len(testing_set["test"]), num_shards),
+        )
+
     testing_loader = {
-        image: DataLoader(testing_set[image], batch_size=1, shuffle=True, num_workers=4)
+        image: DataLoader(
+            testing_set[image], batch_size=batch_size, shuffle=False, num_workers=4
+        )
         for image in ["test"]
     }
 
-    classes = testing_set["test"].classes
-
     return testing_loader, classes
 
 
+def get_image_ids(testing_set) -> List[str]:
+    """
+    :param testing_set: ImageFolder testing set, or a Subset of it for a shard
+    :return: Path of every image relative to the testing set directory, in evaluation order
+    """
+    if isinstance(testing_set, Subset):
+        image_folder, indices = testing_set.dataset, testing_set.indices
+    else:
+        image_folder, indices = testing_set, range(len(testing_set))
+
+    return [
+        os.path.relpath(image_folder.samples[index][0], image_folder.root)
+        for index in indices
+    ]
+
+
+# Test time augmentation views, in the order they are added as the view budget grows.
+# The crops are square, so rotations by 90 degrees keep the input size.
+TTA_VIEWS = [
+    lambda x: x,  # Original image
+    lambda x: x.flip(3),  # Horizontal flip
+    lambda x: x.flip(2),  # Vertical flip
+    lambda x: x.rot90(1, (2, 3)),  # 90 degree rotation
+    lambda x: x.rot90(3, (2, 3)),  # 270 degree rotation
+    lambda x: x.rot90(2, (2, 3)),  # 180 degree rotation
+    lambda x: x.transpose(2, 3),  # Reflection over the main diagonal
+    lambda x: x.rot90(2, (2, 3)).transpose(2, 3),  # Reflection over the anti diagonal
+]
+
+
+def make_tta_views(inputs: torch.Tensor, num_views: int) -> torch.Tensor:
+    """
+    This function stacks the test time augmentation views of a batch into a single batch,
+    so that all views are classified in one forward pass.
+    :param inputs: Batch of images of shape (batch, channels, height, width)
+    :param num_views: View budget - number of views per image, from 1 (no augmentation) to 8
+    :return: Batch of shape (num_views * batch, channels, height, width), grouped by view
+    """
+    if not 1 <= num_views <= len(TTA_VIEWS):
+        raise ValueError("num_views must be between 1 and " + str(len(TTA_VIEWS)))
+
+    return torch.cat([view(inputs) for view in TTA_VIEWS[:num_views]])
+
+
+def evaluate_model(
+    model, testing_loader, classes, device, tta_views=1, prediction_writer=None
+) -> ClassificationMetrics:
+    """
+    This function classifies the testing set with a loaded model and accumulates the metrics.
+    With test time augmentation, the logits of all views of an image are averaged.
+    :param model: Trained model in evaluation mode
+    :param testing_loader: PyTorch Data Loader of the testing set
+    :param classes: List of possible classes
+    :param device: Device on which the model runs
+    :param tta_views: Number of test time augmentation views per image, 1 disables augmentation
+    :param prediction_writer: PredictionWriter to which the logits of every image are added
+    :return: metrics - Confusion matrix and Top-5 counts accumulated over the testing set
+    """
+    metrics = ClassificationMetrics(classes)
+
+    with torch.no_grad():
+        for inputs, labels in testing_loader["test"]:
+            inputs = inputs.to(device)
+            labels = labels.to(device)
+            if tta_views > 1:
+                outputs = model(make_tta_views(inputs, tta_views))
+                outputs = outputs.view(tta_views, len(inputs), -1).mean(dim=0)
+            else:
+                outputs = model(inputs)
+            prediction_top_1 = outputs.argmax(dim=1)
+            prediction_top_5 = outputs.topk(min(5, len(classes)), dim=1)[1]
+            top_5_hits = (prediction_top_5 == labels.unsqueeze(1)).any(dim=1)
+            metrics.update(
+                labels.cpu().numpy(),
+                prediction_top_1.cpu().numpy(),
+                top_5_hits.cpu().numpy(),
+            )
+            if prediction_writer is not None:
+                prediction_writer.update(
+                    labels.cpu().numpy(), outputs.float().cpu().numpy()
+                )
+
+    return metrics
+
+
 def make_predictions(
-    testing_loader, classes, model, trained_weights
-) -> Tuple[List, List]:
+    testing_loader,
+    classes,
+    model,
+    trained_weights,
+    tta_views=1,
+    metrics_emitter=None,
+    prediction_writer=None,
+) -> ClassificationMetrics:
     """
     This function makes inference and predicts the classes for a given image.
     :param testing_loader: PyTorch Data Loader of the testing set
     :param classes: List of possible classes
     :param model: Trained PyTorch model
-    :param trained_weights: Trained model weights
-    :return:
+    :param trained_weights: Trained model weights (.pth) or TorchScript model, e.g. int8 quantised (.pt)
+    :param tta_views: Number of test time augmentation views per image, 1 disables augmentation
+    :param metrics_emitter: MetricsEmitter to which the evaluation results are emitted
+    :param prediction_writer: PredictionWriter to which the logits of every image are added
+    :return: metrics - Confusion matrix and Top-5 counts accumulated over the testing set
     """
     device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
-    model = initialise_model(
-        model_name=model, num_classes=len(classes), freeze_all=False
-    )[0]
-    model.load_state_dict(torch.load(trained_weights))
-    model.to(device)
+    if trained_weights.endswith(".pt"):
+        device = torch.device("cpu")  # Quantised models only run on the CPU
+    model = load_trained_model(model, len(classes), trained_weights, device)
 
-    with torch.no_grad():
-        model.eval()
-        top_1_accuracy = 0
-        top_5_accuracy = 0
-        #  Confusion Matrix variables
-        all_ground_truth = []
-        all_predictions = []
+    start_time = time.perf_counter()
+    metrics = evaluate_model(
+        model, testing_loader, classes, device, tta_views, prediction_writer
+    )
+    time_elapsed = time.perf_counter() - start_time
 
-        for inputs, labels in testing_loader["test"]:
-            inputs = inputs.to(device)
-            outputs = model(inputs)
-            outputs = outputs.to(device)
-            outputs = torch.exp(outputs)
-            predictions = outputs.data.cpu()
-            prediction_top_1 = np.argmax(predictions.numpy())
-            prediction_top_5 = predictions.topk(5, dim=1)[1]
-            all_ground_truth.append(classes[torch.max(labels).item()])
-            all_predictions.append(classes[prediction_top_1])
+    print("Testing accuracy (Top-1): {:.2f}".format(metrics.top_1_accuracy))
+    print("Testing accuracy (Top-5): {:.2f}".format(metrics.top_5_accuracy))
+    if metrics_emitter is not None:
+        metrics_emitter.emit(
+            "evaluation",
+            trained_weights=trained_weights,
+            num_samples=metrics.num_samples,
+            top_1_accuracy=metrics.top_1_accuracy,
+            top_5_accuracy=metrics.top_5_accuracy,
+            images_per_sec=metrics.num_samples / time_elapsed,
+            tta_views=tta_views,
+            num_workers=testing_loader["test"].num_workers,
+        )
 
-            if classes[torch.max(labels).item()] == classes[prediction_top_1]:
-                top_1_accuracy += 1
+    return metrics
 
-            if torch.max(labels).item() in prediction_top_5:
-                top_5_accuracy += 1
 
-        test_accuracy_top_1 = (top_1_accuracy / len(testing_loader["test"])) * 100
-        test_accuracy_top_5 = (top_5_accuracy / len(testing_loader["test"])) * 100
+def tta_report(testing_loader, classes, model, trained_weights) -> None:
+    """
+    This function evaluates every test time augmentation view budget and reports the accuracy
+    gained per unit of extra compute, relative to evaluating without augmentation.
+    :param testing_loader: PyTorch Data Loader of the testing set
+    :param classes: List of possible classes
+    :param model: Trained PyTorch model
+    :param trained_weights: Trained model weights
+    :return:
+    """
+    device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
+    model = load_trained_model(model, len(classes), trained_weights, device)
+
+    print(
+        "Views |  Top-1 |  Top-5 | Time (s) | Relative cost | Top-1 gain per extra cost"
+    )
+    for num_views in range(1, len(TTA_VIEWS) + 1):
+        start_time = time.perf_counter()
+        metrics = evaluate_model(model, testing_loader, classes, device, num_views)
+        time_elapsed = time.perf_counter() - start_time
 
-        print("Testing accuracy (Top-1): {:.2f}".format(test_accuracy_top_1))
-        print("Testing accuracy (Top-5): {:.2f}".format(test_accuracy_top_5))
+        if num_views == 1:
+            baseline_accuracy, baseline_time = metrics.top_1_accuracy, time_elapsed
+            gain_per_cost = "-"
+        else:
+            extra_cost = time_elapsed / baseline_time - 1
+            gain_per_cost = "{:+.3f}".format(
+                (metrics.top_1_accuracy - baseline_accuracy) / max(extra_cost, 1e-9)
+            )
+        print(
+            "{:5d} | {:6.2f} | {:6.2f} | {:8.1f} | {:13.2f} | {}".format(
+                num_views,
+                metrics.top_1_accuracy,
+                metrics.top_5_accuracy,
+                time_elapsed,
+                time_elapsed / baseline_time,
+                gain_per_cost,
+            )
+        )
 
-    return all_ground_truth, all_predictions
+    return
 
 
 def create_confusion_matrix(
-    ground_truth, predictions, classes, generate_report, title
+    metrics: ClassificationMetrics, generate_report, title, renderer=None
 ) -> np.ndarray:
     """
-    This function creates a confusion matrix for the given ground truth (true labels) and
-    predictions generated by the classifier.
+    This function plots the confusion matrix accumulated by make_predictions() from the
+    ground truth (true labels) and predictions generated by the classifier.
+    :param renderer: PlotRenderer which renders the plot. If not supplied, it is rendered straight away.
     :return: Confusion matrix - Matrix with the amount of true/false predictions.
     """
-    conf_matrix = metrics.confusion_matrix(ground_truth, predictions, labels=classes)
-
-    plt.figure(figsize=(12, 12))
-    plt.imshow(conf_matrix, cmap="jet")
-    plt.colorbar()
-    ticks = np.arange(len(classes))
-    plt.xticks(ticks, classes, rotation=90)
-    plt.yticks(ticks, classes)
-    plt.ylim(-0.5, len(classes))
-    plt.title(title)
-    plt.savefig(
-        "../visualisations/confusion_matrices/" + title + "_Confusion_Matrix.png"
+    # Imported here, so that evaluating without plotting does not import matplotlib
+    from plot_rendering import PlotRenderer, render_matrix
+
+    if renderer is None:
+        renderer = PlotRenderer()
+    conf_matrix = metrics.confusion_matrix
+
+    renderer.submit(
+        "../visualisations/confusion_matrices/" + title + "_Confusion_Matrix.png",
+        render_matrix,
+        conf_matrix,
+        metrics.classes,
+        title,
+        figure_kwargs={"figsize": (12, 12)},
     )
 
     if generate_report:
-        report = metrics.classification_report(
-            ground_truth, predictions, labels=classes, output_dict=True
-        )
-        report_to_pandas = pd.DataFrame(report).transpose()
+        report_to_pandas = metrics.classification_report()
         report_to_pandas.to_csv(
             "./classification_reports/" + title + "_rgb_classification_report_.csv"
         )
@@ -157,22 +399,62 @@ def main():
     else:
         uses_inception = False
 
+    config = toml.load("evaluation_config.toml")
+
+    # An optional fourth argument "i/n" evaluates only shard i of n, e.g. "0/4"
+    if len(sys.argv) > 4:
+        shard_index, num_shards = [int(i) for i in sys.argv[4].split("/")]
+        title = model + "_shard_" + str(shard_index) + "_of_" + str(num_shards)
+    else:
+        shard_index, num_shards = 0, 1
+        title = model
+
     testing_loader, classes = load_testing_set_and_transform(
-        sys.argv[2], uses_inception=uses_inception
+        sys.argv[2],
+        uses_inception=uses_inception,
+        batch_size=config["batch_size"],
+        shard_index=shard_index,
+        num_shards=num_shards,
     )
-    ground_truth, predictions = make_predictions(
+    if config["tta_report"]:
+        tta_report(testing_loader, classes, model, trained_weights=sys.argv[3])
+        return
+
+    metrics_emitter = create_emitter(config, title + "_evaluation")
+    prediction_writer = None
+    if config["store_predictions"]:
+        # Other metrics can be computed from the stored logits with prediction_store.py
+        prediction_writer = PredictionWriter(
+            os.path.join(config["predictions_directory"], title + "_predictions.npz"),
+            get_image_ids(testing_loader["test"].dataset),
+            classes,
+            model_id=model + ":" + os.path.basename(sys.argv[3]),
+        )
+    metrics = make_predictions(
         testing_loader=testing_loader,
         classes=classes,
         model=model,
         trained_weights=sys.argv[3],
+        tta_views=config["tta_views"],
+        metrics_emitter=metrics_emitter,
+        prediction_writer=prediction_writer,
     )
-    create_confusion_matrix(
-        ground_truth=ground_truth,
-        predictions=predictions,
-        classes=classes,
-        generate_report=True,
-        title=model,
-    )
+    metrics_emitter.close()
+    if prediction_writer is not None:
+        prediction_writer.close()
+
+    if num_shards > 1:
+        # Shard metrics are summed afterwards with streaming_metrics.py
+        metrics.save("./classification_reports/" + title + "_metrics.npz")
+    else:
+        # The classification report is written while the confusion matrix is rendered
+        from plot_rendering import create_renderer
+
+        renderer = create_renderer(config)
+        create_confusion_matrix(
+            metrics=metrics, generate_report=True, title=title, renderer=renderer
+        )
+        renderer.close()
 
     return
 
@@ -0,0 +1,221 @@
+"""
+This program contains the registry of the CNN architectures which can be trained and evaluated.
+Each architecture is registered with the torchvision function which builds it, its family and its input size.
+The family decides how the ImageNet classification head is replaced by a head for the ISS cities.
+New architectures are added by adding an entry to MODEL_REGISTRY (and to HEAD_PATHS and STAGE_PATHS
+for a new family).
+Version: 19/10/2026
+"""
+from typing import List
+
+import torch.nn as nn
+import torchvision as vision
+
+MODEL_REGISTRY = {
+    "InceptionV3": {
+        "builder": vision.models.inception_v3,
+        "family": "inception",
+        "input_size": 299,
+    },
+    "VGG-19_BN": {
+        "builder": vision.models.vgg19_bn,
+        "family": "vgg",
+        "input_size": 224,
+    },
+    "ResNet-18": {
+        "builder": vision.models.resnet18,
+        "family": "resnet",
+        "input_size": 224,
+    },
+    "ResNet-101": {
+        "builder": vision.models.resnet101,
+        "family": "resnet",
+        "input_size": 224,
+    },
+    "ResNet-152": {
+        "builder": vision.models.resnet152,
+        "family": "resnet",
+        "input_size": 224,
+    },
+    "MobileNetV3": {
+        "builder": vision.models.mobilenet_v3_large,
+        "family": "mobilenet",
+        "input_size": 224,
+    },
+    "MobileNetV3-Small": {
+        "builder": vision.models.mobilenet_v3_small,
+        "family": "mobilenet",
+        "input_size": 224,
+    },
+    "EfficientNet-B0": {
+        "builder": vision.models.efficientnet_b0,
+        "family": "efficientnet",
+        "input_size": 224,
+    },
+    "EfficientNet-B2": {
+        "builder": vision.models.efficientnet_b2,
+        "family": "efficientnet",
+        "input_size": 224,
+    },
+    "RegNetY-800MF": {
+        "builder": vision.models.regnet_y_800mf,
+        "family": "regnet",
+        "input_size": 224,
+    },
+    "RegNetY-1.6GF": {
+        "builder": vision.models.regnet_y_1_6gf,
+        "family": "regnet",
+        "input_size": 224,
+    },
+    "ShuffleNetV2": {
+        "builder": vision.models.shufflenet_v2_x1_0,
+        "family": "shufflenet",
+        "input_size": 224,
+    },
+}
+
+# Path to the final classification layer of each family
+HEAD_PATHS = {
+    "inception": "fc",
+    "vgg": "classifier.6",
+    "resnet": "fc",
+    "mobilenet": "classifier.3",
+    "efficientnet": "classifier.1",
+    "regnet": "fc",
+    "shufflenet": "fc",
+}
+
+# Paths to the stages of the backbone of each family, from the input to the output. A stage is a group of
+# blocks at the same resolution, or a single Sequential backbone which is split into segments where needed.
+STAGE_PATHS = {
+    "inception": [
+        "Mixed_5b",
+        "Mixed_5c",
+        "Mixed_5d",
+        "Mixed_6a",
+        "Mixed_6b",
+        "Mixed_6c",
+        "Mixed_6d",
+        "Mixed_6e",
+        "Mixed_7a",
+        "Mixed_7b",
+        "Mixed_7c",
+    ],
+    "vgg": ["features"],
+    "resnet": ["layer1", "layer2", "layer3", "layer4"],
+    "mobilenet": ["features"],
+    "efficientnet": ["features." + str(i) for i in range(1, 8)],
+    "regnet": ["trunk_output.block" + str(i) for i in range(1, 5)],
+    "shufflenet": ["stage2", "stage3", "stage4"],
+}
+
+
+def get_model_names() -> List[str]:
+    """
+    :return: Names of all registered architectures
+    """
+    return list(MODEL_REGISTRY.keys())
+
+
+def get_input_size(model_name: str) -> int:
+    """
+    :param model_name: Name of a registered architecture
+    :return: Input size of the architecture (299 for InceptionV3, 224 otherwise)
+    """
+    return get_model_entry(model_name)["input_size"]
+
+
+def get_model_entry(model_name: str) -> dict:
+    """
+    :param model_name: Name of a registered architecture
+    :return: Registry entry of the architecture
+    """
+    if model_name not in MODEL_REGISTRY:
+        raise ValueError("model_name parameter received an unsupported model name")
+
+    return MODEL_REGISTRY[model_name]
+
+
+def get_head(model: nn.Module, model_name: str) -> nn.Module:
+    """
+    This function returns the final classification layer of the model.
+    :param model: Model built from the registry
+    :param model_name: Name of the architecture
+    :return: Classification layer
+    """
+    return model.get_submodule(HEAD_PATHS[get_model_entry(model_name)["family"]])
+
+
+def get_stages(model: nn.Module, model_name: str) -> List[nn.Module]:
+    """
+    This function returns the stages of the backbone of the model.
+    :param model: Model built from the registry
+    :param model_name: Name of the architecture
+    :return: Stages, from the input to the output
+    """
+    return [
+        model.get_submodule(stage_path)
+        for stage_path in STAGE_PATHS[get_model_entry(model_name)["family"]]
+    ]
+
+
+def set_head(model: nn.Module, model_name: str, head: nn.Module) -> None:
+    """
+    This function replaces the final classification layer of the model.
+    :param model: Model built from the registry
+    :param model_name: Name of the architecture
+    :param head: New classification layer (or nn.Identity() to output the features)
+    :return:
+    """
+    head_path = HEAD_PATHS[get_model_entry(model_name)["family"]]
+    if "." in head_path:
+        parent_path, head_name = head_path.rsplit(".", 1)
+        parent = model.get_submodule(parent_path)
+    else:
+        parent, head_name = model, head_path
+    setattr(parent, head_name, head)
+
+    return
+
+
+def build_model(model_name: str, pretrained: bool) -> nn.Module:
+    """
+    This function builds the architecture with its ImageNet classification head.
+    :param model_name: Name of a registered architecture
+    :param pretrained: If true, loads the weights pre-trained on ImageNet. Models whose trained weights
+    are loaded afterwards do not need them, which avoids downloading and loading them.
+    :return: Model
+    """
+    entry = get_model_entry(model_name)
+    if entry["family"] == "inception":
+        # The pre-trained InceptionV3 expects the input transformation and has an auxiliary classifier,
+        # so both are always enabled for trained weights to behave the same with or without pretrained
+        model = entry["builder"](
+            pretrained=pretrained,
+            aux_logits=True,
+            transform_input=True,
+            init_weights=False,
+        )
+    else:
+        model = entry["builder"](pretrained=pretrained)
+
+    return model
+
+
+def replace_heads(model: nn.Module, model_name: str, num_classes: int) -> None:
+    """
+    This function replaces the classification head(s) of the model with new Linear layers for num_classes classes.
+    :param model: Model built by build_model()
+    :param model_name: Name of the architecture
+    :param num_classes: Number of classes in the classification problem
+    :return:
+    """
+    num_features = get_head(model, model_name).in_features
+    set_head(model, model_name, nn.Linear(num_features, num_classes))
+
+    if get_model_entry(model_name)["family"] == "inception":
+        # Auxiliary Outputs Initialisation
+        aux_features = model.AuxLogits.fc.in_features
+        model.AuxLogits.fc = nn.Linear(aux_features, num_classes)
+
+    return
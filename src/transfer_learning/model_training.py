@@ -1,6 +1,7 @@
 """
 This is the main program for training transfer learning architectures on the ISS imagery dataset.
-It supports training ResNet-101, ResNet-152, VGG-19 and Inception V3.
+It supports training ResNet-101, ResNet-152, VGG-19 and Inception V3, as well as the
+CPU-efficient architectures (e.g. MobileNetV3, EfficientNet, RegNetY, ShuffleNetV2) in model_registry.py.
 Version: 19/07/2020
 """
 import copy
@@ -10,21 +11,37 @@ import time
 from typing import Tuple, Dict, List
 
 import PIL
-import matplotlib.pyplot as plt
 import numpy as np
-import toml
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 import torch.optim as optim
 import torchvision as vision
-from torch.utils.data import DataLoader
-
-import augmentation_visualisation as vis_augment
-from image_augmentation import Augmentation
+from torch.utils.data import DataLoader, RandomSampler
+
+import model_registry
+from batch_size_finder import get_batch_plan
+from layer_unfreezing import (
+    get_parameter_groups,
+    get_scheduled_stages,
+    set_trained_stages,
+)
+from metrics_emitter import MetricsEmitter, create_emitter
+from progressive_resizing import (
+    ProgressiveResizingDataset,
+    ResizingBatchSampler,
+    check_resize_schedule,
+    get_scheduled_size,
+)
+from training_profiler import TrainingProfiler
 
 
 def load_dataset_and_transforms(
-    dataset_path: str, uses_inception: bool, batch_size: int, augment: bool
+    dataset_path: str,
+    uses_inception: bool,
+    batch_size: int,
+    augment: bool,
+    progressive_resizing: bool = False,
 ) -> Tuple[Dict, List]:
     """
     This function loads the dataset, applies transformations to the images and creates
@@ -34,6 +51,8 @@ def load_dataset_and_transforms(
     :param uses_inception: Pre-trained InceptionV3 model has different input and an auxiliary outputs,
     hence it must be treated differently to other models used (e.g. VGG19 or ResNet-101)
     :param augment: If true, creates an instance of Augmentation class and applies the augmentations to transforms
+    :param progressive_resizing: If true, the input size of the training images can be changed between epochs
+    through data_loader["train"].batch_sampler.size, and the workers are kept between epochs
     :return: data_loader and classes - The data loader used to train the network and the number of classes
     """
 
@@ -43,6 +62,9 @@ def load_dataset_and_transforms(
         input_size = 224  # Other network architectures pre-trained on ImageNet have input size of 224x224 pixels
 
     if augment:
+        # Imported here, so that evaluation, which only needs initialise_model, does not import imgaug
+        from image_augmentation import Augmentation
+
         augmentations = (
             Augmentation()
         )  # Creates an instance of Augmentation class with relevant transformations
@@ -99,20 +121,56 @@ def load_dataset_and_transforms(
         for image in ["train", "validation"]
     }
 
-    data_loader = {
-        image: DataLoader(
-            image_dataset[image], batch_size=batch_size, shuffle=True, num_workers=4
-        )
-        for image in ["train", "validation"]
-    }
-
     classes = image_dataset["train"].classes
 
+    if progressive_resizing:
+        # The batch sampler runs in the main process and passes the input size to the workers with
+        # every image index, so the workers can persist while the input size changes
+        data_loader = {
+            "train": DataLoader(
+                ProgressiveResizingDataset(image_dataset["train"]),
+                batch_sampler=ResizingBatchSampler(
+                    RandomSampler(image_dataset["train"]), batch_size, input_size
+                ),
+                num_workers=4,
+                persistent_workers=True,
+            ),
+            "validation": DataLoader(
+                image_dataset["validation"],
+                batch_size=batch_size,
+                shuffle=True,
+                num_workers=4,
+                persistent_workers=True,
+            ),
+        }
+    else:
+        data_loader = {
+            image: DataLoader(
+                image_dataset[image], batch_size=batch_size, shuffle=True, num_workers=4
+            )
+            for image in ["train", "validation"]
+        }
+
     return data_loader, classes
 
 
 def train_model(
-    model, data_loader, device, criterion, optimizer, model_name, uses_inception, epochs
+    model,
+    data_loader,
+    device,
+    criterion,
+    optimizer,
+    model_name,
+    uses_inception,
+    epochs,
+    teacher_logits=None,
+    profiler=None,
+    metrics_emitter=None,
+    accumulation_steps=1,
+    resize_schedule=None,
+    sample_statistics=None,
+    scheduler=None,
+    unfreeze_schedule=None,
 ):
     """
     This function begins training of the model. It takes a model pre-trained on ImageNet and
@@ -127,10 +185,41 @@ def train_model(
     :param model_name: Model name from standard input
     :param epochs: Number of epochs to train the model for, e.g. 30
     :param uses_inception: Checks whether the model being trained is InceptionV3.
+    :param teacher_logits: Cached teacher outputs for knowledge distillation. If supplied, the training
+    data loader must also return the index of each image, and the criterion receives the teacher outputs
+    for the batch as a third argument during training.
+    :param profiler: TrainingProfiler which records the timings of every step. If not supplied,
+    the training loop is not profiled.
+    :param metrics_emitter: MetricsEmitter to which step and epoch metrics are emitted. If not supplied,
+    no metrics are emitted.
+    :param accumulation_steps: Number of micro-batches whose gradients are accumulated before every
+    optimiser step, so that the effective batch size is the micro-batch size times accumulation_steps.
+    The loss of every micro-batch is divided by the number of micro-batches in its group (accumulation_steps,
+    or fewer for the last group of an epoch), so the accumulated gradient is the mean over the effective batch.
+    Note that BatchNorm layers still normalise each micro-batch with its own statistics and update their
+    running statistics once per micro-batch, so with small micro-batches (e.g. fewer than 16 images) training
+    is noisier than with the full batch, and it is not equivalent to training with the effective batch size.
+    :param resize_schedule: Progressive resizing schedule, a list of [first epoch, scale of the input size].
+    If supplied, the training data loader must be built with progressive_resizing=True. Validation always
+    uses the full input size.
+    :param sample_statistics: SampleStatistics to which the loss and prediction of every training image are
+    recorded, for sample selection. If supplied, the training data loader must also return the index of each image.
+    :param scheduler: Learning rate scheduler created by lr_scheduling.create_scheduler(), stepped after every
+    optimiser step. If not supplied, the learning rate of the optimiser is constant.
+    :param unfreeze_schedule: Progressive unfreezing schedule, a list of [first epoch, number of stages trained].
+    If supplied, the parameter groups of the optimiser must be built by layer_unfreezing.get_parameter_groups().
     :return: model, history - The trained model weights and dictionary of training history
     """
     training_start_time = time.time()  # Gets time when training started
 
+    if resize_schedule:
+        check_resize_schedule(resize_schedule, model_name)
+
+    if profiler is None:
+        profiler = TrainingProfiler(device, enabled=False)
+    if metrics_emitter is None:
+        metrics_emitter = MetricsEmitter(None)
+
     best_model_weights = copy.deepcopy(
         model.state_dict()
     )  # Initialises model with ImageNet weights
@@ -147,12 +236,27 @@ def train_model(
     validation_accuracy_history = []
     training_loss_history = []
     validation_loss_history = []
+    epoch_time_history = []
+    input_size_history = []
 
     for epoch in range(1, epochs + 1):
         print("Epoch: " + str(epoch) + "/" + str(epochs))
         if validation_loss_not_improving == patience:
             break
 
+        epoch_start_time = time.perf_counter()
+        input_size = model_registry.get_input_size(model_name)
+        if resize_schedule:
+            input_size = get_scheduled_size(resize_schedule, epoch, input_size)
+            data_loader["train"].batch_sampler.size = input_size
+            print("Training input size: " + str(input_size))
+        input_size_history.append(input_size)
+        if unfreeze_schedule:
+            trained_stages = set_trained_stages(
+                optimizer.param_groups, get_scheduled_stages(unfreeze_schedule, epoch)
+            )
+            print("Trained stages: " + ", ".join(trained_stages))
+
         for phase in ["train", "validation"]:
             if phase == "train":
                 model.train()
@@ -161,44 +265,126 @@ def train_model(
 
             current_loss = 0.0
             current_correct = 0
-
-            for inputs, labels in data_loader[phase]:
-                inputs = inputs.to(device)
-                labels = labels.to(device)
-
-                optimizer.zero_grad()  # Clears the old gradients from the last step by setting them to equal zero
+            current_samples = (
+                0  # With sample selection, an epoch only trains on part of the dataset
+            )
+            profiler.start_phase(epoch, phase)
+            phase_start_time = time.perf_counter()
+            step_end_time = phase_start_time
+            data_wait_time = 0.0
+
+            for step, batch in enumerate(profiler.iterate(data_loader[phase]), 1):
+                batch_ready_time = time.perf_counter()
+                data_wait_time += batch_ready_time - step_end_time
+
+                with profiler.section("transfer"):
+                    inputs = batch[0].to(device)
+                    labels = batch[1].to(device)
+
+                # The last micro-batches of an epoch are stepped even if they do not fill a whole effective batch
+                accumulation_start = (step - 1) % accumulation_steps == 0
+                accumulation_end = step % accumulation_steps == 0 or step == len(
+                    data_loader[phase]
+                )
+                # Number of micro-batches accumulated into the current optimiser step
+                group_size = min(
+                    accumulation_steps,
+                    len(data_loader[phase])
+                    - (step - 1) // accumulation_steps * accumulation_steps,
+                )
+                if accumulation_start:
+                    optimizer.zero_grad()  # Clears the old gradients from the last step by setting them to equal zero
 
                 with torch.set_grad_enabled(phase == "train"):
-                    if uses_inception and phase == "train":
-                        outputs, auxiliary_outputs = model(
-                            inputs
-                        )  # Forward pass over network - computes outputs
-                        loss1 = criterion(outputs, labels)
-                        loss2 = criterion(auxiliary_outputs, labels)
-                        loss = loss1 + (
-                            0.4 * loss2
-                        )  # Auxiliary loss function (Loss2) is weighted less than Loss1
-                        # Weighing at 0.4 seems to be optimal
-                    else:
-                        outputs = model(inputs)
-                        loss = criterion(outputs, labels)
+                    with profiler.section("forward"):
+                        if uses_inception and phase == "train":
+                            outputs, auxiliary_outputs = model(
+                                inputs
+                            )  # Forward pass over network - computes outputs
+                        else:
+                            outputs = model(inputs)
+
+                    with profiler.section("loss"):
+                        if uses_inception and phase == "train":
+                            loss1 = criterion(outputs, labels)
+                            loss2 = criterion(auxiliary_outputs, labels)
+                            loss = loss1 + (
+                                0.4 * loss2
+                            )  # Auxiliary loss function (Loss2) is weighted less than Loss1
+                            # Weighing at 0.4 seems to be optimal
+                        elif teacher_logits is not None and phase == "train":
+                            loss = criterion(
+                                outputs, labels, teacher_logits[batch[2]].to(device)
+                            )
+                        else:
+                            loss = criterion(outputs, labels)
 
                     dummy, predictions = torch.max(outputs, 1)
 
                     if phase == "train":
-                        loss.backward()  # Backpropagation - Calculates partial derivative of loss function WRT weights
-                        optimizer.step()  # Optimizer takes a step based on the gradient calculated by Backpropagation
-
-                current_loss += loss.item() * inputs.size(0)
+                        with profiler.section("backward"):
+                            (
+                                loss / group_size
+                            ).backward()  # Backpropagation - Calculates partial derivative of loss function WRT weights
+                        if accumulation_end:
+                            with profiler.section("optimizer"):
+                                optimizer.step()  # Optimizer takes a step based on the gradient calculated by Backpropagation
+                            if scheduler is not None:
+                                scheduler.step()
+
+                batch_loss = loss.item()
+                current_loss += batch_loss * inputs.size(0)
                 current_correct += torch.sum(predictions == labels.data)
+                current_samples += inputs.size(0)
+                if sample_statistics is not None and phase == "train":
+                    sample_losses = F.cross_entropy(
+                        outputs.detach(), labels, reduction="none"
+                    )
+                    sample_statistics.update(
+                        batch[2].numpy(),
+                        sample_losses.cpu().numpy(),
+                        (predictions == labels).cpu().numpy(),
+                        epoch,
+                    )
 
-            training_loss = current_loss / len(data_loader["train"].dataset)
-            training_accuracy = current_correct.double() / len(
-                data_loader["train"].dataset
-            )
-            validation_loss = current_loss / len(data_loader["validation"].dataset)
-            validation_accuracy = current_correct.double() / len(
-                data_loader["validation"].dataset
+                step_start_time, step_end_time = step_end_time, time.perf_counter()
+                if phase == "train":
+                    metrics_emitter.emit(
+                        "step",
+                        epoch=epoch,
+                        step=step,
+                        loss=batch_loss,
+                        images_per_sec=inputs.size(0)
+                        / (step_end_time - step_start_time),
+                        data_wait_ratio=(batch_ready_time - step_start_time)
+                        / (step_end_time - step_start_time),
+                        learning_rate=optimizer.param_groups[0]["lr"],
+                    )
+
+            profiler.end_phase()
+            phase_time = time.perf_counter() - phase_start_time
+
+            training_loss = current_loss / current_samples
+            training_accuracy = current_correct.double() / current_samples
+            validation_loss = current_loss / current_samples
+            validation_accuracy = current_correct.double() / current_samples
+
+            metrics_emitter.emit(
+                "epoch",
+                epoch=epoch,
+                phase=phase,
+                loss=training_loss if phase == "train" else validation_loss,
+                accuracy=float(
+                    training_accuracy if phase == "train" else validation_accuracy
+                ),
+                images_per_sec=current_samples / phase_time,
+                samples=current_samples,
+                data_wait_ratio=data_wait_time / phase_time,
+                learning_rate=optimizer.param_groups[0]["lr"],
+                num_workers=data_loader[phase].num_workers,
+                input_size=input_size
+                if phase == "train"
+                else model_registry.get_input_size(model_name),
             )
 
             if phase == "train":
@@ -249,6 +435,10 @@ def train_model(
                 )
                 break
 
+        epoch_time_history.append(time.perf_counter() - epoch_start_time)
+
+    profiler.close()
+
     time_elapsed = time.time() - training_start_time
     print(
         "Training complete in {:.0f}m {:.0f}s".format(
@@ -256,6 +446,12 @@ def train_model(
         )
     )
     print("Best Validation Accuracy: {:4f}".format(best_accuracy))
+    metrics_emitter.emit(
+        "training_complete",
+        model_name=model_name,
+        duration_s=time_elapsed,
+        best_validation_accuracy=float(best_accuracy),
+    )
 
     model.load_state_dict(best_model_weights)
     torch.save(model.state_dict(), "models_trained/" + model_name + "_model.pth")
@@ -266,6 +462,8 @@ def train_model(
         "train_loss": training_loss_history,
         "val_acc": validation_accuracy_history,
         "val_loss": validation_loss_history,
+        "epoch_time": epoch_time_history,
+        "input_size": input_size_history,
     }
 
     return model, history
@@ -289,63 +487,22 @@ def freeze_layers(model, freeze_all):
     return
 
 
-def initialise_model(model_name, num_classes, freeze_all):
+def initialise_model(model_name, num_classes, freeze_all, pretrained=True):
     """
     This function initialises the chosen model in order to make the model be ready
-    to be supplied to the training function.
-    :param model_name: Model to initialise, can be "inception", "vgg19" or "resnet"
+    to be supplied to the training function. The architectures and the way their
+    classification heads are replaced are defined in model_registry.py.
+    :param model_name: Model to initialise, any name registered in model_registry.MODEL_REGISTRY
+    e.g. "InceptionV3", "VGG-19_BN", "ResNet-152" or "MobileNetV3"
     :param num_classes: Number of classes in the classification problem
     :param freeze_all: Model Parameters to freeze
+    :param pretrained: If true, starts from the weights pre-trained on ImageNet
     :return: Initialised model and input size of the model
     """
-    if model_name == "InceptionV3":
-        """
-        InceptionV3 Initialisation
-        """
-        model = vision.models.inception_v3(pretrained=True)
-        freeze_layers(model, freeze_all=freeze_all)
-        input_size = 299
-
-        # Auxiliary Outputs Initialisation:
-        aux_features = model.AuxLogits.fc.in_features
-        model.AuxLogits.fc = nn.Linear(aux_features, num_classes)
-
-        # Main Outputs Initialisation
-        main_features = model.fc.in_features
-        model.fc = nn.Linear(main_features, num_classes)
-
-    elif model_name == "VGG-19_BN":
-        """
-        VGG19 With Batch Normalisation Initialisation
-        """
-        model = vision.models.vgg19_bn(pretrained=True)
-        freeze_layers(model, freeze_all=freeze_all)
-        input_size = 224
-        num_features = model.classifier[6].in_features
-        model.classifier[6] = nn.Linear(num_features, num_classes)
-
-    elif model_name == "ResNet-101":
-        """
-        ResNet-101 Initialisation
-        """
-        model = vision.models.resnet101(pretrained=True)
-        freeze_layers(model, freeze_all=freeze_all)
-        input_size = 224
-        num_features = model.fc.in_features
-        model.fc = nn.Linear(num_features, num_classes)
-
-    elif model_name == "ResNet-152":
-        """
-        ResNet-152 Initialisation
-        """
-        model = vision.models.resnet152(pretrained=True)
-        freeze_layers(model, freeze_all=freeze_all)
-        input_size = 224
-        num_features = model.fc.in_features
-        model.fc = nn.Linear(num_features, num_classes)
-
-    else:
-        raise ValueError("model_name parameter received an unsupported model name")
+    model = model_registry.build_model(model_name, pretrained=pretrained)
+    freeze_layers(model, freeze_all=freeze_all)
+    model_registry.replace_heads(model, model_name, num_classes)
+    input_size = model_registry.get_input_size(model_name)
 
     return model, input_size
 
@@ -379,15 +536,26 @@ def get_parameters_to_learn(model, training_mode):
 
 
 def plot_model_history(
-    history_dictionary, model_name, learning_rate, batch_size, optimizer, weight_decay
+    history_dictionary,
+    model_name,
+    learning_rate,
+    batch_size,
+    optimizer,
+    weight_decay,
+    renderer=None,
 ):
     """
     This function plots the model training and validation accuracy as well as
     the training and validation losses. It then saves the resulting graphs to the "visualisations"
     directory.
+    :param renderer: PlotRenderer which renders the plots. If not supplied, they are rendered straight away.
     :return:
     """
-    plt.style.use("ggplot")
+    # Imported here, so that modules which only need initialise_model do not import matplotlib
+    from plot_rendering import PlotRenderer, render_lines
+
+    if renderer is None:
+        renderer = PlotRenderer(style="ggplot")
 
     if model_name == "InceptionV3":
         model_name_title = "Inception V3"
@@ -396,35 +564,34 @@ def plot_model_history(
     else:
         model_name_title = model_name
 
-    num_epochs = len(history_dictionary["train_acc"])
-
-    plt.figure()
-    plt.plot(
-        range(num_epochs),
-        [i * 100 for i in history_dictionary["train_acc"]],
-        color="red",
-    )
-    plt.plot(
-        range(num_epochs),
-        [i * 100 for i in history_dictionary["val_acc"]],
-        color="green",
-    )
-    plt.xlabel("Epochs")
-    plt.ylabel("Accuracy (%)")
-    plt.title("Training and Validation Accuracy on " + model_name_title)
-    plt.legend(["Training Accuracy", "Validation Accuracy"])
-    plt.savefig(
+    renderer.submit(
         "../visualisations/model_training/"
         + model_name
-        + "_training_validation_acc.png"
+        + "_training_validation_acc.png",
+        render_lines,
+        [
+            [float(i) * 100 for i in history_dictionary["train_acc"]],
+            [float(i) * 100 for i in history_dictionary["val_acc"]],
+        ],
+        ["red", "green"],
+        "Epochs",
+        "Accuracy (%)",
+        "Training and Validation Accuracy on " + model_name_title,
+        ["Training Accuracy", "Validation Accuracy"],
     )
 
-    plt.figure()
-    plt.plot(range(num_epochs), history_dictionary["train_loss"], color="red")
-    plt.plot(range(num_epochs), history_dictionary["val_loss"], color="green")
-    plt.xlabel("Epochs")
-    plt.ylabel("Loss")
-    plt.title(
+    renderer.submit(
+        "../visualisations/model_training/"
+        + model_name
+        + "_training_validation_loss.png",
+        render_lines,
+        [
+            [float(i) for i in history_dictionary["train_loss"]],
+            [float(i) for i in history_dictionary["val_loss"]],
+        ],
+        ["red", "green"],
+        "Epochs",
+        "Loss",
         "Training and Validation Loss on "
         + model_name_title
         + "\n LR: "
@@ -434,19 +601,21 @@ def plot_model_history(
         + " Optim: "
         + str(optimizer)
         + " WD: "
-        + str(weight_decay)
-    )
-    plt.legend(["Training Loss", "Validation Loss"])
-    plt.savefig(
-        "../visualisations/model_training/"
-        + model_name
-        + "_training_validation_loss.png"
+        + str(weight_decay),
+        ["Training Loss", "Validation Loss"],
     )
 
     return
 
 
 def main():
+    # Only the training script needs these, so modules importing initialise_model do not pay for them
+    import toml
+
+    import augmentation_visualisation as vis_augment
+    from lr_scheduling import create_scheduler
+    from plot_rendering import create_renderer
+
     model_name = sys.argv[1]
 
     config = toml.load("training_config.toml")
@@ -456,20 +625,57 @@ def main():
     else:
         uses_inception = False
 
+    # The data loaders return micro-batches, whose gradients are accumulated up to batch_size images
+    # Checked before the data is loaded, rather than when training starts
+    check_resize_schedule(config["resize_schedule"], model_name)
+
+    micro_batch_size, accumulation_steps = get_batch_plan(
+        config, model_name, config["batch_size"]
+    )
     data_loaders, classes = load_dataset_and_transforms(
         "../iss_image_data/experiment3/",
         uses_inception,
         augment=True,
-        batch_size=config["batch_size"],
+        batch_size=micro_batch_size,
+        progressive_resizing=bool(config["resize_schedule"]),
     )
-    vis_augment.visualise_augmented_images(data_loaders, classes)
+    # Plots are rendered in background processes while the model trains
+    renderer = create_renderer(config, style="ggplot")
+    vis_augment.visualise_augmented_images(data_loaders, classes, renderer)
+
+    # With a budget below 1, every epoch only trains on the images selected by their loss
+    sample_statistics = None
+    if config["selection_budget"] < 1:
+        from sample_selection import add_sample_selection
+
+        data_loaders["train"], sample_statistics = add_sample_selection(
+            data_loaders["train"],
+            config["selection_budget"],
+            config["selection_revisit_interval"],
+        )
+
+    # Imported here, as activation_checkpointing imports initialise_model from this module
+    from activation_checkpointing import enable_activation_checkpointing
 
     device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
     print("Device being used for training: " + str(device))
-    model, input_size = initialise_model(model_name, len(classes), freeze_all=False)
-    parameters_to_learn = get_parameters_to_learn(
-        model, training_mode=config["training_mode"]
+    # Feature extraction only trains the new classification head, fine tuning trains every layer
+    model, input_size = initialise_model(
+        model_name,
+        len(classes),
+        freeze_all=config["training_mode"] == "feature_extraction",
     )
+    if config["activation_checkpointing"]:
+        enable_activation_checkpointing(
+            model, model_name, segments=config["checkpoint_segments"]
+        )
+    if config["unfreeze_schedule"]:
+        # Every stage is given to the optimiser, and train_model() decides which stages are trained
+        parameters_to_learn = get_parameter_groups(model, model_name)
+    else:
+        parameters_to_learn = get_parameters_to_learn(
+            model, training_mode=config["training_mode"]
+        )
     model = model.to(device)
 
     optimizer = optim.Adam(
@@ -478,6 +684,21 @@ def main():
         weight_decay=config["weight_decay"],
     )
     criterion = nn.CrossEntropyLoss()
+    # The schedule is stepped once per optimiser step, i.e. once per accumulated batch
+    scheduler = create_scheduler(
+        config,
+        optimizer,
+        steps_per_epoch=-(-len(data_loaders["train"]) // accumulation_steps),
+    )
+
+    profiler = TrainingProfiler(
+        device,
+        enabled=config["profile_training"],
+        trace_start_step=config["profile_trace_start_step"],
+        trace_end_step=config["profile_trace_end_step"],
+        trace_path="./training_profiles/" + model_name + "_trace.json",
+    )
+    metrics_emitter = create_emitter(config, model_name)
 
     print("\nStarting model training...")
     model, history = train_model(
@@ -489,7 +710,15 @@ def main():
         model_name,
         uses_inception,
         epochs=config["epochs"],
+        profiler=profiler,
+        metrics_emitter=metrics_emitter,
+        accumulation_steps=accumulation_steps,
+        resize_schedule=config["resize_schedule"],
+        sample_statistics=sample_statistics,
+        scheduler=scheduler,
+        unfreeze_schedule=config["unfreeze_schedule"],
     )
+    metrics_emitter.close()
 
     # Extra variables for plotting
     learning_rate = config["learning_rate"]
@@ -497,8 +726,15 @@ def main():
     optimizer_name = config["optimizer_name"]
     weight_decay = config["weight_decay"]
     plot_model_history(
-        history, model_name, learning_rate, batch_size, optimizer_name, weight_decay
+        history,
+        model_name,
+        learning_rate,
+        batch_size,
+        optimizer_name,
+        weight_decay,
+        renderer=renderer,
     )
+    renderer.close()
 
     return
 
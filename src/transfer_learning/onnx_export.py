@@ -0,0 +1,106 @@
+"""
+This program exports a trained model to the ONNX format, so that it can be run with
+ONNX Runtime (onnx_inference.py) without importing PyTorch.
+The batch dimension of the exported model is dynamic. After exporting, the logits
+produced by ONNX Runtime are checked against the logits produced by PyTorch.
+Version: 19/10/2026
+"""
+import json
+import sys
+
+import numpy as np
+import onnxruntime
+import toml
+import torch
+import torch.nn as nn
+
+import model_registry
+from model_evaluation import get_classes, load_trained_model
+
+
+def export_to_onnx(
+    model: nn.Module, input_size: int, onnx_path: str, opset_version: int
+) -> None:
+    """
+    This function traces the model and writes it to an .onnx file with a dynamic batch size.
+    :param model: Trained model in evaluation mode
+    :param input_size: Input size of the network
+    :param onnx_path: Path to the .onnx file to write
+    :param opset_version: ONNX operator set version
+    :return:
+    """
+    torch.onnx.export(
+        model,
+        torch.randn(1, 3, input_size, input_size),
+        onnx_path,
+        input_names=["input"],
+        output_names=["logits"],
+        dynamic_axes={"input": {0: "batch_size"}, "logits": {0: "batch_size"}},
+        opset_version=opset_version,
+        do_constant_folding=True,
+    )
+
+    return
+
+
+def check_parity(
+    model: nn.Module, onnx_path: str, input_size: int, batch_size: int
+) -> bool:
+    """
+    This function compares the logits of the PyTorch model and of the exported ONNX model.
+    :param model: Trained model in evaluation mode
+    :param onnx_path: Path to the exported .onnx file
+    :param input_size: Input size of the network
+    :param batch_size: Batch size to compare on, which also checks the dynamic batch dimension
+    :return: True if the logits and the predicted classes match
+    """
+    inputs = torch.randn(batch_size, 3, input_size, input_size)
+    with torch.no_grad():
+        torch_logits = model(inputs).numpy()
+
+    session = onnxruntime.InferenceSession(
+        onnx_path, providers=["CPUExecutionProvider"]
+    )
+    onnx_logits = session.run(None, {"input": inputs.numpy()})[0]
+
+    max_difference = np.abs(torch_logits - onnx_logits).max()
+    same_predictions = np.array_equal(
+        torch_logits.argmax(axis=1), onnx_logits.argmax(axis=1)
+    )
+    print("Maximum absolute logit difference: {:.2e}".format(max_difference))
+    print("Top-1 predictions match: " + str(same_predictions))
+
+    return bool(same_predictions and max_difference < 1e-3)
+
+
+def main():
+    """
+    Usage: python onnx_export.py <model_name> <trained_weights.pth> <dataset_directory>
+    The dataset directory (e.g. the training set) is only used to recover the class names,
+    which are saved next to the .onnx file.
+    """
+    model_name = sys.argv[1]
+    trained_weights = sys.argv[2]
+    config = toml.load("evaluation_config.toml")
+
+    input_size = model_registry.get_input_size(model_name)
+
+    classes = get_classes(sys.argv[3])
+    model = load_trained_model(
+        model_name, len(classes), trained_weights, torch.device("cpu")
+    )
+
+    onnx_path = trained_weights.replace(".pth", "") + ".onnx"
+    export_to_onnx(model, input_size, onnx_path, config["onnx_opset_version"])
+    with open(onnx_path + ".json", "w") as model_info:
+        json.dump({"classes": classes, "input_size": input_size}, model_info)
+    print("Exported " + model_name + " to: " + onnx_path)
+
+    if not check_parity(model, onnx_path, input_size, batch_size=4):
+        print("WARNING: ONNX Runtime outputs do not match the PyTorch outputs")
+
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+This program evaluates a model exported by onnx_export.py using ONNX Runtime on the CPU.
+It does not import PyTorch: images are decoded with Pillow and preprocessed with Numpy
+exactly like the PyTorch testing transformations (centre crop and ImageNet normalisation),
+which makes start up faster and keeps the deployment image small.
+Version: 19/10/2026
+"""
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+import numpy as np
+import onnxruntime
+import toml
+from PIL import Image
+
+from streaming_metrics import ClassificationMetrics
+
+MEANS = np.array([0.485, 0.456, 0.406], dtype=np.float32)  # ImageNet normalisation
+STD_DEVS = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+# The extensions ImageFolder loads (torchvision.datasets.folder.IMG_EXTENSIONS), copied to avoid importing PyTorch
+IMG_EXTENSIONS = (
+    ".jpg",
+    ".jpeg",
+    ".png",
+    ".ppm",
+    ".bmp",
+    ".pgm",
+    ".tif",
+    ".tiff",
+    ".webp",
+)
+
+
+def create_session(onnx_path: str, num_threads: int) -> onnxruntime.InferenceSession:
+    """
+    This function creates an ONNX Runtime session on the CPU execution provider with all graph optimisations.
+    :param onnx_path: Path to the .onnx model
+    :param num_threads: Number of threads used within operators, 0 lets ONNX Runtime decide
+    :return: Inference session
+    """
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+    options.intra_op_num_threads = num_threads
+
+    return onnxruntime.InferenceSession(
+        onnx_path, options, providers=["CPUExecutionProvider"]
+    )
+
+
+def preprocess_image(image_path: str, input_size: int) -> np.ndarray:
+    """
+    This function reproduces the PyTorch testing transformations with Numpy:
+    CenterCrop (zero padding images smaller than the crop), ToTensor and Normalize.
+    :param image_path: Path to the image
+    :param input_size: Input size of the network
+    :return: Normalised image as a float32 array of shape (3, input_size, input_size)
+    """
+    image = Image.open(image_path).convert("RGB")
+    width, height = image.size
+    if width < input_size or height < input_size:
+        padded = Image.new("RGB", (max(width, input_size), max(height, input_size)))
+        padded.paste(
+            image,
+            (max(input_size - width, 0) // 2, max(input_size - height, 0) // 2),
+        )
+        image = padded
+        width, height = image.size
+
+    top = int(round((height - input_size) / 2.0))
+    left = int(round((width - input_size) / 2.0))
+    image = image.crop((left, top, left + input_size, top + input_size))
+
+    image = np.asarray(image, dtype=np.float32) / 255
+    image = (image - MEANS) / STD_DEVS
+
+    return image.transpose((2, 0, 1))
+
+
+def load_testing_set(testing_set_path: str) -> Tuple[List[str], List[int], List[str]]:
+    """
+    This function lists the images of a testing set laid out like an ImageFolder (one directory per city).
+    Like ImageFolder, only files with an image extension are listed, so e.g. .DS_Store files are skipped.
+    :param testing_set_path: Path to the testing set
+    :return: Image paths, their class indices and the class names
+    """
+    classes = sorted(
+        entry.name for entry in os.scandir(testing_set_path) if entry.is_dir()
+    )
+    image_paths = []
+    labels = []
+    for class_index, city in enumerate(classes):
+        for root, directories, files in sorted(
+            os.walk(os.path.join(testing_set_path, city))
+        ):
+            for file in sorted(files):
+                if not file.lower().endswith(IMG_EXTENSIONS):
+                    continue
+                image_paths.append(os.path.join(root, file))
+                labels.append(class_index)
+
+    return image_paths, labels, classes
+
+
+def evaluate(
+    session, image_paths, labels, classes, input_size, batch_size, num_workers
+) -> ClassificationMetrics:
+    """
+    This function classifies the testing set in batches and accumulates the metrics.
+    Images of the next batch are decoded by a pool of threads while the current batch is classified.
+    :param session: ONNX Runtime inference session
+    :param image_paths: Paths to the testing images
+    :param labels: Class index of each testing image
+    :param classes: List of possible classes
+    :param input_size: Input size of the network
+    :param batch_size: Number of images per forward pass
+    :param num_workers: Number of decoding threads
+    :return: metrics - Confusion matrix and Top-5 counts accumulated over the testing set
+    """
+    metrics = ClassificationMetrics(classes)
+    labels = np.array(labels)
+    top_k = min(5, len(classes))
+
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        next_batch = [
+            executor.submit(preprocess_image, path, input_size)
+            for path in image_paths[:batch_size]
+        ]
+        for start in range(0, len(image_paths), batch_size):
+            # The next batch is decoded while the current batch is classified
+            current_batch = next_batch
+            next_batch = [
+                executor.submit(preprocess_image, path, input_size)
+                for path in image_paths[start + batch_size : start + 2 * batch_size]
+            ]
+            inputs = np.stack([image.result() for image in current_batch])
+            batch_labels = labels[start : start + batch_size]
+            logits = session.run(None, {"input": inputs})[0]
+
+            top_5 = np.argpartition(-logits, top_k - 1, axis=1)[:, :top_k]
+            metrics.update(
+                batch_labels,
+                logits.argmax(axis=1),
+                (top_5 == batch_labels[:, None]).any(axis=1),
+            )
+
+    return metrics
+
+
+def main():
+    """
+    Usage: python onnx_inference.py <model.onnx> <testing_set_directory>
+    """
+    onnx_path = sys.argv[1]
+    config = toml.load("evaluation_config.toml")
+    with open(onnx_path + ".json") as info_file:
+        model_info = json.load(info_file)
+    input_size = model_info["input_size"]
+
+    session = create_session(onnx_path, config["onnx_threads"])
+    image_paths, labels, classes = load_testing_set(sys.argv[2])
+    # The class indices of the testing set must be the ones the model was trained with
+    if classes != model_info["classes"]:
+        raise ValueError(
+            "The cities of the testing set do not match the cities the model was exported with"
+        )
+
+    start_time = time.time()
+    metrics = evaluate(
+        session,
+        image_paths,
+        labels,
+        classes,
+        input_size,
+        config["batch_size"],
+        config["num_workers"],
+    )
+    time_elapsed = time.time() - start_time
+
+    print("Testing accuracy (Top-1): {:.2f}".format(metrics.top_1_accuracy))
+    print("Testing accuracy (Top-5): {:.2f}".format(metrics.top_5_accuracy))
+    print(
+        "Classified {} images at {:.1f} images/sec".format(
+            len(image_paths), len(image_paths) / time_elapsed
+        )
+    )
+
+    title = os.path.basename(onnx_path).replace(".onnx", "") + "_onnx"
+    metrics.classification_report().to_csv(
+        "./classification_reports/" + title + "_rgb_classification_report_.csv"
+    )
+
+    return
+
+
+if __name__ == "__main__":
+    main()
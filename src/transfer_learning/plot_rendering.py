@@ -0,0 +1,296 @@
+"""
+This program contains the plot renderer, which renders the plots of training, hyperparameter tuning and
+evaluation away from the critical path. A plot is submitted as a specification - one of the render functions
+below and the data it plots - and is rendered with the non-interactive Agg backend, either in a pool of
+background processes or, if no workers are configured, straight away in the calling process.
+Every figure is closed as soon as it is saved, so that long runs do not accumulate open figures.
+Version: 19/10/2026
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+
+matplotlib.use("Agg")  # Plots are only saved to files, so no display is needed
+import matplotlib.pyplot as plt
+import numpy as np
+from mpl_toolkits.mplot3d import Axes3D  # noqa: F401 - registers the 3d projection
+
+
+def render_lines(figure, series, colours, xlabel, ylabel, title, legend) -> None:
+    """
+    This function plots one line per series, e.g. the training and validation accuracy per epoch.
+    :param figure: Figure to draw on
+    :param series: List of lists of values
+    :param colours: Colour of each series
+    :param xlabel: Label of the x axis
+    :param ylabel: Label of the y axis
+    :param title: Title of the plot
+    :param legend: Name of each series
+    :return:
+    """
+    axes = figure.add_subplot(111)
+    for values, colour in zip(series, colours):
+        axes.plot(range(len(values)), values, color=colour)
+    axes.set_xlabel(xlabel)
+    axes.set_ylabel(ylabel)
+    axes.set_title(title)
+    axes.legend(legend)
+
+    return
+
+
+def render_bars(figure, labels, values, xlabel, ylabel, title, fontsize=10) -> None:
+    """
+    This function plots a bar chart with one labelled bar per value, e.g. the F1 score of every city.
+    :param figure: Figure to draw on
+    :param labels: Label of each bar
+    :param values: Height of each bar
+    :param xlabel: Label of the x axis
+    :param ylabel: Label of the y axis
+    :param title: Title of the plot
+    :param fontsize: Font size of the bar labels
+    :return:
+    """
+    axes = figure.add_subplot(111)
+    bars = np.arange(len(values))
+    axes.bar(bars, values, width=0.9, color="orange")
+    axes.set_title(title)
+    axes.set_xticks(bars)
+    axes.set_xticklabels(labels, rotation=90, fontsize=fontsize)
+    axes.set_ylabel(ylabel)
+    axes.set_xlabel(xlabel)
+    axes.set_xlim(-0.5, len(values) - 0.5)
+
+    return
+
+
+def render_matrix(figure, matrix, classes, title) -> None:
+    """
+    This function plots a confusion matrix.
+    :param figure: Figure to draw on
+    :param matrix: Confusion matrix, ground truth by prediction
+    :param classes: Class names
+    :param title: Title of the plot
+    :return:
+    """
+    axes = figure.add_subplot(111)
+    image = axes.imshow(matrix, cmap="jet")
+    figure.colorbar(image)
+    ticks = np.arange(len(classes))
+    axes.set_xticks(ticks)
+    axes.set_xticklabels(classes, rotation=90)
+    axes.set_yticks(ticks)
+    axes.set_yticklabels(classes)
+    axes.set_ylim(-0.5, len(classes))
+    axes.set_title(title)
+
+    return
+
+
+def render_scatter_3d(figure, x, y, z, xlabel, ylabel, zlabel, title) -> None:
+    """
+    This function plots points in 3D, coloured by their z value, e.g. a hyperparameter space.
+    :param figure: Figure to draw on
+    :param x: x values
+    :param y: y values
+    :param z: z values
+    :param xlabel: Label of the x axis
+    :param ylabel: Label of the y axis
+    :param zlabel: Label of the z axis
+    :param title: Title of the plot
+    :return:
+    """
+    axes = figure.add_subplot(111, projection="3d")
+    points = axes.scatter3D(x, y, z, c=z, cmap="jet", marker="o", s=25)
+    figure.colorbar(points)
+    axes.set_xlabel(xlabel)
+    axes.set_ylabel(ylabel)
+    axes.set_zlabel(zlabel)
+    axes.set_title(title)
+
+    return
+
+
+def render_calibration(figure, confidence, accuracy, title) -> None:
+    """
+    This function plots a reliability diagram - the accuracy of the predictions in each confidence bin
+    against their mean confidence, where a calibrated model lies on the diagonal.
+    :param figure: Figure to draw on
+    :param confidence: Mean confidence of each bin
+    :param accuracy: Accuracy of each bin
+    :param title: Title of the plot
+    :return:
+    """
+    axes = figure.add_subplot(111)
+    axes.plot([0, 1], [0, 1], linestyle="--", color="grey")
+    axes.plot(confidence, accuracy, marker="o", color="red")
+    axes.set_xlim(0, 1)
+    axes.set_ylim(0, 1)
+    axes.set_xlabel("Confidence")
+    axes.set_ylabel("Accuracy")
+    axes.set_title(title)
+    axes.legend(["Perfect calibration", "Model"])
+
+    return
+
+
+def render_lr_range(figure, learning_rates, losses, suggested_lrs, title) -> None:
+    """
+    This function plots the loss of a learning rate range test against the learning rate, on a log scale.
+    :param figure: Figure to draw on
+    :param learning_rates: Learning rate of every step
+    :param losses: Smoothed loss of every step
+    :param suggested_lrs: Suggested learning rates, marked by vertical lines
+    :param title: Title of the plot
+    :return:
+    """
+    axes = figure.add_subplot(111)
+    axes.plot(learning_rates, losses, color="blue")
+    for learning_rate in suggested_lrs:
+        axes.axvline(learning_rate, linestyle="--", color="red")
+    axes.set_xscale("log")
+    axes.set_xlabel("Learning Rate")
+    axes.set_ylabel("Loss")
+    axes.set_title(title)
+
+    return
+
+
+def render_heatmap_overlay(figure, image, heatmap, title) -> None:
+    """
+    This function overlays a heatmap on an image, e.g. where in an ISS frame the predicted city was recognised.
+    :param figure: Figure to draw on
+    :param image: Image array, height x width x channels, at the resolution of the heatmap
+    :param heatmap: Heatmap of values between 0 and 1
+    :param title: Title of the plot
+    :return:
+    """
+    axes = figure.add_subplot(111)
+    axes.imshow(image)
+    overlay = axes.imshow(heatmap, cmap="jet", alpha=0.4, vmin=0, vmax=1)
+    figure.colorbar(overlay)
+    axes.axis("off")
+    axes.set_title(title)
+
+    return
+
+
+def render_image(figure, image, title) -> None:
+    """
+    This function shows an image without axes, e.g. a grid of augmented images.
+    :param figure: Figure to draw on
+    :param image: Image array, height x width (x channels)
+    :param title: Title of the plot
+    :return:
+    """
+    axes = figure.add_subplot(111)
+    axes.imshow(image)
+    axes.set_title(title)
+    axes.axis("off")
+
+    return
+
+
+def render_plot(
+    path, render_function, args, kwargs, figure_kwargs, savefig_kwargs, style
+) -> str:
+    """
+    This function renders a plot specification to a file and closes its figure.
+    :param path: Path to the saved image
+    :param render_function: Function which draws the plot on a figure, e.g. render_lines
+    :param args: Positional arguments of the render function, after the figure
+    :param kwargs: Keyword arguments of the render function
+    :param figure_kwargs: Arguments of plt.figure(), e.g. figsize
+    :param savefig_kwargs: Arguments of savefig(), e.g. bbox_inches
+    :param style: Matplotlib style, e.g. "ggplot"
+    :return: Path to the saved image
+    """
+    with plt.style.context(style):
+        figure = plt.figure(**figure_kwargs)
+        try:
+            render_function(figure, *args, **kwargs)
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            figure.savefig(path, **savefig_kwargs)
+        finally:
+            plt.close(figure)
+
+    return path
+
+
+class PlotRenderer:
+    def __init__(self, num_workers: int = 0, style: str = "default"):
+        """
+        :param num_workers: Number of background processes rendering plots in parallel. If 0, every plot
+        is rendered in the calling process when it is submitted
+        :param style: Matplotlib style of every plot, e.g. "ggplot"
+        """
+        self.style = style
+        self.executor = None
+        self.pending = []
+
+        if num_workers > 0:
+            # The workers are spawned rather than forked, as the training process holds running threads
+            self.executor = ProcessPoolExecutor(
+                num_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+
+    def submit(
+        self,
+        path: str,
+        render_function,
+        *args,
+        figure_kwargs: dict = None,
+        savefig_kwargs: dict = None,
+        **kwargs
+    ) -> None:
+        """
+        This function submits a plot to be rendered. The render function must be defined at the top level
+        of a module, and the arguments must be picklable, e.g. lists and NumPy arrays rather than tensors.
+        :param path: Path to the saved image
+        :param render_function: Function which draws the plot on a figure, e.g. render_lines
+        :param args: Positional arguments of the render function, after the figure
+        :param figure_kwargs: Arguments of plt.figure(), e.g. figsize
+        :param savefig_kwargs: Arguments of savefig(), e.g. bbox_inches
+        :param kwargs: Keyword arguments of the render function
+        :return:
+        """
+        specification = (
+            path,
+            render_function,
+            args,
+            kwargs,
+            figure_kwargs or {},
+            savefig_kwargs or {},
+            self.style,
+        )
+        if self.executor is None:
+            render_plot(*specification)
+        else:
+            self.pending.append(self.executor.submit(render_plot, *specification))
+
+        return
+
+    def close(self) -> None:
+        """
+        This function waits until every submitted plot is rendered and stops the workers.
+        :return:
+        """
+        if self.executor is not None:
+            for future in self.pending:
+                print("Saved plot to: " + future.result())
+            self.executor.shutdown()
+            self.executor = None
+            self.pending = []
+
+        return
+
+
+def create_renderer(config: dict, style: str = "default") -> PlotRenderer:
+    """
+    :param config: Loaded training_config.toml or evaluation_config.toml
+    :param style: Matplotlib style of every plot
+    :return: Plot renderer with plot_workers background processes
+    """
+    return PlotRenderer(config["plot_workers"], style)
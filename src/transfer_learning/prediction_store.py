@@ -0,0 +1,265 @@
+"""
+This program contains the prediction store, which keeps a per-image record of an evaluation run:
+the image id, the true label, the full logit vector and the id of the model, saved as columns of a
+compressed .npz file. Metrics can then be recomputed from the store in seconds, without loading a model
+or classifying the testing set again. Stores written by evaluation shards are concatenated when loaded.
+It can also be run as a script, which computes Top-k accuracy, the confusion matrix, classification
+report and F1 bar chart, or a calibration (reliability) curve from one or more stores.
+Version: 19/10/2026
+"""
+import os
+import sys
+from typing import List
+
+import numpy as np
+
+from streaming_metrics import ClassificationMetrics
+
+
+class PredictionWriter:
+    def __init__(
+        self, path: str, image_ids: List[str], classes: List[str], model_id: str
+    ):
+        """
+        :param path: Path to the .npz file the store is saved to
+        :param image_ids: Id of every image, e.g. its path relative to the testing set, in evaluation order
+        :param classes: Class names, in the order of the logits
+        :param model_id: Id of the evaluated model, e.g. the model name and trained weights
+        """
+        self.path = path
+        self.image_ids = list(image_ids)
+        self.classes = list(classes)
+        self.model_id = model_id
+        self.labels = []
+        self.logits = []
+
+    def update(self, labels, logits) -> None:
+        """
+        This function adds a batch of predictions, in the same order as the image ids.
+        :param labels: Array of true class indices for the batch
+        :param logits: Array of logits for the batch, of shape (batch, classes)
+        :return:
+        """
+        self.labels.append(np.asarray(labels, dtype=np.int64))
+        self.logits.append(np.asarray(logits, dtype=np.float32))
+
+        return
+
+    def close(self) -> None:
+        """
+        This function saves the store.
+        :return:
+        """
+        labels = np.concatenate(self.labels)
+        if len(labels) != len(self.image_ids):
+            raise ValueError(
+                "The store has {} predictions for {} images".format(
+                    len(labels), len(self.image_ids)
+                )
+            )
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        np.savez_compressed(
+            self.path,
+            image_ids=np.array(self.image_ids),
+            labels=labels,
+            logits=np.concatenate(self.logits),
+            model_id=np.array(self.model_id),
+            classes=np.array(self.classes),
+        )
+        print("Saved {} predictions to: {}".format(len(labels), self.path))
+
+        return
+
+
+def load_predictions(paths: List[str]) -> dict:
+    """
+    This function loads one or more stores, e.g. of evaluation shards, into a single set of columns.
+    :param paths: Paths to .npz stores of the same model and classes
+    :return: Dictionary with the image_ids, labels, logits, model_id and classes columns
+    """
+    stores = [np.load(path) for path in paths]
+    classes = stores[0]["classes"].tolist()
+    for store in stores[1:]:
+        if store["classes"].tolist() != classes:
+            raise ValueError("Cannot combine stores over different classes")
+
+    return {
+        "image_ids": np.concatenate([store["image_ids"] for store in stores]),
+        "labels": np.concatenate([store["labels"] for store in stores]),
+        "logits": np.concatenate([store["logits"] for store in stores]),
+        "model_id": str(stores[0]["model_id"]),
+        "classes": classes,
+    }
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    exponentials = np.exp(logits - logits.max(axis=1, keepdims=True))
+
+    return exponentials / exponentials.sum(axis=1, keepdims=True)
+
+
+def get_true_class_ranks(logits: np.ndarray, labels: np.ndarray) -> np.ndarray:
+    """
+    :param logits: Logits of shape (images, classes)
+    :param labels: True class indices
+    :return: Rank of the true class of every image, 0 if it is the Top-1 prediction
+    """
+    # The rank is the number of classes scored above the true class, so no sort is needed
+    true_logits = logits[np.arange(len(labels)), labels]
+
+    return (logits > true_logits[:, None]).sum(axis=1)
+
+
+def top_k_accuracy(logits: np.ndarray, labels: np.ndarray, k: int) -> float:
+    """
+    :param logits: Logits of shape (images, classes)
+    :param labels: True class indices
+    :param k: Number of most probable classes which may contain the true class
+    :return: Top-k accuracy (%)
+    """
+    return float(np.mean(get_true_class_ranks(logits, labels) < k)) * 100
+
+
+def get_metrics(predictions: dict, top_k: int = 5) -> ClassificationMetrics:
+    """
+    :param predictions: Columns loaded by load_predictions()
+    :param top_k: k of the Top-k accuracy reported as the top_5_accuracy of the metrics
+    :return: Confusion matrix and Top-k counts of the stored predictions
+    """
+    logits, labels = predictions["logits"], predictions["labels"]
+    metrics = ClassificationMetrics(predictions["classes"])
+    metrics.update(
+        labels, logits.argmax(axis=1), get_true_class_ranks(logits, labels) < top_k
+    )
+
+    return metrics
+
+
+def calibration_curve(logits: np.ndarray, labels: np.ndarray, num_bins: int = 15):
+    """
+    This function bins the Top-1 predictions by confidence and compares the confidence of each bin
+    with its accuracy. A calibrated model is right 80% of the time when it is 80% confident.
+    :param logits: Logits of shape (images, classes)
+    :param labels: True class indices
+    :param num_bins: Number of equally wide confidence bins
+    :return: confidence, accuracy and count of each non-empty bin, and the expected calibration error (%)
+    """
+    probabilities = softmax(logits)
+    confidence = probabilities.max(axis=1)
+    correct = probabilities.argmax(axis=1) == labels
+    bins = np.minimum((confidence * num_bins).astype(np.int64), num_bins - 1)
+
+    counts = np.bincount(bins, minlength=num_bins)
+    bin_confidence = np.bincount(bins, confidence, minlength=num_bins)
+    bin_accuracy = np.bincount(bins, correct, minlength=num_bins)
+    non_empty = counts > 0
+    bin_confidence = bin_confidence[non_empty] / counts[non_empty]
+    bin_accuracy = bin_accuracy[non_empty] / counts[non_empty]
+    counts = counts[non_empty]
+    expected_calibration_error = (
+        np.sum(counts * np.abs(bin_accuracy - bin_confidence)) / counts.sum() * 100
+    )
+
+    return bin_confidence, bin_accuracy, counts, expected_calibration_error
+
+
+def write_report(predictions: dict, title: str, renderer) -> None:
+    """
+    This function writes the classification report and plots the confusion matrix and F1 scores
+    of the stored predictions.
+    :param predictions: Columns loaded by load_predictions()
+    :param title: Title of the plots and name of the report
+    :param renderer: PlotRenderer which renders the plots
+    :return:
+    """
+    from plot_rendering import render_bars, render_matrix
+
+    metrics = get_metrics(predictions)
+    report = metrics.classification_report()
+    os.makedirs("./classification_reports/", exist_ok=True)
+    report.to_csv("./classification_reports/" + title + "_classification_report.csv")
+
+    renderer.submit(
+        "../visualisations/confusion_matrices/" + title + "_Confusion_Matrix.png",
+        render_matrix,
+        metrics.confusion_matrix,
+        metrics.classes,
+        title,
+        figure_kwargs={"figsize": (12, 12)},
+    )
+    renderer.submit(
+        "../visualisations/f1_scores/" + title + "_F1_Score.png",
+        render_bars,
+        metrics.classes,
+        report["f1-score"][: metrics.num_classes].tolist(),
+        "Cities",
+        "F1 Score",
+        title + " F1 Score",
+        fontsize=5,
+        figure_kwargs={"figsize": (10, 5)},
+        savefig_kwargs={"bbox_inches": "tight"},
+    )
+
+    return
+
+
+def main():
+    """
+    Usage:
+    python prediction_store.py topk <k> <store.npz> [<store.npz> ...]
+    python prediction_store.py report <title> <store.npz> [<store.npz> ...]
+    python prediction_store.py calibration <title> <store.npz> [<store.npz> ...]
+    """
+    # Imported here, as evaluation imports PredictionWriter from this module without plotting
+    from plot_rendering import PlotRenderer, render_calibration
+
+    mode = sys.argv[1]
+    predictions = load_predictions(sys.argv[3:])
+    logits, labels = predictions["logits"], predictions["labels"]
+    print(
+        "{}: {} predictions over {} classes".format(
+            predictions["model_id"], len(labels), len(predictions["classes"])
+        )
+    )
+
+    if mode == "topk":
+        for k in range(1, int(sys.argv[2]) + 1):
+            print(
+                "Testing accuracy (Top-{}): {:.2f}".format(
+                    k, top_k_accuracy(logits, labels, k)
+                )
+            )
+
+    elif mode == "report":
+        renderer = PlotRenderer(num_workers=2)
+        write_report(predictions, sys.argv[2], renderer)
+        renderer.close()
+
+    elif mode == "calibration":
+        confidence, accuracy, counts, expected_calibration_error = calibration_curve(
+            logits, labels
+        )
+        print("Confidence | Accuracy | Images")
+        for bin_confidence, bin_accuracy, count in zip(confidence, accuracy, counts):
+            print(
+                "{:10.3f} | {:8.3f} | {:6d}".format(bin_confidence, bin_accuracy, count)
+            )
+        print("Expected calibration error: {:.2f}%".format(expected_calibration_error))
+        PlotRenderer().submit(
+            "../visualisations/calibration/" + sys.argv[2] + "_calibration.png",
+            render_calibration,
+            confidence,
+            accuracy,
+            sys.argv[2]
+            + " Calibration (ECE {:.2f}%)".format(expected_calibration_error),
+        )
+
+    else:
+        raise ValueError("mode must be one of: topk, report, calibration")
+
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+This program contains progressive resizing, which trains the early epochs at a lower input resolution and
+the final epochs at the full input size of the network, as set by resize_schedule in training_config.toml.
+An epoch at half the resolution costs roughly a quarter of the compute of a full size epoch.
+The images are still cropped to the full input size, and then scaled down, so that they show the same area
+of the city at every resolution. The input size of every batch is chosen by the batch sampler in the main
+process, so it can change between epochs while the data loader workers keep running.
+It can also be run as a script, which compares the time two training runs took to reach a target
+validation accuracy, using their metrics (.jsonl) files.
+Version: 19/10/2026
+"""
+import sys
+
+import torchvision as vision
+from torch.utils.data import Dataset, Sampler
+
+import model_registry
+from metrics_emitter import load_events
+
+
+class ProgressiveResizingDataset(Dataset):
+    def __init__(self, dataset):
+        """
+        :param dataset: Dataset returning images at the full input size, followed by their label
+        (and optionally other values, e.g. the index returned by sample_selection.IndexedDataset)
+        """
+        self.dataset = dataset
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, item):
+        index, size = item
+        sample = self.dataset[index]
+        image = sample[0]
+        if image.shape[-1] != size:
+            image = vision.transforms.functional.resize(
+                image, [size, size], antialias=True
+            )
+
+        return (image,) + tuple(sample[1:])
+
+
+class ResizingBatchSampler(Sampler):
+    def __init__(self, sampler, batch_size: int, size: int):
+        """
+        :param sampler: Sampler of the image indices, e.g. a RandomSampler
+        :param batch_size: Number of images per batch
+        :param size: Input size of the images, which can be changed between epochs
+        """
+        self.sampler = sampler
+        self.batch_size = batch_size
+        self.size = size
+
+    def __iter__(self):
+        batch = []
+        for index in self.sampler:
+            batch.append((index, self.size))
+            if len(batch) == self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def __len__(self):
+        return -(-len(self.sampler) // self.batch_size)
+
+
+def check_resize_schedule(resize_schedule, model_name: str) -> None:
+    """
+    This function checks that the architecture can be trained at every input size of the schedule.
+    InceptionV3 cannot, as the 5x5 convolution of its auxiliary classifier needs the full 299px input.
+    :param resize_schedule: List of [first epoch, scale of the input size]
+    :param model_name: Name of the architecture
+    :return:
+    """
+    if model_registry.get_model_entry(model_name)["family"] == "inception" and any(
+        scale < 1 for start_epoch, scale in resize_schedule
+    ):
+        raise ValueError(
+            "resize_schedule cannot scale the input of "
+            + model_name
+            + " below 1, as its auxiliary classifier needs the full input size"
+        )
+
+    return
+
+
+def get_scheduled_size(resize_schedule, epoch: int, input_size: int) -> int:
+    """
+    :param resize_schedule: List of [first epoch, scale of the input size], e.g. [[1, 0.5], [20, 0.75], [40, 1.0]]
+    :param epoch: Current epoch, counted from 1
+    :param input_size: Full input size of the network
+    :return: Input size of the epoch, rounded to a multiple of 32, or the full input size at a scale of 1
+    """
+    size = input_size
+    for start_epoch, scale in sorted(resize_schedule):
+        if epoch >= start_epoch:
+            if scale >= 1:
+                size = input_size
+            else:
+                size = max(32, int(round(input_size * scale / 32)) * 32)
+
+    return size
+
+
+def time_to_accuracy(events: list, target_accuracy: float):
+    """
+    :param events: Events of a training run, written by the metrics emitter
+    :param target_accuracy: Validation accuracy to reach, between 0 and 1
+    :return: Time (s) from the start of the run until the validation accuracy first reached the target
+    and the epoch in which it did, or None, None if it was never reached
+    """
+    for event in events:
+        if (
+            event["event"] == "epoch"
+            and event["phase"] == "validation"
+            and event["accuracy"] >= target_accuracy
+        ):
+            return event["time"] - events[0]["time"], event["epoch"]
+
+    return None, None
+
+
+def main():
+    """
+    Usage: python progressive_resizing.py <fixed_size_run.jsonl> <progressive_run.jsonl> [target_accuracy]
+    Without a target, the highest validation accuracy which both runs reached is used.
+    """
+    runs = {
+        "Fixed size": load_events(sys.argv[1]),
+        "Progressive": load_events(sys.argv[2]),
+    }
+
+    if len(sys.argv) > 3:
+        target_accuracy = float(sys.argv[3])
+    else:
+        target_accuracy = min(
+            max(
+                event["accuracy"]
+                for event in events
+                if event["event"] == "epoch" and event["phase"] == "validation"
+            )
+            for events in runs.values()
+        )
+
+    print("Time to a validation accuracy of {:.4f}:".format(target_accuracy))
+    times = {}
+    for name, events in runs.items():
+        times[name], epoch = time_to_accuracy(events, target_accuracy)
+        if times[name] is None:
+            print("{:<12} not reached".format(name))
+        else:
+            print("{:<12} {:8.0f} s (epoch {})".format(name, times[name], epoch))
+
+    if times["Fixed size"] is not None and times["Progressive"] is not None:
+        print(
+            "Progressive resizing speed up: {:.2f}x".format(
+                times["Fixed size"] / max(times["Progressive"], 1e-9)
+            )
+        )
+
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+This program converts a trained float32 model into an int8 model for CPU deployment.
+Two post-training quantisation modes are supported:
+Dynamic quantisation - the weights of the Linear layers are stored as int8 and activations are
+quantised on the fly. This suits VGG-19, whose classifier Linear layers hold most of the weights.
+Static quantisation - FX graph mode quantisation of the whole network, with the activation ranges
+calibrated on a sample of the training set. This suits the convolutional backbones (ResNet, Inception).
+The int8 model is saved as TorchScript (.pt), which make_predictions() can load directly.
+Model size, latency and the Top-1/Top-5 change against the float model on the testing set are reported.
+Version: 19/10/2026
+"""
+import copy
+import os
+import sys
+import time
+
+import toml
+import torch
+import torch.nn as nn
+import torchvision as vision
+from torch.ao.quantization import get_default_qconfig_mapping, quantize_dynamic
+from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+from torch.utils.data import DataLoader, Subset
+
+import model_registry
+from model_evaluation import (
+    get_test_transform,
+    load_testing_set_and_transform,
+    load_trained_model,
+    make_predictions,
+)
+
+
+def dynamic_quantisation(model: nn.Module) -> nn.Module:
+    """
+    This function quantises the weights of the Linear layers of the model to int8.
+    :param model: Trained float model in evaluation mode
+    :return: Dynamically quantised model
+    """
+    return quantize_dynamic(copy.deepcopy(model), {nn.Linear}, dtype=torch.qint8)
+
+
+def static_quantisation(
+    model: nn.Module, calibration_loader: DataLoader, input_size: int
+) -> nn.Module:
+    """
+    This function quantises the weights and activations of the whole model using FX graph mode.
+    Observers are inserted into the traced graph, the calibration images are passed through
+    the model to record activation ranges, and the observed model is then converted to int8.
+    :param model: Trained float model in evaluation mode
+    :param calibration_loader: Data loader over a sample of the training set
+    :param input_size: Input size of the network
+    :return: Statically quantised model
+    """
+    qconfig_mapping = get_default_qconfig_mapping(torch.backends.quantized.engine)
+    example_inputs = (torch.randn(1, 3, input_size, input_size),)
+    prepared_model = prepare_fx(copy.deepcopy(model), qconfig_mapping, example_inputs)
+
+    with torch.no_grad():
+        for inputs, labels in calibration_loader:
+            prepared_model(inputs)
+
+    return convert_fx(prepared_model)
+
+
+def load_calibration_set(
+    training_set_path: str, input_size: int, num_images: int, batch_size: int
+) -> DataLoader:
+    """
+    This function creates a data loader over a random sample of the training set, preprocessed
+    the same way as the testing set, for calibrating the activation ranges.
+    :param training_set_path: Path to the training set
+    :param input_size: Input size of the network
+    :param num_images: Number of training images to calibrate on
+    :param batch_size: Batch size used for calibration
+    :return: Calibration data loader
+    """
+    training_set = vision.datasets.ImageFolder(
+        training_set_path, get_test_transform(input_size)
+    )
+    generator = torch.Generator().manual_seed(42)  # Same sample on every run
+    sample = torch.randperm(len(training_set), generator=generator)[:num_images]
+
+    return DataLoader(
+        Subset(training_set, sample.tolist()),
+        batch_size=batch_size,
+        shuffle=False,
+        num_workers=4,
+    )
+
+
+def measure_latency(model: nn.Module, input_size: int, batch_size: int) -> float:
+    """
+    This function measures the average time of a forward pass on the CPU.
+    :param model: Model to time
+    :param input_size: Input size of the network
+    :param batch_size: Number of images per forward pass
+    :return: Average latency per batch in milliseconds
+    """
+    inputs = torch.randn(batch_size, 3, input_size, input_size)
+    with torch.no_grad():
+        for i in range(3):  # Warm up runs are not timed
+            model(inputs)
+        start_time = time.perf_counter()
+        for i in range(10):
+            model(inputs)
+
+    return (time.perf_counter() - start_time) / 10 * 1000
+
+
+def main():
+    """
+    Usage: python quantisation.py <model_name> <trained_weights.pth> <dataset_directory> [dynamic|static]
+    The dataset directory must contain the train/ and test/ sets.
+    If no mode is given, VGG-19_BN is dynamically quantised and the other models are statically quantised.
+    """
+    model_name = sys.argv[1]
+    trained_weights = sys.argv[2]
+    dataset_path = sys.argv[3]
+    config = toml.load("evaluation_config.toml")
+
+    if len(sys.argv) > 4:
+        mode = sys.argv[4]
+    elif model_name == "VGG-19_BN":
+        mode = "dynamic"
+    else:
+        mode = "static"
+
+    input_size = model_registry.get_input_size(model_name)
+    uses_inception = input_size == 299
+
+    testing_loader, classes = load_testing_set_and_transform(
+        dataset_path, uses_inception, batch_size=config["batch_size"]
+    )
+    device = torch.device("cpu")  # Quantised kernels are CPU only
+    model = load_trained_model(model_name, len(classes), trained_weights, device)
+
+    print("Quantising " + model_name + " using " + mode + " quantisation...")
+    if mode == "dynamic":
+        quantised_model = dynamic_quantisation(model)
+    elif mode == "static":
+        calibration_loader = load_calibration_set(
+            os.path.join(dataset_path, "train"),
+            input_size,
+            num_images=config["calibration_images"],
+            batch_size=config["batch_size"],
+        )
+        quantised_model = static_quantisation(model, calibration_loader, input_size)
+    else:
+        raise ValueError("Quantisation mode must be 'dynamic' or 'static'")
+
+    quantised_path = trained_weights.replace(".pth", "") + "_int8_" + mode + ".pt"
+    scripted_model = torch.jit.trace(
+        quantised_model, torch.randn(1, 3, input_size, input_size)
+    )
+    torch.jit.save(scripted_model, quantised_path)
+    print("Saved quantised model to: " + quantised_path)
+
+    float_latency = measure_latency(model, input_size, config["batch_size"])
+    int8_latency = measure_latency(scripted_model, input_size, config["batch_size"])
+    float_size = os.path.getsize(trained_weights) / 1024**2
+    int8_size = os.path.getsize(quantised_path) / 1024**2
+
+    print("\nFloat32 model:")
+    float_metrics = make_predictions(
+        testing_loader, classes, model_name, trained_weights
+    )
+    print("\nInt8 model:")
+    int8_metrics = make_predictions(testing_loader, classes, model_name, quantised_path)
+
+    print(
+        "\nModel size (MB) - Float32: {:.1f}, Int8: {:.1f}".format(
+            float_size, int8_size
+        )
+    )
+    print(
+        "Latency per batch of {} (ms) - Float32: {:.1f}, Int8: {:.1f} ({:.2f}x speed up)".format(
+            config["batch_size"],
+            float_latency,
+            int8_latency,
+            float_latency / int8_latency,
+        )
+    )
+    print(
+        "Accuracy change - Top-1: {:+.2f}, Top-5: {:+.2f}".format(
+            int8_metrics.top_1_accuracy - float_metrics.top_1_accuracy,
+            int8_metrics.top_5_accuracy - float_metrics.top_5_accuracy,
+        )
+    )
+
+    return
+
+
+if __name__ == "__main__":
+    main()
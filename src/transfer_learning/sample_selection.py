@@ -0,0 +1,243 @@
+"""
+This program contains sample selection, which trains every epoch on the part of the training set the model
+still gets wrong, instead of the whole training set. The loss of every image and how often the model
+forgot it (predicted it correctly in one epoch and wrongly in a later one) are tracked across epochs.
+Each epoch, the importance sampler then fills a compute budget - a fraction of the training set - with
+images drawn in proportion to their loss and forgetting, so images the model classifies confidently are
+mostly skipped. Images which have not been trained on for revisit_interval epochs are always included,
+so the statistics of easy images are refreshed and images the model starts to forget are found again.
+It can also be run as a script, which compares the accuracy and training time of a run with sample
+selection against a run on full epochs, using their metrics (.jsonl) files.
+Version: 19/10/2026
+"""
+import sys
+
+import numpy as np
+from torch.utils.data import DataLoader, Dataset, Sampler
+
+from metrics_emitter import load_events
+from progressive_resizing import (
+    ProgressiveResizingDataset,
+    ResizingBatchSampler,
+    time_to_accuracy,
+)
+
+LOSS_MOMENTUM = 0.5  # Weight of the previous loss in the running loss of an image
+
+
+class IndexedDataset(Dataset):
+    def __init__(self, dataset):
+        self.dataset = dataset
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, index):
+        image, label = self.dataset[index]
+        return image, label, index
+
+
+class SampleStatistics:
+    def __init__(self, num_samples: int):
+        """
+        :param num_samples: Number of images in the training set
+        """
+        self.epoch = 0
+        self.loss = np.zeros(
+            num_samples, dtype=np.float32
+        )  # Running loss of every image
+        self.times_seen = np.zeros(num_samples, dtype=np.int64)
+        self.last_seen_epoch = np.zeros(num_samples, dtype=np.int64)
+        self.correct = np.zeros(num_samples, dtype=bool)
+        self.forgetting_events = np.zeros(num_samples, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.loss)
+
+    def update(self, indices, losses, correct, epoch: int) -> None:
+        """
+        This function records the losses and predictions of a batch of training images.
+        :param indices: Indices of the images in the training set
+        :param losses: Loss of every image
+        :param correct: Boolean array, True where the image was classified correctly
+        :param epoch: Current epoch
+        :return:
+        """
+        indices = np.asarray(indices)
+        losses = np.asarray(losses, dtype=np.float32)
+        correct = np.asarray(correct, dtype=bool)
+
+        seen = self.times_seen[indices] > 0
+        self.loss[indices] = np.where(
+            seen,
+            LOSS_MOMENTUM * self.loss[indices] + (1 - LOSS_MOMENTUM) * losses,
+            losses,
+        )
+        self.forgetting_events[indices] += seen & self.correct[indices] & ~correct
+        self.correct[indices] = correct
+        self.times_seen[indices] += 1
+        self.last_seen_epoch[indices] = epoch
+        self.epoch = epoch
+
+        return
+
+
+class ImportanceSampler(Sampler):
+    def __init__(
+        self,
+        statistics: SampleStatistics,
+        budget: float,
+        revisit_interval: int,
+        seed: int = None,
+    ):
+        """
+        :param statistics: Statistics of the training images, updated by train_model()
+        :param budget: Fraction of the training set trained on per epoch, e.g. 0.5
+        :param revisit_interval: Number of epochs after which an image is trained on again, however easy it is
+        :param seed: Seed of the random selection
+        """
+        self.statistics = statistics
+        self.budget = budget
+        self.revisit_interval = revisit_interval
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return min(
+            int(np.ceil(self.budget * len(self.statistics))), len(self.statistics)
+        )
+
+    def select(self) -> np.ndarray:
+        """
+        This function selects the images of the next epoch.
+        :return: Indices of the selected images, in random order
+        """
+        statistics = self.statistics
+        num_selected = len(self)
+        next_epoch = statistics.epoch + 1
+
+        # Images which were never trained on, or not for revisit_interval epochs, are always included
+        due = (statistics.times_seen == 0) | (
+            next_epoch - statistics.last_seen_epoch >= self.revisit_interval
+        )
+        due_indices = np.flatnonzero(due)
+        if len(due_indices) >= num_selected:
+            selected = self.rng.choice(due_indices, num_selected, replace=False)
+        else:
+            # The rest of the budget is drawn without replacement in proportion to the priority of each
+            # image, by keeping the smallest exponential keys scaled by the priorities
+            other_indices = np.flatnonzero(~due)
+            priority = (
+                statistics.loss[other_indices]
+                * (1 + statistics.forgetting_events[other_indices])
+                + 1e-6
+            )
+            keys = self.rng.exponential(size=len(other_indices)) / priority
+            drawn = np.argpartition(keys, num_selected - len(due_indices) - 1)
+            selected = np.concatenate(
+                [due_indices, other_indices[drawn[: num_selected - len(due_indices)]]]
+            )
+
+        return self.rng.permutation(selected)
+
+    def __iter__(self):
+        return iter(self.select().tolist())
+
+
+def add_sample_selection(
+    train_loader: DataLoader, budget: float, revisit_interval: int
+):
+    """
+    This function rebuilds the training data loader so that it returns the index of every image,
+    and selects the images of every epoch with an ImportanceSampler.
+    :param train_loader: Training data loader built by load_dataset_and_transforms()
+    :param budget: Fraction of the training set trained on per epoch
+    :param revisit_interval: Number of epochs after which an image is trained on again
+    :return: Training data loader and the statistics which train_model() must update
+    """
+    dataset = train_loader.dataset
+    statistics = SampleStatistics(len(dataset))
+    sampler = ImportanceSampler(statistics, budget, revisit_interval)
+
+    if isinstance(dataset, ProgressiveResizingDataset):
+        train_loader = DataLoader(
+            ProgressiveResizingDataset(IndexedDataset(dataset.dataset)),
+            batch_sampler=ResizingBatchSampler(
+                sampler,
+                train_loader.batch_sampler.batch_size,
+                train_loader.batch_sampler.size,
+            ),
+            num_workers=train_loader.num_workers,
+            persistent_workers=train_loader.persistent_workers,
+        )
+    else:
+        train_loader = DataLoader(
+            IndexedDataset(dataset),
+            batch_size=train_loader.batch_size,
+            sampler=sampler,
+            num_workers=train_loader.num_workers,
+            persistent_workers=train_loader.persistent_workers,
+        )
+
+    return train_loader, statistics
+
+
+def summarise_training(events: list) -> dict:
+    """
+    :param events: Events of a training run, written by the metrics emitter
+    :return: Number of epochs, training time (s), images trained on and best validation accuracy
+    """
+    epochs = [event for event in events if event["event"] == "epoch"]
+    validation_epochs = [event for event in epochs if event["phase"] == "validation"]
+
+    return {
+        "epochs": len(validation_epochs),
+        "time_s": epochs[-1]["time"] - events[0]["time"],
+        "images_trained": sum(
+            event.get("samples", 0) for event in epochs if event["phase"] == "train"
+        ),
+        "best_accuracy": max(event["accuracy"] for event in validation_epochs),
+    }
+
+
+def main():
+    """
+    Usage: python sample_selection.py <full_epochs_run.jsonl> <sample_selection_run.jsonl>
+    Reports the time each run took to reach 90%, 95%, 99% and 100% of the best validation accuracy
+    of the run on full epochs.
+    """
+    runs = {
+        "Full epochs": load_events(sys.argv[1]),
+        "Sample selection": load_events(sys.argv[2]),
+    }
+    summaries = {name: summarise_training(events) for name, events in runs.items()}
+    best_accuracy = summaries["Full epochs"]["best_accuracy"]
+    fractions = [0.9, 0.95, 0.99, 1.0]
+
+    print(
+        "{:<17} {:>6} {:>9} {:>14} {:>9}".format(
+            "", "Epochs", "Time (s)", "Images trained", "Best acc."
+        )
+        + "".join(" {:>11}".format("{:.0%} of best".format(f)) for f in fractions)
+    )
+    for name, events in runs.items():
+        summary = summaries[name]
+        times = [time_to_accuracy(events, best_accuracy * f)[0] for f in fractions]
+        print(
+            "{:<17} {:>6d} {:>9.0f} {:>14d} {:>9.4f}".format(
+                name,
+                summary["epochs"],
+                summary["time_s"],
+                summary["images_trained"],
+                summary["best_accuracy"],
+            )
+            + "".join(
+                " {:>11}".format("-" if t is None else "{:.0f} s".format(t))
+                for t in times
+            )
+        )
+
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+This program accumulates classification metrics incrementally during evaluation.
+Instead of storing a class name for every test image, an integer confusion matrix is
+updated with each batch, so memory use stays constant however large the testing set is.
+Precision, Recall, F1 Score and Support are derived from the confusion matrix and exported
+in the same .csv layout as the Scikit Learn classification report read by classification_reporting.py.
+Matrices saved by evaluation shards running in separate processes can be summed with this script.
+Version: 19/10/2026
+"""
+import sys
+from typing import List
+
+import numpy as np
+
+
+class ClassificationMetrics:
+    def __init__(self, classes: List[str]):
+        self.classes = list(classes)
+        self.num_classes = len(self.classes)
+        self.confusion_matrix = np.zeros(
+            (self.num_classes, self.num_classes), dtype=np.int64
+        )  # Rows are ground truth classes, columns are predicted classes
+        self.top_5_correct = 0
+
+    def update(self, ground_truth, predictions, top_5_hits=None) -> None:
+        """
+        This function adds a batch of predictions to the confusion matrix.
+        :param ground_truth: Array of true class indices for the batch
+        :param predictions: Array of Top-1 predicted class indices for the batch
+        :param top_5_hits: Optional boolean array, True where the true class is in the Top-5 predictions
+        :return:
+        """
+        ground_truth = np.asarray(ground_truth, dtype=np.int64)
+        predictions = np.asarray(predictions, dtype=np.int64)
+        self.confusion_matrix += np.bincount(
+            ground_truth * self.num_classes + predictions,
+            minlength=self.num_classes * self.num_classes,
+        ).reshape(self.num_classes, self.num_classes)
+
+        if top_5_hits is not None:
+            self.top_5_correct += int(np.count_nonzero(top_5_hits))
+
+        return
+
+    def merge(self, other: "ClassificationMetrics") -> None:
+        """
+        This function adds the counts of another accumulator (e.g. another evaluation shard) to this one.
+        :param other: Accumulator built over the same list of classes
+        :return:
+        """
+        if other.classes != self.classes:
+            raise ValueError("Cannot merge metrics computed over different classes")
+        self.confusion_matrix += other.confusion_matrix
+        self.top_5_correct += other.top_5_correct
+
+        return
+
+    @property
+    def num_samples(self) -> int:
+        return int(self.confusion_matrix.sum())
+
+    @property
+    def top_1_accuracy(self) -> float:
+        return float(np.trace(self.confusion_matrix)) / max(self.num_samples, 1) * 100
+
+    @property
+    def top_5_accuracy(self) -> float:
+        return self.top_5_correct / max(self.num_samples, 1) * 100
+
+    def classification_report(self) -> "pd.DataFrame":
+        """
+        This function derives per class Precision, Recall, F1 Score and Support from the confusion matrix.
+        The layout matches pd.DataFrame(metrics.classification_report(..., output_dict=True)).transpose(),
+        including the accuracy, macro average and weighted average rows at the bottom.
+        Metrics which are undefined (division by zero) are set to 0, as Scikit Learn does.
+        :return: Classification report as a Pandas DataFrame
+        """
+        import pandas as pd  # Imported here, as only the report needs pandas
+
+        true_positives = np.diag(self.confusion_matrix).astype(np.float64)
+        support = self.confusion_matrix.sum(axis=1).astype(np.float64)
+        predicted = self.confusion_matrix.sum(axis=0).astype(np.float64)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            precision = np.where(predicted > 0, true_positives / predicted, 0.0)
+            recall = np.where(support > 0, true_positives / support, 0.0)
+            f1_score = np.where(
+                precision + recall > 0,
+                2 * precision * recall / (precision + recall),
+                0.0,
+            )
+
+        report = pd.DataFrame(
+            {
+                "precision": precision,
+                "recall": recall,
+                "f1-score": f1_score,
+                "support": support,
+            },
+            index=self.classes,
+        )
+
+        total_support = support.sum()
+        accuracy = true_positives.sum() / max(total_support, 1)
+        weights = support / max(total_support, 1)
+        report.loc["accuracy"] = [accuracy, accuracy, accuracy, accuracy]
+        report.loc["macro avg"] = [
+            precision.mean(),
+            recall.mean(),
+            f1_score.mean(),
+            total_support,
+        ]
+        report.loc["weighted avg"] = [
+            (precision * weights).sum(),
+            (recall * weights).sum(),
+            (f1_score * weights).sum(),
+            total_support,
+        ]
+
+        return report
+
+    def save(self, path: str) -> None:
+        """
+        This function saves the accumulated counts so that shards can be merged later.
+        :param path: Path to the .npz file
+        :return:
+        """
+        np.savez(
+            path,
+            classes=np.array(self.classes),
+            confusion_matrix=self.confusion_matrix,
+            top_5_correct=np.array(self.top_5_correct),
+        )
+
+        return
+
+    @classmethod
+    def load(cls, path: str) -> "ClassificationMetrics":
+        """
+        This function loads counts previously written by save().
+        :param path: Path to the .npz file
+        :return: ClassificationMetrics accumulator
+        """
+        saved = np.load(path)
+        metrics = cls(saved["classes"].tolist())
+        metrics.confusion_matrix += saved["confusion_matrix"]
+        metrics.top_5_correct = int(saved["top_5_correct"])
+
+        return metrics
+
+
+def main():
+    """
+    Sums the metrics of evaluation shards and exports the combined report.
+    Usage: python streaming_metrics.py <title> <shard_metrics.npz> [<shard_metrics.npz> ...]
+    """
+    from model_evaluation import create_confusion_matrix
+
+    title = sys.argv[1]
+    metrics = ClassificationMetrics.load(sys.argv[2])
+    for path in sys.argv[3:]:
+        metrics.merge(ClassificationMetrics.load(path))
+
+    print("Testing accuracy (Top-1): {:.2f}".format(metrics.top_1_accuracy))
+    print("Testing accuracy (Top-5): {:.2f}".format(metrics.top_5_accuracy))
+    create_confusion_matrix(metrics, generate_report=True, title=title)
+
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+This program classifies full resolution ISS frames without downsampling them to the network input size.
+Each frame is cut into overlapping tiles of the network input size (224 or 299), the tiles are classified
+in batches and the tile predictions are aggregated into a prediction for the whole frame, and into a
+heatmap of where in the frame the predicted city was recognised.
+Tiles are cut and normalised one chunk at a time from the decoded 8-bit frame, so the memory used
+stays bounded by the chunk size, however large the frame is.
+Version: 19/10/2026
+"""
+import os
+import sys
+from typing import List, Tuple
+
+import numpy as np
+import toml
+import torch
+from PIL import Image
+
+import model_registry
+from model_evaluation import get_classes, load_trained_model
+
+MEANS = torch.tensor([0.485, 0.456, 0.406]).view(1, 3, 1, 1)  # ImageNet normalisation
+STD_DEVS = torch.tensor([0.229, 0.224, 0.225]).view(1, 3, 1, 1)
+
+
+def tile_positions(length: int, tile_size: int, stride: int) -> List[int]:
+    """
+    This function computes the start positions of the tiles along one side of the frame.
+    The last tile is aligned with the edge of the frame, so the whole frame is covered.
+    :param length: Length of the side of the frame (pixels)
+    :param tile_size: Length of the side of a tile (pixels)
+    :param stride: Distance between the starts of neighbouring tiles (pixels)
+    :return: Start positions of the tiles
+    """
+    if length <= tile_size:
+        return [0]
+
+    positions = list(range(0, length - tile_size + 1, stride))
+    if positions[-1] != length - tile_size:
+        positions.append(length - tile_size)
+
+    return positions
+
+
+def load_frame(image_path: str, tile_size: int) -> np.ndarray:
+    """
+    This function decodes a frame, and enlarges it if it is smaller than a tile.
+    :param image_path: Path to the frame
+    :param tile_size: Length of the side of a tile (pixels)
+    :return: Frame as an 8-bit array of shape (height, width, 3)
+    """
+    image = Image.open(image_path).convert("RGB")
+    if min(image.size) < tile_size:
+        scale = tile_size / min(image.size)
+        image = image.resize(
+            (round(image.width * scale), round(image.height * scale)), Image.BILINEAR
+        )
+
+    return np.asarray(image)
+
+
+def predict_tiles(
+    model, frame: np.ndarray, tile_size: int, stride: int, chunk_size: int, device
+) -> Tuple[torch.Tensor, List[Tuple[int, int]]]:
+    """
+    This function classifies every tile of the frame. Tiles are cut, normalised and classified
+    chunk_size tiles at a time.
+    :param model: Trained model in evaluation mode
+    :param frame: Frame as an 8-bit array of shape (height, width, 3)
+    :param tile_size: Length of the side of a tile, i.e. the input size of the network (pixels)
+    :param stride: Distance between the starts of neighbouring tiles (pixels)
+    :param chunk_size: Number of tiles classified in one forward pass
+    :param device: Device on which the model runs
+    :return: Class probabilities of every tile, and the (top, left) position of every tile
+    """
+    positions = [
+        (top, left)
+        for top in tile_positions(frame.shape[0], tile_size, stride)
+        for left in tile_positions(frame.shape[1], tile_size, stride)
+    ]
+
+    probabilities = []
+    with torch.no_grad():
+        for start in range(0, len(positions), chunk_size):
+            tiles = np.stack(
+                [
+                    frame[top : top + tile_size, left : left + tile_size]
+                    for top, left in positions[start : start + chunk_size]
+                ]
+            )
+            tiles = torch.from_numpy(tiles).permute(0, 3, 1, 2).float().div(255)
+            tiles = (tiles - MEANS) / STD_DEVS
+            probabilities.append(torch.softmax(model(tiles.to(device)), dim=1).cpu())
+
+    return torch.cat(probabilities), positions
+
+
+def aggregate_tiles(
+    probabilities: torch.Tensor,
+    positions: List[Tuple[int, int]],
+    frame_shape: Tuple[int, int],
+    tile_size: int,
+    class_index: int,
+    heatmap_scale: int,
+) -> Tuple[torch.Tensor, np.ndarray]:
+    """
+    This function aggregates the tile predictions into the frame prediction and a heatmap.
+    The frame prediction is the mean of the tile probabilities. Each heatmap cell is the mean
+    probability of the class over the tiles which overlap the cell.
+    :param probabilities: Class probabilities of every tile
+    :param positions: (top, left) position of every tile
+    :param frame_shape: (height, width) of the frame
+    :param tile_size: Length of the side of a tile (pixels)
+    :param class_index: Class whose probabilities are shown in the heatmap
+    :param heatmap_scale: Side of a heatmap cell (pixels), which keeps the heatmap small for large frames
+    :return: Class probabilities of the frame, heatmap
+    """
+    heatmap_shape = (
+        -(-frame_shape[0] // heatmap_scale),
+        -(-frame_shape[1] // heatmap_scale),
+    )
+    heatmap = np.zeros(heatmap_shape, dtype=np.float32)
+    coverage = np.zeros(heatmap_shape, dtype=np.float32)
+    for (top, left), probability in zip(positions, probabilities[:, class_index]):
+        cells = (
+            slice(top // heatmap_scale, -(-(top + tile_size) // heatmap_scale)),
+            slice(left // heatmap_scale, -(-(left + tile_size) // heatmap_scale)),
+        )
+        heatmap[cells] += float(probability)
+        coverage[cells] += 1
+
+    return probabilities.mean(dim=0), heatmap / np.maximum(coverage, 1)
+
+
+def plot_heatmap(
+    frame: np.ndarray, heatmap: np.ndarray, heatmap_scale: int, title: str, renderer
+) -> None:
+    """
+    This function submits the heatmap, overlaid on the frame, to be rendered.
+    :param frame: Frame as an 8-bit array of shape (height, width, 3)
+    :param heatmap: Heatmap returned by aggregate_tiles()
+    :param heatmap_scale: Side of a heatmap cell (pixels)
+    :param title: Title of the figure, also used as the file name
+    :param renderer: PlotRenderer which renders the plot
+    :return:
+    """
+    # Imported here, so that classifying frames does not wait for matplotlib to load
+    from plot_rendering import render_heatmap_overlay
+
+    # The frame is shown at the resolution of the heatmap, so large frames are neither drawn nor
+    # sent to the rendering process in full
+    renderer.submit(
+        "../visualisations/heatmaps/" + title + "_heatmap.png",
+        render_heatmap_overlay,
+        np.ascontiguousarray(frame[::heatmap_scale, ::heatmap_scale]),
+        heatmap,
+        title,
+        figure_kwargs={"figsize": (12, 12 * frame.shape[0] / frame.shape[1])},
+    )
+
+    return
+
+
+def main():
+    """
+    Usage: python tiled_inference.py <model_name> <trained_weights.pth> <dataset_directory> <image> [<image> ...]
+    The dataset directory (e.g. the training set) is only used to recover the class names.
+    """
+    model_name = sys.argv[1]
+    config = toml.load("evaluation_config.toml")
+
+    tile_size = model_registry.get_input_size(model_name)
+    stride = max(1, round(tile_size * (1 - config["tile_overlap"])))
+
+    device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
+    classes = get_classes(sys.argv[3])
+    model = load_trained_model(model_name, len(classes), sys.argv[2], device)
+    # Heatmaps are rendered in background processes while the next frame is classified
+    from plot_rendering import create_renderer
+
+    renderer = create_renderer(config)
+
+    for image_path in sys.argv[4:]:
+        frame = load_frame(image_path, tile_size)
+        probabilities, positions = predict_tiles(
+            model, frame, tile_size, stride, config["tile_chunk_size"], device
+        )
+        predicted_class = int(probabilities.mean(dim=0).argmax())
+        frame_probabilities, heatmap = aggregate_tiles(
+            probabilities,
+            positions,
+            frame.shape[:2],
+            tile_size,
+            predicted_class,
+            config["heatmap_scale"],
+        )
+
+        print(
+            "\n{} ({}x{} pixels, {} tiles):".format(
+                image_path, frame.shape[1], frame.shape[0], len(positions)
+            )
+        )
+        top_probabilities, top_classes = frame_probabilities.topk(
+            min(config["top_k"], len(classes))
+        )
+        for probability, class_index in zip(top_probabilities, top_classes):
+            print("{:.4f}  {}".format(float(probability), classes[class_index]))
+
+        title = (
+            os.path.splitext(os.path.basename(image_path))[0]
+            + "_"
+            + classes[predicted_class]
+        )
+        plot_heatmap(frame, heatmap, config["heatmap_scale"], title, renderer)
+    renderer.close()
+
+    return
+
+
+if __name__ == "__main__":
+    main()
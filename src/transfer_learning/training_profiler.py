@@ -0,0 +1,201 @@
+"""
+This program contains the profiler of the training loop. It records how long every step spends waiting
+for data, transferring the batch to the device, in the forward pass, computing the loss, in the backward
+pass and in the optimiser step, so that it can be seen whether training is bound by the input pipeline
+or by compute. The totals and percentiles are printed after every phase of every epoch.
+Optionally, a window of training steps is recorded with torch.profiler and exported as a Chrome trace,
+which can be opened in chrome://tracing or Perfetto.
+Version: 19/10/2026
+"""
+import contextlib
+import os
+import time
+
+import numpy as np
+import torch
+
+SECTIONS = ["data_wait", "transfer", "forward", "loss", "backward", "optimizer"]
+
+
+class TrainingProfiler:
+    def __init__(
+        self,
+        device,
+        enabled: bool = True,
+        trace_start_step: int = 0,
+        trace_end_step: int = 0,
+        trace_path: str = None,
+    ):
+        """
+        :param device: Device used for training. On a GPU, the device is synchronised before every
+        timestamp, as CUDA operations are asynchronous and would otherwise be timed when they are queued
+        :param enabled: If false, the profiler records nothing and adds no overhead to the training loop
+        :param trace_start_step: First training step (counted over all epochs) recorded by torch.profiler
+        :param trace_end_step: Training step at which the torch.profiler recording stops, no trace
+        is recorded if it is not greater than trace_start_step
+        :param trace_path: Path to the exported Chrome trace (.json)
+        """
+        self.enabled = enabled
+        self.synchronise = enabled and torch.device(device).type == "cuda"
+        self.traces = enabled and trace_end_step > trace_start_step
+        self.trace_start_step = trace_start_step
+        self.trace_end_step = trace_end_step
+        self.trace_path = trace_path
+        self.torch_profiler = None
+
+        self.epoch = 0
+        self.phase = None
+        self.step_times = {}
+        self.summaries = []
+
+    def now(self) -> float:
+        if self.synchronise:
+            torch.cuda.synchronize()
+
+        return time.perf_counter()
+
+    def start_phase(self, epoch: int, phase: str) -> None:
+        """
+        :param epoch: Current epoch
+        :param phase: "train" or "validation"
+        :return:
+        """
+        self.epoch = epoch
+        self.phase = phase
+        self.step_times = {section: [] for section in SECTIONS}
+
+        if self.traces and phase == "train" and self.torch_profiler is None:
+            self.start_trace()
+
+        return
+
+    def start_trace(self) -> None:
+        os.makedirs(os.path.dirname(self.trace_path) or ".", exist_ok=True)
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if self.synchronise:
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+
+        warmup = 1 if self.trace_start_step > 0 else 0
+        self.torch_profiler = torch.profiler.profile(
+            activities=activities,
+            schedule=torch.profiler.schedule(
+                wait=self.trace_start_step - warmup,
+                warmup=warmup,
+                active=self.trace_end_step - self.trace_start_step,
+                repeat=1,
+            ),
+            on_trace_ready=self.export_trace,
+            record_shapes=True,
+        )
+        self.torch_profiler.start()
+
+        return
+
+    def export_trace(self, torch_profiler) -> None:
+        torch_profiler.export_chrome_trace(self.trace_path)
+        print("Exported the Chrome trace to: " + self.trace_path)
+
+        return
+
+    def iterate(self, data_loader):
+        """
+        This function iterates over the data loader, timing how long every step waits for its batch.
+        :param data_loader: Data loader of the current phase
+        :return: Batches of the data loader
+        """
+        if not self.enabled:
+            yield from data_loader
+            return
+
+        iterator = iter(data_loader)
+        while True:
+            start_time = self.now()
+            try:
+                batch = next(iterator)
+            except StopIteration:
+                return
+            self.step_times["data_wait"].append(self.now() - start_time)
+
+            yield batch
+
+            # The loop body, i.e. the rest of the step, has finished when the next batch is requested
+            if self.torch_profiler is not None and self.phase == "train":
+                self.torch_profiler.step()
+
+    @contextlib.contextmanager
+    def section(self, name: str):
+        """
+        This function times the code in a with block as one section of the step.
+        :param name: Name of the section, one of SECTIONS
+        """
+        if not self.enabled:
+            yield
+            return
+
+        start_time = self.now()
+        yield
+        self.step_times[name].append(self.now() - start_time)
+
+    def end_phase(self) -> dict:
+        """
+        This function summarises and prints the timings of the phase.
+        :return: Summary of the phase
+        """
+        if not self.enabled or len(self.step_times["data_wait"]) == 0:
+            return {}
+
+        summary = {"epoch": self.epoch, "phase": self.phase, "sections": {}}
+        total_time = sum(sum(times) for times in self.step_times.values())
+        print(
+            "Step timings ({}): {:<10} {:>9} {:>9} {:>9} {:>9} {:>7}".format(
+                self.phase,
+                "section",
+                "total (s)",
+                "p50 (ms)",
+                "p90 (ms)",
+                "p99 (ms)",
+                "share",
+            )
+        )
+        for section, times in self.step_times.items():
+            if len(times) == 0:
+                continue
+            times_ms = np.array(times) * 1000
+            summary["sections"][section] = {
+                "total_s": float(times_ms.sum() / 1000),
+                "p50_ms": float(np.percentile(times_ms, 50)),
+                "p90_ms": float(np.percentile(times_ms, 90)),
+                "p99_ms": float(np.percentile(times_ms, 99)),
+            }
+            print(
+                "{:>{width}} {:<10} {:>9.2f} {:>9.2f} {:>9.2f} {:>9.2f} {:>6.1f}%".format(
+                    "",
+                    section,
+                    times_ms.sum() / 1000,
+                    summary["sections"][section]["p50_ms"],
+                    summary["sections"][section]["p90_ms"],
+                    summary["sections"][section]["p99_ms"],
+                    sum(times) / total_time * 100,
+                    width=len("Step timings ({}):".format(self.phase)),
+                )
+            )
+        summary["data_wait_ratio"] = sum(self.step_times["data_wait"]) / total_time
+        if summary["data_wait_ratio"] > 0.5:
+            print(
+                "More than half of the step time is spent waiting for data - the input pipeline is the bottleneck"
+            )
+        self.summaries.append(summary)
+
+        return summary
+
+    def close(self) -> None:
+        """
+        This function stops the torch.profiler recording, if it is still running.
+        :return:
+        """
+        if self.torch_profiler is not None:
+            # Exports the trace if training ended within the recorded window
+            self.torch_profiler.stop()
+            self.torch_profiler = None
+
+        return